@@ -1,3 +1,23 @@
 from .client import MongoClient
+from .async_client import AsyncMongoClient
+from .collection import ReturnDocument
+from .operations import (
+    InsertOne,
+    DeleteOne,
+    DeleteMany,
+    UpdateOne,
+    UpdateMany,
+    ReplaceOne,
+)
 
-__all__ = ["MongoClient"]
+__all__ = [
+    "MongoClient",
+    "AsyncMongoClient",
+    "ReturnDocument",
+    "InsertOne",
+    "DeleteOne",
+    "DeleteMany",
+    "UpdateOne",
+    "UpdateMany",
+    "ReplaceOne",
+]
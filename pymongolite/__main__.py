@@ -0,0 +1,3 @@
+from pymongolite.cli import main
+
+main()
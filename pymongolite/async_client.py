@@ -0,0 +1,303 @@
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from functools import partial
+from itertools import islice
+import asyncio
+import os
+
+from pymongolite.client import MongoClient
+from pymongolite.collection import Collection
+from pymongolite.database import Database
+
+DEFAULT_BATCH_SIZE = 100
+
+
+def _offloaded(name: str, wrapped_class: type):
+    """Awaitable version of a blocking method, run in the client thread pool"""
+
+    async def method(self, *args, **kwargs):
+        return await self._run(getattr(self.delegate, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__qualname__ = name
+    method.__doc__ = "Awaitable :meth:`~%s.%s.%s`." % (
+        wrapped_class.__module__,
+        wrapped_class.__name__,
+        name,
+    )
+    return method
+
+
+class AsyncCursor:
+    """Cursor for `async for`.
+
+    Documents are read in batches in the client thread pool, the next batch
+    is read while the current one is consumed.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncMongoClient",
+        open_cursor: Callable,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.__client = client
+        self.__open_cursor = open_cursor
+        self.__batch_size = batch_size
+        self.__cursor = None
+        self.__iterator = None
+        self.__buffer = deque()
+        self.__prefetch = None
+        self.__exhausted = False
+        self.__closed = False
+
+    def batch_size(self, batch_size: int) -> "AsyncCursor":
+        """Set the number of documents read at once, returns this cursor."""
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+
+        self.__batch_size = batch_size
+        return self
+
+    def _read_batch(self) -> List[Dict]:
+        # Runs in the thread pool, one batch at a time
+        if self.__iterator is None:
+            self.__cursor = self.__open_cursor()
+            self.__iterator = iter(self.__cursor)
+
+        return list(islice(self.__iterator, self.__batch_size))
+
+    def __start_prefetch(self):
+        self.__prefetch = asyncio.ensure_future(
+            self.__client._run(self._read_batch)
+        )
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict:
+        if not self.__buffer:
+            if self.__exhausted or self.__closed:
+                raise StopAsyncIteration
+
+            if self.__prefetch is None:
+                self.__start_prefetch()
+
+            batch = await self.__prefetch
+            self.__prefetch = None
+
+            if len(batch) < self.__batch_size:
+                self.__exhausted = True
+            else:
+                self.__start_prefetch()
+
+            if not batch:
+                raise StopAsyncIteration
+
+            self.__buffer.extend(batch)
+
+        return self.__buffer.popleft()
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        """Read the documents into a list, at most `length` of them."""
+        documents = []
+
+        async for document in self:
+            documents.append(document)
+            if length is not None and len(documents) >= length:
+                break
+
+        return documents
+
+    async def close(self):
+        """Stop reading, a batch being read is awaited first."""
+        self.__closed = True
+        self.__buffer.clear()
+
+        if self.__prefetch is not None:
+            try:
+                await self.__prefetch
+            except Exception:
+                pass
+            self.__prefetch = None
+
+        # An exhausted cursor closed itself already
+        if self.__cursor is not None and not self.__exhausted:
+            close = getattr(self.__cursor, "close", None)
+            if close is not None:
+                close()
+
+    @property
+    def closed(self) -> bool:
+        return self.__closed
+
+
+class AsyncCollection:
+    """Asynchronous :class:`~pymongolite.collection.Collection`."""
+
+    def __init__(self, database: "AsyncDatabase", delegate: Collection):
+        self.__database = database
+        self.delegate = delegate
+
+    @property
+    def database(self) -> "AsyncDatabase":
+        return self.__database
+
+    @property
+    def name(self) -> str:
+        return self.delegate.name
+
+    def __repr__(self):
+        return "AsyncCollection(%r, %r)" % (self.__database, self.name)
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        return await self.__database.client._run(function, *args, **kwargs)
+
+    insert_one = _offloaded("insert_one", Collection)
+    insert_many = _offloaded("insert_many", Collection)
+    delete_one = _offloaded("delete_one", Collection)
+    delete_many = _offloaded("delete_many", Collection)
+    update_one = _offloaded("update_one", Collection)
+    update_many = _offloaded("update_many", Collection)
+    replace_one = _offloaded("replace_one", Collection)
+    replace_many = _offloaded("replace_many", Collection)
+    bulk_write = _offloaded("bulk_write", Collection)
+    drop = _offloaded("drop", Collection)
+    find_one = _offloaded("find_one", Collection)
+    find_one_and_update = _offloaded("find_one_and_update", Collection)
+    find_one_and_replace = _offloaded("find_one_and_replace", Collection)
+    find_one_and_delete = _offloaded("find_one_and_delete", Collection)
+    count_documents = _offloaded("count_documents", Collection)
+    estimated_document_count = _offloaded("estimated_document_count", Collection)
+    distinct = _offloaded("distinct", Collection)
+    create_index = _offloaded("create_index", Collection)
+    delete_index = _offloaded("delete_index", Collection)
+    get_indexes = _offloaded("get_indexes", Collection)
+
+    def find(
+        self, *args, batch_size: int = DEFAULT_BATCH_SIZE, **kwargs
+    ) -> AsyncCursor:
+        """Like :meth:`~pymongolite.collection.Collection.find`, nothing is
+        read before the cursor is iterated with `async for`."""
+        return AsyncCursor(
+            self.__database.client,
+            partial(self.delegate.find, *args, **kwargs),
+            batch_size,
+        )
+
+    def aggregate(
+        self, pipeline: List[Dict], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> AsyncCursor:
+        """Like :meth:`~pymongolite.collection.Collection.aggregate`, the
+        pipeline runs when the cursor is iterated with `async for`."""
+        return AsyncCursor(
+            self.__database.client,
+            partial(self.delegate.aggregate, pipeline),
+            batch_size,
+        )
+
+
+class AsyncDatabase:
+    """Asynchronous :class:`~pymongolite.database.Database`."""
+
+    def __init__(self, client: "AsyncMongoClient", delegate: Database):
+        self.__client = client
+        self.delegate = delegate
+
+    @property
+    def client(self) -> "AsyncMongoClient":
+        return self.__client
+
+    @property
+    def name(self) -> str:
+        return self.delegate.name
+
+    def __repr__(self):
+        return "AsyncDatabase(%r, %r)" % (self.__client, self.name)
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        return await self.__client._run(function, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> AsyncCollection:
+        if name.startswith("_"):
+            raise AttributeError(
+                "AsyncDatabase has no attribute %r. To access the %s"
+                " collection, use database[%r]." % (name, name, name)
+            )
+        return self.get_collection(name)
+
+    def __getitem__(self, name: str) -> AsyncCollection:
+        return self.get_collection(name)
+
+    def get_collection(self, name: str) -> AsyncCollection:
+        return AsyncCollection(self, self.delegate.get_collection(name))
+
+    async def create_collection(self, name: str, **kwargs: Any) -> AsyncCollection:
+        return AsyncCollection(
+            self, await self._run(self.delegate.create_collection, name, **kwargs)
+        )
+
+    async def list_collection_names(self, **kwargs: Any) -> List[str]:
+        return await self._run(self.delegate.list_collection_names, **kwargs)
+
+    drop_collection = _offloaded("drop_collection", Database)
+
+
+class AsyncMongoClient:
+    """Asynchronous :class:`~pymongolite.client.MongoClient` for asyncio.
+
+    Blocking file work runs in a bounded thread pool, operations on
+    different collections run in parallel.
+
+    :Parameters:
+      - `dirpath`: Directory of the databases.
+      - `database` (optional): Name of the default database.
+      - `max_workers` (optional): Size of the thread pool.
+      - `**kwargs` (optional): Passed to :class:`~pymongolite.client.MongoClient`.
+    """
+
+    def __init__(
+        self,
+        dirpath: str,
+        database: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        **kwargs: Any,
+    ):
+        self.delegate = MongoClient(dirpath, database, **kwargs)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(32, (os.cpu_count() or 1) + 4),
+            thread_name_prefix="pymongolite",
+        )
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(function, *args, **kwargs)
+        )
+
+    @property
+    def closed(self) -> bool:
+        return self.delegate.closed
+
+    def get_database(self, name: Optional[str] = None) -> AsyncDatabase:
+        return AsyncDatabase(self, self.delegate.get_database(name))
+
+    def get_default_database(self, default: Optional[str] = None) -> AsyncDatabase:
+        return AsyncDatabase(self, self.delegate.get_default_database(default))
+
+    async def drop_database(self, name: Optional[str] = None):
+        return await self._run(self.delegate.drop_database, name)
+
+    def close(self):
+        """Close the client, operations already running finish in the background."""
+        self._executor.shutdown(wait=False)
+        self.delegate.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # Wait for the running operations without blocking the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self.delegate.close()
@@ -0,0 +1,166 @@
+"""
+Minimal BSON codec for the wire protocol server.
+Supports the types documents of pymongolite can hold: double, string, document,
+array, binary, ObjectId, bool, UTC datetime, null, int32, int64 and timestamp.
+"""
+
+from typing import Any, Mapping, Tuple
+from datetime import datetime, timedelta, timezone
+import struct
+
+from pymongolite.backend.objectid import ObjectId
+
+_INT32 = struct.Struct("<i")
+_INT64 = struct.Struct("<q")
+_UINT64 = struct.Struct("<Q")
+_DOUBLE = struct.Struct("<d")
+
+_EPOCH = datetime(1970, 1, 1)
+
+_INT32_MIN, _INT32_MAX = -(2**31), 2**31 - 1
+
+
+class InvalidBSON(ValueError):
+    pass
+
+
+class Int64(int):
+    """Integer always encoded as a BSON int64, cursor ids are"""
+
+
+def _cstring(value: str) -> bytes:
+    data = value.encode()
+    if b"\x00" in data:
+        raise InvalidBSON(f"Key {value!r} contains a null character")
+    return data + b"\x00"
+
+
+def _encode_element(key: str, value: Any) -> bytes:
+    name = _cstring(key)
+
+    if value is None:
+        return b"\x0a" + name
+
+    if isinstance(value, bool):
+        return b"\x08" + name + (b"\x01" if value else b"\x00")
+
+    if isinstance(value, Int64):
+        return b"\x12" + name + _INT64.pack(value)
+
+    if isinstance(value, int):
+        if _INT32_MIN <= value <= _INT32_MAX:
+            return b"\x10" + name + _INT32.pack(value)
+        return b"\x12" + name + _INT64.pack(value)
+
+    if isinstance(value, float):
+        return b"\x01" + name + _DOUBLE.pack(value)
+
+    if isinstance(value, str):
+        data = value.encode()
+        return b"\x02" + name + _INT32.pack(len(data) + 1) + data + b"\x00"
+
+    if isinstance(value, ObjectId):
+        if value.is_legacy:
+            # Ids of older collections aren't 12 bytes, sent as their string
+            return _encode_element(key, str(value))
+        return b"\x07" + name + value.binary
+
+    if isinstance(value, Mapping):
+        return b"\x03" + name + encode(value)
+
+    if isinstance(value, (list, tuple)):
+        return b"\x04" + name + encode({str(i): item for i, item in enumerate(value)})
+
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        milliseconds = (value - _EPOCH) // timedelta(milliseconds=1)
+        return b"\x09" + name + _INT64.pack(milliseconds)
+
+    if isinstance(value, (bytes, bytearray)):
+        return b"\x05" + name + _INT32.pack(len(value)) + b"\x00" + bytes(value)
+
+    raise InvalidBSON(f"Cannot encode object of type {type(value).__name__}")
+
+
+def encode(document: Mapping) -> bytes:
+    body = b"".join(_encode_element(key, value) for key, value in document.items())
+    return _INT32.pack(len(body) + 5) + body + b"\x00"
+
+
+def _read_cstring(data: bytes, position: int) -> Tuple[str, int]:
+    end = data.index(b"\x00", position)
+    return data[position:end].decode(), end + 1
+
+
+def _decode_document(data: bytes, position: int) -> Tuple[dict, int]:
+    (length,) = _INT32.unpack_from(data, position)
+    end = position + length
+    if end > len(data) or data[end - 1] != 0:
+        raise InvalidBSON("Document is truncated")
+
+    document = {}
+    position += 4
+
+    while position < end - 1:
+        element_type = data[position]
+        key, position = _read_cstring(data, position + 1)
+        document[key], position = _decode_value(element_type, data, position)
+
+    return document, end
+
+
+def _decode_value(element_type: int, data: bytes, position: int) -> Tuple[Any, int]:
+    if element_type == 0x01:
+        return _DOUBLE.unpack_from(data, position)[0], position + 8
+
+    if element_type == 0x02:
+        (length,) = _INT32.unpack_from(data, position)
+        start = position + 4
+        return data[start : start + length - 1].decode(), start + length
+
+    if element_type == 0x03:
+        return _decode_document(data, position)
+
+    if element_type == 0x04:
+        array, position = _decode_document(data, position)
+        return list(array.values()), position
+
+    if element_type == 0x05:
+        (length,) = _INT32.unpack_from(data, position)
+        start = position + 5
+        return data[start : start + length], start + length
+
+    if element_type == 0x07:
+        return ObjectId(data[position : position + 12]), position + 12
+
+    if element_type == 0x08:
+        return data[position] == 1, position + 1
+
+    if element_type == 0x09:
+        (milliseconds,) = _INT64.unpack_from(data, position)
+        return _EPOCH + timedelta(milliseconds=milliseconds), position + 8
+
+    if element_type == 0x0A:
+        return None, position
+
+    if element_type == 0x10:
+        return _INT32.unpack_from(data, position)[0], position + 4
+
+    if element_type == 0x11:
+        return _UINT64.unpack_from(data, position)[0], position + 8
+
+    if element_type == 0x12:
+        return _INT64.unpack_from(data, position)[0], position + 8
+
+    raise InvalidBSON(f"Unsupported BSON type 0x{element_type:02x}")
+
+
+def decode(data: bytes, position: int = 0) -> Tuple[dict, int]:
+    """Document starting at `position` and the position right after it"""
+    try:
+        return _decode_document(data, position)
+    except InvalidBSON:
+        raise
+    except (struct.error, IndexError, ValueError) as error:
+        raise InvalidBSON(str(error)) from error
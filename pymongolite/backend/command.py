@@ -15,6 +15,15 @@ class COMMANDS(IntEnum):
     create_index = 10
     delete_index = 11
     get_index_list = 12
+    aggregate = 13
+    count_documents = 14
+    estimated_document_count = 15
+    distinct = 16
+    bulk_write = 17
+    find_and_modify = 18
+    start_transaction = 19
+    commit_transaction = 20
+    abort_transaction = 21
 
 
 class Command:
@@ -34,4 +43,4 @@ class Command:
         try:
             return self.arguments[item]
         except KeyError:
-            return getattr(self, item, None)
+            return None
@@ -1,4 +1,5 @@
 class Document:
-    def __init__(self, data: dict, lookup_key: int):
+    def __init__(self, data: dict, lookup_key: int, score: float = None):
         self.data = data
         self.lookup_key = lookup_key
+        self.score = score
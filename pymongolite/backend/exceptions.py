@@ -48,3 +48,55 @@ class DatabaseIsRequired(MongoliteBackendException):
 
 class SessionClosedError(MongoliteBackendException):
     pass
+
+
+class IndexRequired(MongoliteBackendException):
+    def __init__(self, operation: str):
+        self.operation = operation
+
+    def __str__(self):
+        return f"Operation '{self.operation}' requires a matching index"
+
+
+class InvalidId(MongoliteBackendException, ValueError):
+    def __init__(self, oid):
+        self.oid = oid
+
+    def __str__(self):
+        return f"'{self.oid}' is not a valid ObjectId, it must be a 12-byte input or a 24-character hex string"
+
+
+class DuplicateKeyError(MongoliteBackendException):
+    def __init__(self, document_id):
+        self.document_id = document_id
+
+    def __str__(self):
+        return f"Duplicate key error, a document with _id {self.document_id!r} already exists"
+
+
+class LockUpgradeError(MongoliteBackendException):
+    def __str__(self):
+        return "A read lock can't be upgraded to a write lock, release it first"
+
+
+class TransactionConflict(MongoliteBackendException):
+    def __str__(self):
+        return "Write conflict, a document of the transaction was changed after it started"
+
+
+class TransactionNotActive(MongoliteBackendException):
+    def __str__(self):
+        return "Transaction was already committed or aborted"
+
+
+class ProtocolError(MongoliteBackendException):
+    pass
+
+
+class RemoteCommandError(MongoliteBackendException):
+    def __init__(self, error_type: str, message: str):
+        self.error_type = error_type
+        self.message = message
+
+    def __str__(self):
+        return f"{self.error_type}: {self.message}"
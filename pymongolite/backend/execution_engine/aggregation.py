@@ -0,0 +1,435 @@
+from typing import Iterable, Iterator, List, Dict, Any, Callable
+from collections.abc import Mapping
+from functools import cmp_to_key
+from itertools import islice
+import heapq
+import pickle
+import tempfile
+
+from pymongolite.backend.utils import document_filter_match, update_with_fields, Null
+
+DEFAULT_MAX_DOCUMENTS_IN_MEMORY = 100000
+SPILL_PARTITIONS = 16
+
+
+def get_field(document: Mapping, path: str):
+    """"a.b" -> document["a"]["b"]"""
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, Mapping) or part not in value:
+            return Null()
+        value = value[part]
+    return value
+
+
+def evaluate(expression, document: dict):
+    """"$field" references, {key: expression} documents and literals"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return get_field(document, expression[1:])
+
+    if isinstance(expression, dict):
+        return {key: evaluate(value, document) for key, value in expression.items()}
+
+    return expression
+
+
+def _freeze(value):
+    """Hashable version of a group key"""
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, Null):
+        return None
+    return value
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class SumAccumulator:
+    __slots__ = ("total",)
+
+    def __init__(self):
+        self.total = 0
+
+    def add(self, value):
+        if _is_number(value):
+            self.total += value
+
+    def merge(self, other: "SumAccumulator"):
+        self.total += other.total
+
+    def result(self):
+        return self.total
+
+
+class AvgAccumulator:
+    __slots__ = ("total", "count")
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def add(self, value):
+        if _is_number(value):
+            self.total += value
+            self.count += 1
+
+    def merge(self, other: "AvgAccumulator"):
+        self.total += other.total
+        self.count += other.count
+
+    def result(self):
+        return self.total / self.count if self.count else None
+
+
+class MinAccumulator:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = None
+
+    def _better(self, value) -> bool:
+        return value < self.value
+
+    def add(self, value):
+        if value is None or isinstance(value, Null):
+            return
+        if self.value is None or self._better(value):
+            self.value = value
+
+    def merge(self, other: "MinAccumulator"):
+        self.add(other.value)
+
+    def result(self):
+        return self.value
+
+
+class MaxAccumulator(MinAccumulator):
+    __slots__ = ()
+
+    def _better(self, value) -> bool:
+        return value > self.value
+
+
+class PushAccumulator:
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values = []
+
+    def add(self, value):
+        if not isinstance(value, Null):
+            self.values.append(value)
+
+    def merge(self, other: "PushAccumulator"):
+        self.values.extend(other.values)
+
+    def result(self):
+        return self.values
+
+
+class FirstAccumulator:
+    __slots__ = ("value", "empty")
+
+    def __init__(self):
+        self.value = None
+        self.empty = True
+
+    def add(self, value):
+        if self.empty:
+            self.value = None if isinstance(value, Null) else value
+            self.empty = False
+
+    def merge(self, other: "FirstAccumulator"):
+        # Partial states are merged in the order they were spilled
+        if self.empty and not other.empty:
+            self.value, self.empty = other.value, False
+
+    def result(self):
+        return self.value
+
+
+class LastAccumulator(FirstAccumulator):
+    __slots__ = ()
+
+    def add(self, value):
+        self.value = None if isinstance(value, Null) else value
+        self.empty = False
+
+    def merge(self, other: "LastAccumulator"):
+        if not other.empty:
+            self.value, self.empty = other.value, False
+
+
+ACCUMULATORS = {
+    "$sum": SumAccumulator,
+    "$avg": AvgAccumulator,
+    "$min": MinAccumulator,
+    "$max": MaxAccumulator,
+    "$push": PushAccumulator,
+    "$first": FirstAccumulator,
+    "$last": LastAccumulator,
+}
+
+
+class _SpillFiles:
+    """Pickled records in anonymous temporary files"""
+
+    def __init__(self, count: int):
+        self._files = [tempfile.TemporaryFile() for _ in range(count)]
+
+    def write(self, i: int, record):
+        pickle.dump(record, self._files[i], protocol=pickle.HIGHEST_PROTOCOL)
+
+    def read(self, i: int) -> Iterator:
+        file = self._files[i]
+        file.seek(0)
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+    def __len__(self):
+        return len(self._files)
+
+    def close(self):
+        for file in self._files:
+            file.close()
+
+
+def group_stage(
+    documents: Iterable[dict], specification: dict, max_groups_in_memory: int
+) -> Iterator[dict]:
+    """
+    Hash aggregation, when the table outgrows the budget its partial states
+    are spilled to hash partitions which are merged one at a time at the end
+    """
+    key_expression = specification["_id"]
+    accumulators_specification = []
+    for field, accumulator in specification.items():
+        if field == "_id":
+            continue
+        (operator, expression), = accumulator.items()
+        if operator not in ACCUMULATORS:
+            raise ValueError(f"Unknown group accumulator '{operator}'")
+        accumulators_specification.append((field, ACCUMULATORS[operator], expression))
+
+    def new_state():
+        return [accumulator() for _, accumulator, _ in accumulators_specification]
+
+    groups: Dict[Any, tuple] = {}  # {frozen key: (key, [accumulators])}
+    spill_files = None
+
+    def spill():
+        nonlocal spill_files
+        if spill_files is None:
+            spill_files = _SpillFiles(SPILL_PARTITIONS)
+
+        for frozen_key, group in groups.items():
+            spill_files.write(hash(frozen_key) % SPILL_PARTITIONS, (frozen_key, group))
+        groups.clear()
+
+    def results(table: dict) -> Iterator[dict]:
+        for key, states in table.values():
+            result = {"_id": key}
+            for state, (field, _, _) in zip(states, accumulators_specification):
+                result[field] = state.result()
+            yield result
+
+    try:
+        for document in documents:
+            key = evaluate(key_expression, document)
+            if isinstance(key, Null):
+                key = None
+            frozen_key = _freeze(key)
+
+            if frozen_key not in groups:
+                if len(groups) >= max_groups_in_memory:
+                    spill()
+                groups[frozen_key] = (key, new_state())
+
+            states = groups[frozen_key][1]
+            for state, (_, _, expression) in zip(states, accumulators_specification):
+                state.add(evaluate(expression, document))
+
+        if spill_files is None:
+            yield from results(groups)
+            return
+
+        spill()
+        for partition in range(len(spill_files)):
+            table = {}
+            for frozen_key, (key, states) in spill_files.read(partition):
+                if frozen_key not in table:
+                    table[frozen_key] = (key, states)
+                    continue
+
+                for state, other in zip(table[frozen_key][1], states):
+                    state.merge(other)
+
+            yield from results(table)
+    finally:
+        if spill_files is not None:
+            spill_files.close()
+
+
+def _type_order(value) -> int:
+    if value is None or isinstance(value, Null):
+        return 0
+    if _is_number(value):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    return 5
+
+
+def sort_key(specification: dict) -> Callable:
+    fields = list(specification.items())
+
+    def compare(a: dict, b: dict) -> int:
+        for field, direction in fields:
+            first, second = get_field(a, field), get_field(b, field)
+            first_order, second_order = _type_order(first), _type_order(second)
+
+            if first_order != second_order:
+                result = first_order - second_order
+            elif first_order == 0:
+                result = 0
+            else:
+                try:
+                    result = (first > second) - (first < second)
+                except TypeError:
+                    result = 0
+
+            if result:
+                return result * direction
+
+        return 0
+
+    return cmp_to_key(compare)
+
+
+def sort_stage(
+    documents: Iterable[dict],
+    specification: dict,
+    max_documents_in_memory: int,
+    limit: int = None,
+) -> Iterator[dict]:
+    """
+    Top-k heap when a limit follows the sort, otherwise external merge sort
+    with sorted runs spilled to disk once the buffer is full
+    """
+    key = sort_key(specification)
+
+    if limit is not None and limit <= max_documents_in_memory:
+        yield from heapq.nsmallest(limit, documents, key=key)
+        return
+
+    runs: List[_SpillFiles] = []
+    buffer = []
+
+    try:
+        for document in documents:
+            buffer.append(document)
+            if len(buffer) >= max_documents_in_memory:
+                buffer.sort(key=key)
+                run = _SpillFiles(1)
+                for item in buffer:
+                    run.write(0, item)
+                runs.append(run)
+                buffer = []
+
+        buffer.sort(key=key)
+        if not runs:
+            yield from buffer
+            return
+
+        yield from heapq.merge(buffer, *(run.read(0) for run in runs), key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def project_stage(documents: Iterable[dict], specification: dict) -> Iterator[dict]:
+    computed = {
+        field: expression
+        for field, expression in specification.items()
+        if not isinstance(expression, (bool, int))
+    }
+    fields = {
+        field: include
+        for field, include in specification.items()
+        if field not in computed
+    }
+
+    for document in documents:
+        if computed:
+            # Computed fields are included fields, an excluded field (_id) is just left out
+            projected = {
+                field: document[field]
+                for field, include in fields.items()
+                if include and field in document
+            }
+        elif fields:
+            projected = update_with_fields(dict(document), fields)
+        else:
+            projected = dict(document)
+
+        for field, expression in computed.items():
+            value = evaluate(expression, document)
+            if not isinstance(value, Null):
+                projected[field] = value
+        yield projected
+
+
+def count_stage(documents: Iterable[dict], field: str) -> Iterator[dict]:
+    yield {field: sum(1 for _ in documents)}
+
+
+def run_pipeline(
+    documents: Iterable[dict],
+    pipeline: List[dict],
+    max_documents_in_memory: int = DEFAULT_MAX_DOCUMENTS_IN_MEMORY,
+) -> Iterator[dict]:
+    """Chain the stages as generators, documents flow through one at a time"""
+    stages = list(pipeline)
+    i = 0
+
+    while i < len(stages):
+        (stage, specification), = stages[i].items()
+
+        if stage == "$match":
+            documents = (
+                document
+                for document in documents
+                if document_filter_match(document, specification)
+            )
+        elif stage == "$project":
+            documents = project_stage(documents, specification)
+        elif stage == "$group":
+            documents = group_stage(documents, specification, max_documents_in_memory)
+        elif stage == "$sort":
+            limit = None
+            if i + 1 < len(stages) and "$limit" in stages[i + 1]:
+                limit = stages[i + 1]["$limit"]
+            documents = sort_stage(documents, specification, max_documents_in_memory, limit)
+        elif stage == "$limit":
+            documents = islice(documents, specification)
+        elif stage == "$skip":
+            documents = islice(documents, specification, None)
+        elif stage == "$count":
+            documents = count_stage(documents, specification)
+        else:
+            raise ValueError(f"Unknown pipeline stage '{stage}'")
+
+        i += 1
+
+    return iter(documents)
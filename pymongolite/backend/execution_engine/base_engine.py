@@ -48,6 +48,36 @@ class BaseEngine(ABC):
     ):
         pass
 
+    @abstractmethod
+    def aggregate(self, database_name: str, collection_name: str, pipeline: list):
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_documents(
+        self, database_name: str, collection_name: str, filter_: dict
+    ) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def estimated_document_count(self, database_name: str, collection_name: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def distinct(
+        self, database_name: str, collection_name: str, field: str, filter_: dict = None
+    ) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def bulk_write(
+        self,
+        database_name: str,
+        collection_name: str,
+        requests: List[dict],
+        ordered: bool = True,
+    ) -> dict:
+        raise NotImplementedError
+
     @abstractmethod
     def update(
         self,
@@ -56,6 +86,22 @@ class BaseEngine(ABC):
         filter_: dict,
         override: dict,
         many: bool = True,
+        upsert: bool = False,
+    ):
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_and_modify(
+        self,
+        database_name: str,
+        collection_name: str,
+        filter_: dict,
+        override: dict = None,
+        replacement: dict = None,
+        remove: bool = False,
+        upsert: bool = False,
+        return_new: bool = False,
+        fields: dict = None,
     ):
         raise NotImplementedError
 
@@ -67,6 +113,7 @@ class BaseEngine(ABC):
         filter_: dict,
         replacement: dict,
         many: bool = True,
+        upsert: bool = False,
     ):
         raise NotImplementedError
 
@@ -81,7 +128,9 @@ class BaseEngine(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def create_index(self, database_name: str, collection_name: str, index: dict):
+    def create_index(
+        self, database_name: str, collection_name: str, index: dict, **options
+    ):
         raise NotImplementedError
 
     @abstractmethod
@@ -1,15 +1,33 @@
-from typing import List, Union, Tuple
-from threading import RLock
+from typing import List, Union, Tuple, Iterable, Dict, Any
 from collections import defaultdict
+from contextlib import contextmanager, ExitStack
+from copy import deepcopy
+from itertools import islice
+from queue import Empty, Queue
+from threading import Event, Thread
 
 from pymongolite.backend.command import Command, COMMANDS
 from pymongolite.backend.utils import (
     document_filter_match,
+    validate_filter,
     update_document_with_override,
     update_with_fields,
     grouper,
+    unique_values,
+    build_upsert_document,
+    raw_needles,
 )
 from pymongolite.backend.objectid import ObjectId
+from pymongolite.backend.locks import ReadWriteLock
+from pymongolite.backend.transaction import Transaction, TransactionManager, CollectionKey
+from pymongolite.backend.exceptions import (
+    CollectionNotFound,
+    DuplicateKeyError,
+    TransactionConflict,
+    TransactionNotActive,
+)
+from pymongolite.backend.document import Document
+from pymongolite.backend.raw_document import RawDocument
 from pymongolite.backend.storage_engine.base_engine import BaseEngine as BaseStorageEngine
 from pymongolite.backend.read_instructions import ReadInstructions
 from pymongolite.backend.storage_engine.insert_instruction import InsertInstructions
@@ -17,10 +35,26 @@ from pymongolite.backend.storage_engine.update_instructions import UpdateInstruc
 from pymongolite.backend.indexing_engine.base_engine import BaseEngine as BaseIndexingEngine
 from pymongolite.backend.execution_engine.exceptions import DatabaseIsRequired, CollectionIsRequired
 from pymongolite.backend.execution_engine.cursor import Cursor
+from pymongolite.backend.execution_engine.aggregation import (
+    get_field,
+    run_pipeline,
+    DEFAULT_MAX_DOCUMENTS_IN_MEMORY,
+)
 from pymongolite.backend.execution_engine.base_engine import BaseEngine
+from pymongolite.backend.execution_engine.query_cache import QueryCache
 
 DEFAULT_CHUNK_SIZE = 5 * 1024
 
+# Commands that only read, they share the collection lock
+READ_COMMANDS = {
+    COMMANDS.find,
+    COMMANDS.aggregate,
+    COMMANDS.count_documents,
+    COMMANDS.estimated_document_count,
+    COMMANDS.distinct,
+    COMMANDS.get_index_list,
+}
+
 
 class ChunkedEngine(BaseEngine):
     def __init__(
@@ -28,20 +62,146 @@ class ChunkedEngine(BaseEngine):
         storage_engine: BaseStorageEngine,
         indexing_engine: BaseIndexingEngine = None,
         chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_documents_in_memory: int = DEFAULT_MAX_DOCUMENTS_IN_MEMORY,
+        query_cache_size: int = 0,
+        read_ahead_chunks: int = 0,
     ):
-        self.__collection_locks = defaultdict(RLock)
+        """
+        :Parameters:
+          - `query_cache_size` (optional): Bytes of read results kept in memory,
+            0 disables the query cache.
+          - `read_ahead_chunks` (optional): Chunks a background thread reads ahead
+            of find and aggregate cursors, 0 reads every chunk when it's needed.
+        """
+        self.__collection_locks = defaultdict(ReadWriteLock)
+        self._query_cache = QueryCache(query_cache_size) if query_cache_size else None
+        self._transactions = TransactionManager()
         self._closed = False
         self._chunk_size = chunk_size
+        self._max_documents_in_memory = max_documents_in_memory
+        self._read_ahead_chunks = read_ahead_chunks
 
         super().__init__(storage_engine=storage_engine, indexing_engine=indexing_engine)
 
+        self._replay_journals()
+
     def execute_command(self, command: Command):
+        if command.cmd == COMMANDS.start_transaction:
+            return self.start_transaction()
+
+        if command.cmd == COMMANDS.commit_transaction:
+            return self.commit_transaction(command.transaction)
+
+        if command.cmd == COMMANDS.abort_transaction:
+            return self.abort_transaction(command.transaction)
+
         if command.collection_name is None:
             return self._execute_command(command)
 
-        with self.__collection_locks[command.collection_name]:
+        self._raise_on_none_database(command.database_name)
+
+        database_name, collection_name = command.database_name, command.collection_name
+        lock = self.__collection_lock(database_name, collection_name)
+
+        self.__sync_collection(database_name, collection_name)
+
+        if command.cmd in READ_COMMANDS:
+            with lock.read_locked():
+                return self._execute_command(command)
+
+        # Writes hold the storage for the whole command, other processes included
+        with lock.write_locked(), self._storage_engine.collection_lock(
+            database_name, collection_name, exclusive=True
+        ):
+            # Another process may have written between the check above and the lock
+            self._reload_collection(database_name, collection_name)
             return self._execute_command(command)
 
+    def __collection_lock(self, database_name: str, collection_name: str) -> ReadWriteLock:
+        return self.__collection_locks[f"{database_name}.{collection_name}"]
+
+    @contextmanager
+    def __locked_collections(self, collections: Iterable[CollectionKey]):
+        collections = sorted(collections)
+
+        with ExitStack() as stack:
+            # Always taken in the same order, two commits can't wait for each other
+            for database_name, collection_name in collections:
+                stack.enter_context(self.__collection_lock(database_name, collection_name).write_locked())
+                stack.enter_context(
+                    self._storage_engine.collection_lock(
+                        database_name, collection_name, exclusive=True
+                    )
+                )
+
+            # The indexes of a commit are current only once no other process can write
+            for database_name, collection_name in collections:
+                self._reload_collection(database_name, collection_name)
+            yield
+
+    def __sync_collection(self, database_name: str, collection_name: str):
+        # Another process changed the collection, the indexes are rebuilt before using them.
+        # A collection is also indexed once when first used, ids are looked up in the indexes.
+        if (
+            self._storage_engine.get_changed_version(database_name, collection_name) is not None
+            or not self._is_collection_loaded(database_name, collection_name)
+        ):
+            with self.__collection_lock(database_name, collection_name).write_locked():
+                self._reload_collection(database_name, collection_name)
+
+    def lock_stats(self) -> dict:
+        """{collection full name: lock stats}"""
+        return {
+            name: lock.stats.to_dict() for name, lock in list(self.__collection_locks.items())
+        }
+
+    def query_cache_stats(self) -> Union[dict, None]:
+        """Hits, misses and size of the query cache, None when it's disabled"""
+        if self._query_cache is None:
+            return None
+
+        return self._query_cache.stats.to_dict()
+
+    def _invalidate_cache(self, database_name: str, collection_name: str):
+        if self._query_cache is not None:
+            self._query_cache.invalidate(database_name, collection_name)
+
+    def _reload_collection(self, database_name: str, collection_name: str):
+        # Shared storage lock, no process writes while the documents are indexed again
+        with self._storage_engine.collection_lock(database_name, collection_name):
+            version = self._storage_engine.get_changed_version(database_name, collection_name)
+            if version is None and self._is_collection_loaded(database_name, collection_name):
+                return
+
+            if self._is_indexing_engine_used:
+                self._indexing_engine.reset_collection(database_name, collection_name)
+
+                if self._storage_engine.is_collection_exists(database_name, collection_name):
+                    for documents in grouper(
+                        self._chunk_size,
+                        self._iter_documents_filtered(
+                            database_name, collection_name, {}, use_indexes=False
+                        ),
+                    ):
+                        self._indexing_engine.insert_documents(
+                            database_name,
+                            collection_name,
+                            documents=[
+                                (document.data, document.lookup_key) for document in documents
+                            ],
+                        )
+
+                self._indexing_engine.set_collection_loaded(database_name, collection_name)
+
+            self._invalidate_cache(database_name, collection_name)
+            if version is not None:
+                self._storage_engine.mark_synced(database_name, collection_name, version)
+
+    def _is_collection_loaded(self, database_name: str, collection_name: str) -> bool:
+        return not self._is_indexing_engine_used or self._indexing_engine.is_collection_loaded(
+            database_name, collection_name
+        )
+
     def _execute_command(self, command: Command):
         self._raise_on_none_database(command.database_name)
 
@@ -74,6 +234,7 @@ class ChunkedEngine(BaseEngine):
                 database_name=command.database_name,
                 collection_name=command.collection_name,
                 documents=command.documents,
+                transaction=command.transaction,
             )
 
         if command.cmd == COMMANDS.delete:
@@ -83,6 +244,7 @@ class ChunkedEngine(BaseEngine):
                 collection_name=command.collection_name,
                 filter_=command.filter,
                 many=command.many,
+                transaction=command.transaction,
             )
 
         if command.cmd == COMMANDS.find:
@@ -93,8 +255,52 @@ class ChunkedEngine(BaseEngine):
                 filter_=command.filter,
                 fields=command.fields,
                 many=command.many,
+                limit=command.limit,
+                transaction=command.transaction,
             ))
 
+        if command.cmd == COMMANDS.aggregate:
+            self._raise_on_none_collection(command.collection_name)
+            return Cursor(self.aggregate(
+                database_name=command.database_name,
+                collection_name=command.collection_name,
+                pipeline=command.pipeline,
+            ))
+
+        if command.cmd == COMMANDS.count_documents:
+            self._raise_on_none_collection(command.collection_name)
+            return self.count_documents(
+                database_name=command.database_name,
+                collection_name=command.collection_name,
+                filter_=command.filter,
+                transaction=command.transaction,
+            )
+
+        if command.cmd == COMMANDS.estimated_document_count:
+            self._raise_on_none_collection(command.collection_name)
+            return self.estimated_document_count(
+                database_name=command.database_name,
+                collection_name=command.collection_name,
+            )
+
+        if command.cmd == COMMANDS.distinct:
+            self._raise_on_none_collection(command.collection_name)
+            return self.distinct(
+                database_name=command.database_name,
+                collection_name=command.collection_name,
+                field=command.field,
+                filter_=command.filter,
+            )
+
+        if command.cmd == COMMANDS.bulk_write:
+            self._raise_on_none_collection(command.collection_name)
+            return self.bulk_write(
+                database_name=command.database_name,
+                collection_name=command.collection_name,
+                requests=command.requests,
+                ordered=command.ordered,
+            )
+
         if command.cmd == COMMANDS.update:
             self._raise_on_none_collection(command.collection_name)
             return self.update(
@@ -103,6 +309,8 @@ class ChunkedEngine(BaseEngine):
                 filter_=command.filter,
                 override=command.override,
                 many=command.many,
+                upsert=bool(command.upsert),
+                transaction=command.transaction,
             )
 
         if command.cmd == COMMANDS.replace:
@@ -113,6 +321,22 @@ class ChunkedEngine(BaseEngine):
                 filter_=command.filter,
                 replacement=command.replacement,
                 many=command.many,
+                upsert=bool(command.upsert),
+                transaction=command.transaction,
+            )
+
+        if command.cmd == COMMANDS.find_and_modify:
+            self._raise_on_none_collection(command.collection_name)
+            return self.find_and_modify(
+                database_name=command.database_name,
+                collection_name=command.collection_name,
+                filter_=command.filter,
+                override=command.override,
+                replacement=command.replacement,
+                remove=bool(command.remove),
+                upsert=bool(command.upsert),
+                return_new=bool(command.return_new),
+                fields=command.fields,
             )
 
         if command.cmd == COMMANDS.create_index:
@@ -121,6 +345,7 @@ class ChunkedEngine(BaseEngine):
                 database_name=command.database_name,
                 collection_name=command.collection_name,
                 index=command.index,
+                **(command.options or {}),
             )
 
         if command.cmd == COMMANDS.delete_index:
@@ -144,6 +369,12 @@ class ChunkedEngine(BaseEngine):
         return self._storage_engine.create_database(database_name=database_name)
 
     def drop_database(self, database_name: str) -> bool:
+        if self._is_indexing_engine_used:
+            self._indexing_engine.drop_database(database_name)
+
+        if self._query_cache is not None:
+            self._query_cache.invalidate_database(database_name)
+
         return self._storage_engine.drop_database(database_name=database_name)
 
     def create_collection(self, database_name: str, collection_name: str) -> bool:
@@ -153,6 +384,11 @@ class ChunkedEngine(BaseEngine):
         )
 
     def drop_collection(self, database_name: str, collection_name: str) -> bool:
+        if self._is_indexing_engine_used:
+            self._indexing_engine.drop_collection(database_name, collection_name)
+
+        self._invalidate_cache(database_name, collection_name)
+
         return self._storage_engine.drop_collection(
             database_name=database_name,
             collection_name=collection_name,
@@ -168,19 +404,300 @@ class ChunkedEngine(BaseEngine):
         filter_: dict,
         fields: dict = None,
         many: bool = True,
+        limit: int = None,
+        transaction: Transaction = None,
         **kwargs
     ):
         if fields is None:
             fields = {}
 
-        for document in self._iter_documents_filtered(
-            database_name, collection_name, filter_
-        ):
-            yield update_with_fields(document.data, fields)
+        # find_one stop iterating after returning one
+        if not many:
+            limit = 1
 
-            # find_one stop iterating after returning one
-            if not many:
-                break
+        cache_key = None
+        if transaction is None and self._query_cache is not None:
+            cache_key = self._query_cache.make_key(
+                database_name, collection_name, "find", filter_, fields, limit
+            )
+
+        if cache_key is not None:
+            documents = self._query_cache.documents(cache_key)
+            if documents is not None:
+                return documents
+
+            # Taken before the snapshot, a write after it makes the result stale
+            version = self._query_cache.version(database_name, collection_name)
+
+        # {"score": {"$meta": "textScore"}}
+        meta_fields = {
+            field: include["$meta"]
+            for field, include in fields.items()
+            if isinstance(include, dict) and "$meta" in include
+        }
+        fields = {
+            field: include for field, include in fields.items() if field not in meta_fields
+        }
+
+        # The cursor reads from the snapshot taken here
+        if transaction is not None:
+            documents = self._transaction_documents(
+                database_name, collection_name, filter_, transaction
+            )
+        else:
+            # A small limit is usually reached in the first chunk
+            documents = self._iter_documents_filtered(
+                database_name,
+                collection_name,
+                filter_,
+                raw_documents=True,
+                read_ahead=not limit or limit > self._chunk_size,
+            )
+
+        if limit:
+            documents = islice(documents, limit)
+
+        documents = self._projected(documents, fields, meta_fields)
+        if cache_key is not None:
+            return self._query_cache.fill(cache_key, version, documents)
+
+        return documents
+
+    @staticmethod
+    def _projected(documents: Iterable[Document], fields: dict, meta_fields: dict):
+        # Only included fields are decoded, otherwise the whole document is
+        include_only = bool(fields) and bool(next(iter(fields.values())))
+
+        for document in documents:
+            data = document.data
+            if not include_only and isinstance(data, RawDocument):
+                data = data.to_dict()
+            data = update_with_fields(data, fields)
+
+            for field, meta in meta_fields.items():
+                if meta in ("textScore", "vectorSearchScore"):
+                    data[field] = document.score
+                elif meta == "geoNearDistance":
+                    data[field] = -document.score
+
+            yield data
+
+    def aggregate(self, database_name: str, collection_name: str, pipeline: list):
+        cache_key = None
+        if self._query_cache is not None:
+            cache_key = self._query_cache.make_key(
+                database_name, collection_name, "aggregate", pipeline
+            )
+
+        if cache_key is not None:
+            documents = self._query_cache.documents(cache_key)
+            if documents is not None:
+                return documents
+
+            version = self._query_cache.version(database_name, collection_name)
+
+        pipeline = list(pipeline)
+
+        # {"$vectorSearch": {"path": ..., "queryVector": ..., "limit": ...}} is a $match on its index
+        if pipeline and "$vectorSearch" in pipeline[0]:
+            vector_search = dict(pipeline[0]["$vectorSearch"])
+            path = vector_search.pop("path")
+            pipeline[0] = {"$match": {path: {"$vectorSearch": vector_search}}}
+
+        # Leading $match stages are answered with the indexes
+        matches = []
+        while pipeline and "$match" in pipeline[0]:
+            matches.append(pipeline.pop(0)["$match"])
+
+        if len(matches) > 1:
+            filter_ = {"$and": matches}
+        else:
+            filter_ = matches[0] if matches else {}
+
+        documents = (
+            document.data
+            for document in self._iter_documents_filtered(
+                database_name, collection_name, filter_, raw_documents=True, read_ahead=True
+            )
+        )
+
+        documents = self._pipeline_results(documents, pipeline)
+        if cache_key is not None:
+            return self._query_cache.fill(cache_key, version, documents)
+
+        return documents
+
+    def _pipeline_results(self, documents: Iterable[dict], pipeline: list):
+        for document in run_pipeline(documents, pipeline, self._max_documents_in_memory):
+            yield document.to_dict() if isinstance(document, RawDocument) else document
+
+    def count_documents(
+        self,
+        database_name: str,
+        collection_name: str,
+        filter_: dict,
+        transaction: Transaction = None,
+    ) -> int:
+        if transaction is not None:
+            return sum(
+                1
+                for _ in self._transaction_documents(
+                    database_name, collection_name, filter_ or {}, transaction
+                )
+            )
+
+        if not filter_:
+            return self.estimated_document_count(database_name, collection_name)
+
+        # Filter answered by the indexes, no document is read
+        if self._is_indexing_engine_used:
+            count = self._indexing_engine.count_documents(
+                database_name, collection_name, filter_
+            )
+            if count is not None:
+                return count
+
+        cache_key = None
+        if self._query_cache is not None:
+            cache_key = self._query_cache.make_key(
+                database_name, collection_name, "count", filter_
+            )
+
+        if cache_key is not None:
+            count = self._query_cache.get(cache_key)
+            if count is not None:
+                return count
+
+            version = self._query_cache.version(database_name, collection_name)
+
+        count = sum(
+            1
+            for _ in self._iter_documents_filtered(
+                database_name, collection_name, filter_, raw_documents=True
+            )
+        )
+
+        if cache_key is not None:
+            self._query_cache.put(cache_key, version, count, 0)
+
+        return count
+
+    def estimated_document_count(self, database_name: str, collection_name: str) -> int:
+        return self._storage_engine.get_documents_count(
+            database_name=database_name, collection_name=collection_name
+        )
+
+    def distinct(
+        self, database_name: str, collection_name: str, field: str, filter_: dict = None
+    ) -> list:
+        # The index keys are the distinct values, no document is read
+        if not filter_ and self._is_indexing_engine_used:
+            values = self._indexing_engine.distinct(database_name, collection_name, field)
+            if values is not None:
+                return values
+
+        return unique_values(
+            get_field(document.data, field)
+            for document in self._iter_documents_filtered(
+                database_name, collection_name, filter_ or {}, raw_documents=True
+            )
+        )
+
+    def bulk_write(
+        self,
+        database_name: str,
+        collection_name: str,
+        requests: List[dict],
+        ordered: bool = True,
+    ) -> dict:
+        """
+        Run the write requests in order under the collection lock, consecutive inserts are
+        written with one storage and one index call, updates and deletes one after the other
+        :return: {"results": [result of every request or None], "errors": [{"index": i, "error": e}]}
+        """
+        results = [None] * len(requests)
+        errors = []
+        i = 0
+
+        while i < len(requests) and not (ordered and errors):
+            if requests[i]["cmd"] != COMMANDS.insert:
+                try:
+                    results[i] = self._execute_write_request(
+                        database_name, collection_name, requests[i]
+                    )
+                except Exception as e:
+                    errors.append({"index": i, "error": e})
+
+                i += 1
+                continue
+
+            # Consecutive inserts are written with one storage and one index call
+            end = i
+            while end < len(requests) and requests[end]["cmd"] == COMMANDS.insert:
+                end += 1
+
+            try:
+                inserted_ids = self.insert(
+                    database_name,
+                    collection_name,
+                    [document for request in requests[i:end] for document in request["documents"]],
+                )
+            except Exception:
+                # Nothing of the group was written, every insert is retried alone for its result
+                for j in range(i, end):
+                    if ordered and errors:
+                        break
+                    try:
+                        results[j] = {
+                            "inserted_ids": self.insert(
+                                database_name, collection_name, requests[j]["documents"]
+                            )
+                        }
+                    except Exception as e:
+                        errors.append({"index": j, "error": e})
+            else:
+                inserted_ids = iter(inserted_ids)
+                for j in range(i, end):
+                    results[j] = {
+                        "inserted_ids": list(islice(inserted_ids, len(requests[j]["documents"])))
+                    }
+
+            i = end
+
+        return {"results": results, "errors": errors}
+
+    def _execute_write_request(
+        self, database_name: str, collection_name: str, request: dict
+    ) -> dict:
+        if request["cmd"] == COMMANDS.update:
+            return self.update(
+                database_name,
+                collection_name,
+                filter_=request["filter"],
+                override=request["override"],
+                many=request["many"],
+                upsert=request.get("upsert", False),
+            )
+
+        if request["cmd"] == COMMANDS.replace:
+            return self.replace(
+                database_name,
+                collection_name,
+                filter_=request["filter"],
+                replacement=request["replacement"],
+                many=request["many"],
+                upsert=request.get("upsert", False),
+            )
+
+        if request["cmd"] == COMMANDS.delete:
+            return self.delete(
+                database_name,
+                collection_name,
+                filter_=request["filter"],
+                many=request["many"],
+            )
+
+        raise ValueError(f"Command {request['cmd']} can't be used in bulk write")
 
     def update(
         self,
@@ -190,9 +707,25 @@ class ChunkedEngine(BaseEngine):
         override: dict = None,
         replacement: dict = None,
         many: bool = True,
+        upsert: bool = False,
+        transaction: Transaction = None,
     ):
-        if override is None and replacement is None:
-            raise ValueError("Update requires one of override or replacement")
+        self._validate_update(override, replacement)
+
+        if transaction is not None:
+            return self._transaction_update(
+                database_name,
+                collection_name,
+                filter_,
+                override,
+                replacement,
+                many,
+                upsert,
+                transaction,
+            )
+
+        matched_count = 0
+        modified_count = 0
 
         for documents_chunk in self._filtered_chunks(
             database_name=database_name,
@@ -200,48 +733,145 @@ class ChunkedEngine(BaseEngine):
             filter_=filter_,
             many=many,
         ):
-            documents_updated = {}
-            old_updated_documents = []
-            new_updated_documents = []
+            matched_count += len(documents_chunk)
+            updates = []
 
             for document in documents_chunk:
-                if override:
-                    updated_document = update_document_with_override(
-                        document.data, override
-                    )
-                else:
-                    updated_document = replacement
-                    updated_document["_id"] = ObjectId()
-
-                updated_document["_id"] = str(updated_document["_id"])
+                updated_document = self._updated_document(document.data, override, replacement)
 
                 # Document was updated
                 if updated_document != document.data:
-                    old_updated_documents.append(document.data)
-                    new_updated_documents.append(updated_document)
-                    documents_updated[document.lookup_key] = updated_document
-
-            if documents_updated:
-                updated_documents = self._storage_engine.update_documents(
-                    database_name=database_name,
-                    collection_name=collection_name,
-                    update_instructions=UpdateInstructions(
-                        overwrites=documents_updated
-                    ),
-                )
-            else:
-                continue
+                    updates.append((document, updated_document))
 
-            if self._is_indexing_engine_used:
-                self._indexing_engine.delete_documents(
-                    database_name, collection_name, old_updated_documents
-                )
-                self._indexing_engine.insert_documents(
-                    database_name,
-                    collection_name,
-                    [(document.data, document.lookup_key) for document in updated_documents]
+            modified_count += len(updates)
+            self._write_updates(database_name, collection_name, updates)
+
+        result = {"matched_count": matched_count, "modified_count": modified_count}
+
+        if upsert and not matched_count:
+            document = self._upsert(
+                database_name, collection_name, filter_, override, replacement
+            )
+            result["upserted_id"] = document["_id"]
+
+        return result
+
+    def find_and_modify(
+        self,
+        database_name: str,
+        collection_name: str,
+        filter_: dict,
+        override: dict = None,
+        replacement: dict = None,
+        remove: bool = False,
+        upsert: bool = False,
+        return_new: bool = False,
+        fields: dict = None,
+    ) -> Union[dict, None]:
+        """
+        Read, modify and write back the first matching document under the collection lock
+        :return: the document before the change or after it when return_new
+        """
+        if not remove:
+            self._validate_update(override, replacement)
+
+        document = next(
+            iter(self._iter_documents_filtered(database_name, collection_name, filter_)),
+            None,
+        )
+
+        if document is None:
+            if remove or not upsert:
+                return None
+
+            data = self._upsert(database_name, collection_name, filter_, override, replacement)
+            if not return_new:
+                return None
+        elif remove:
+            self._delete_documents(database_name, collection_name, [document])
+            data = document.data
+        else:
+            updated_document = self._updated_document(document.data, override, replacement)
+            if updated_document != document.data:
+                self._write_updates(
+                    database_name, collection_name, [(document, updated_document)]
                 )
 
+            data = dict(updated_document) if return_new else document.data
+
+        return update_with_fields(data, fields or {})
+
+    @staticmethod
+    def _validate_update(override: Union[dict, None], replacement: Union[dict, None]):
+        if override is None and replacement is None:
+            raise ValueError("Update requires one of override or replacement")
+
+        if override is not None and (
+            not override or not all(action.startswith("$") for action in override)
+        ):
+            raise ValueError("Update override only works with $ operators")
+
+    @staticmethod
+    def _updated_document(data: dict, override: dict, replacement: dict) -> dict:
+        if override:
+            updated_document = update_document_with_override(data, override)
+        else:
+            updated_document = dict(replacement)
+
+        # The document keeps its id, also when replaced
+        updated_document["_id"] = data["_id"]
+        return updated_document
+
+    def _write_updates(
+        self,
+        database_name: str,
+        collection_name: str,
+        updates: List[Tuple[Document, dict]],
+    ) -> List[Document]:
+        if not updates:
+            return []
+
+        updated_documents = self._storage_engine.update_documents(
+            database_name=database_name,
+            collection_name=collection_name,
+            update_instructions=UpdateInstructions(
+                overwrites={
+                    document.lookup_key: updated_document
+                    for document, updated_document in updates
+                }
+            ),
+        )
+
+        if self._is_indexing_engine_used:
+            self._indexing_engine.update_documents(
+                database_name,
+                collection_name,
+                [
+                    (document.data, updated_document.data, updated_document.lookup_key)
+                    for (document, _), updated_document in zip(updates, updated_documents)
+                ],
+            )
+
+        self._transactions.record(
+            database_name, collection_name, [document.data["_id"] for document, _ in updates]
+        )
+        self._invalidate_cache(database_name, collection_name)
+
+        return updated_documents
+
+    def _upsert(
+        self,
+        database_name: str,
+        collection_name: str,
+        filter_: dict,
+        override: dict = None,
+        replacement: dict = None,
+        transaction: Transaction = None,
+    ) -> dict:
+        document = build_upsert_document(filter_, override, replacement)
+        self.insert(database_name, collection_name, [document], transaction=transaction)
+        return document
+
     def replace(
             self,
             database_name: str,
@@ -249,18 +879,44 @@ class ChunkedEngine(BaseEngine):
             filter_: dict,
             replacement: dict = None,
             many: bool = True,
+            upsert: bool = False,
+            transaction: Transaction = None,
     ):
         return self.update(
             database_name=database_name,
             collection_name=collection_name,
             filter_=filter_,
             replacement=replacement,
-            many=many
+            many=many,
+            upsert=upsert,
+            transaction=transaction,
         )
 
     def delete(
-        self, database_name: str, collection_name: str, filter_: dict, many: bool = True
+        self,
+        database_name: str,
+        collection_name: str,
+        filter_: dict,
+        many: bool = True,
+        transaction: Transaction = None,
     ):
+        if transaction is not None:
+            documents = list(
+                islice(
+                    self._transaction_documents(
+                        database_name, collection_name, filter_, transaction
+                    ),
+                    None if many else 1,
+                )
+            )
+
+            writes = transaction.collection_writes(database_name, collection_name)
+            for document in documents:
+                writes[document.data["_id"]] = None
+
+            return {"deleted_count": len(documents)}
+
+        deleted_count = 0
 
         for documents_chunk in self._filtered_chunks(
             database_name=database_name,
@@ -268,28 +924,97 @@ class ChunkedEngine(BaseEngine):
             filter_=filter_,
             many=many,
         ):
-            documents_indexes = {document.lookup_key for document in documents_chunk}
-            documents_data = [document.data for document in documents_chunk]
+            self._delete_documents(database_name, collection_name, documents_chunk)
+            deleted_count += len(documents_chunk)
+
+        return {"deleted_count": deleted_count}
 
-            self._storage_engine.delete_documents(
-                database_name=database_name,
-                collection_name=collection_name,
-                delete_instructions=ReadInstructions(indexes=documents_indexes),
+    def _delete_documents(
+        self, database_name: str, collection_name: str, documents: List[Document]
+    ):
+        self._storage_engine.delete_documents(
+            database_name=database_name,
+            collection_name=collection_name,
+            delete_instructions=ReadInstructions(
+                indexes={document.lookup_key for document in documents}
+            ),
+        )
+
+        if self._is_indexing_engine_used:
+            self._indexing_engine.delete_documents(
+                database_name, collection_name, [document.data for document in documents]
             )
 
-            if self._is_indexing_engine_used:
-                self._indexing_engine.delete_documents(
-                    database_name, collection_name, documents_data
-                )
+        self._transactions.record(
+            database_name, collection_name, [document.data["_id"] for document in documents]
+        )
+        self._invalidate_cache(database_name, collection_name)
 
-    def insert(self, database_name: str, collection_name: str, documents: List[dict]):
+    def insert(
+        self,
+        database_name: str,
+        collection_name: str,
+        documents: List[dict],
+        transaction: Transaction = None,
+    ):
+        """:raise DuplicateKeyError: an id chosen by the client is already used"""
         inserted_object_ids = []
+        chosen_ids = []
 
         for document in documents:
-            oid = ObjectId()
-            document["_id"] = str(oid)
-            inserted_object_ids.append(oid)
+            # An id chosen by the client is kept, drivers generate them
+            if "_id" in document:
+                chosen_ids.append(document["_id"])
+            else:
+                document["_id"] = ObjectId()
+            inserted_object_ids.append(document["_id"])
+
+        if transaction is not None:
+            self._check_transaction(transaction)
+            writes = transaction.collection_writes(database_name, collection_name)
+            self._raise_on_used_ids(database_name, collection_name, chosen_ids, writes)
+            for document in documents:
+                writes[document["_id"]] = deepcopy(document)
+        else:
+            self._raise_on_used_ids(database_name, collection_name, chosen_ids)
+            self._insert_documents(database_name, collection_name, documents)
 
+        return inserted_object_ids
+
+    def _raise_on_used_ids(
+        self,
+        database_name: str,
+        collection_name: str,
+        document_ids: list,
+        writes: Dict[Any, Union[dict, None]] = None,
+    ):
+        """
+        An id repeated in the inserted documents or used by a stored one,
+        as the transaction of `writes` sees them when given
+        """
+        if not document_ids:
+            return
+
+        seen_ids = set()
+        for document_id in document_ids:
+            if document_id in seen_ids:
+                raise DuplicateKeyError(document_id)
+            seen_ids.add(document_id)
+
+        for document in self._iter_documents_filtered(
+            database_name, collection_name, {"_id": {"$in": document_ids}}, raw_documents=True
+        ):
+            document_id = document.data["_id"]
+            # Deleted by the transaction, its id is free again
+            if writes is None or writes.get(document_id, document) is not None:
+                raise DuplicateKeyError(document_id)
+
+        if writes is not None:
+            for document_id in document_ids:
+                if writes.get(document_id) is not None:
+                    raise DuplicateKeyError(document_id)
+
+    def _insert_documents(self, database_name: str, collection_name: str, documents: List[dict]):
         documents_lookup_keys = self._storage_engine.insert_documents(
             database_name=database_name,
             collection_name=collection_name,
@@ -306,14 +1031,223 @@ class ChunkedEngine(BaseEngine):
                 ],
             )
 
-        return inserted_object_ids
+        # A transaction inserting the same id conflicts
+        self._transactions.record(
+            database_name, collection_name, [document["_id"] for document in documents]
+        )
+        self._invalidate_cache(database_name, collection_name)
 
-    def create_index(self, database_name: str, collection_name: str, index: dict):
+    def start_transaction(self) -> Transaction:
+        return self._transactions.start()
+
+    def commit_transaction(self, transaction: Transaction):
+        """
+        Apply the writes of the transaction at once, under the locks of every collection it used
+        :raise TransactionConflict: a document it read or wrote was changed after it started
+        """
+        self._check_transaction(transaction)
+
+        try:
+            for database_name, collection_name in transaction.collections:
+                self.__sync_collection(database_name, collection_name)
+
+            with self.__locked_collections(transaction.collections):
+                if self._transactions.is_conflicting(transaction):
+                    raise TransactionConflict()
+
+                entries = []
+                for (database_name, collection_name), writes in sorted(
+                    transaction.writes.items()
+                ):
+                    if not writes:
+                        continue
+
+                    if not self._storage_engine.is_collection_exists(
+                        database_name, collection_name
+                    ):
+                        raise CollectionNotFound(database_name, collection_name)
+
+                    entries.append(
+                        {
+                            "database_name": database_name,
+                            "collection_name": collection_name,
+                            "documents": [
+                                [document_id, document] for document_id, document in writes.items()
+                            ],
+                        }
+                    )
+
+                if entries:
+                    # Written before any change, a commit cut in the middle is replayed on the next start
+                    self._storage_engine.write_journal(transaction.id, entries)
+                    self._apply_journal(transaction.id, entries)
+        finally:
+            self._transactions.finish(transaction)
+
+    def abort_transaction(self, transaction: Transaction):
+        self._check_transaction(transaction)
+        self._transactions.finish(transaction)
+
+    @staticmethod
+    def _check_transaction(transaction: Transaction):
+        if not transaction.active:
+            raise TransactionNotActive()
+
+    def _replay_journals(self):
+        for journal_id, entries in self._storage_engine.get_journals():
+            self._apply_journal(journal_id, entries)
+
+    def _apply_journal(self, journal_id: str, entries: List[dict]):
+        collections = [(entry["database_name"], entry["collection_name"]) for entry in entries]
+
+        with self.__locked_collections(collections):
+            for entry in entries:
+                database_name, collection_name = entry["database_name"], entry["collection_name"]
+
+                # Dropped since the commit
+                if not self._storage_engine.is_collection_exists(database_name, collection_name):
+                    continue
+
+                self._apply_writes(
+                    database_name,
+                    collection_name,
+                    {document_id: document for document_id, document in entry["documents"]},
+                )
+                self._storage_engine.sync_collection(database_name, collection_name)
+
+            self._storage_engine.remove_journal(journal_id)
+
+    def _apply_writes(
+        self,
+        database_name: str,
+        collection_name: str,
+        writes: Dict[ObjectId, Union[dict, None]],
+    ):
+        """
+        Bring the documents to their state in `writes`.
+        Applying the same writes again changes nothing, a journal replayed after a crash
+        in the middle of its commit ends the same as a full commit.
+        """
+        stored_documents = {
+            document.data["_id"]: document
+            for document in self._iter_documents_filtered(
+                database_name, collection_name, {"_id": {"$in": list(writes)}}
+            )
+        }
+
+        updates, deletes, inserts = [], [], []
+        for document_id, document in writes.items():
+            stored_document = stored_documents.get(document_id)
+
+            if document is None:
+                if stored_document is not None:
+                    deletes.append(stored_document)
+                continue
+
+            # Journals written before ObjectIds were tagged hold the hex string
+            document = dict(document, _id=document_id)
+
+            if stored_document is None:
+                inserts.append(document)
+            elif stored_document.data != document:
+                updates.append((stored_document, document))
+
+        self._write_updates(database_name, collection_name, updates)
+
+        if deletes:
+            self._delete_documents(database_name, collection_name, deletes)
+
+        if inserts:
+            self._insert_documents(database_name, collection_name, inserts)
+
+    def _transaction_documents(
+        self,
+        database_name: str,
+        collection_name: str,
+        filter_: dict,
+        transaction: Transaction,
+    ):
+        """Documents matching the filter as the transaction sees them, its writes over the stored ones"""
+        self._check_transaction(transaction)
+
+        documents = self._iter_documents_filtered(database_name, collection_name, filter_)
+        return self._overlay_writes(
+            documents,
+            filter_,
+            transaction.collection_writes(database_name, collection_name),
+            transaction.collection_reads(database_name, collection_name),
+        )
+
+    @staticmethod
+    def _overlay_writes(
+        documents: Iterable[Document],
+        filter_: dict,
+        writes: Dict[Any, Union[dict, None]],
+        reads: set,
+    ):
+        for document in documents:
+            document_id = document.data["_id"]
+
+            # Written by the transaction, matched in its new version below
+            if document_id in writes:
+                continue
+
+            reads.add(document_id)
+            yield document
+
+        for data in list(writes.values()):
+            if data is not None and document_filter_match(data, filter_):
+                yield Document(data=deepcopy(data), lookup_key=None)
+
+    def _transaction_update(
+        self,
+        database_name: str,
+        collection_name: str,
+        filter_: dict,
+        override: Union[dict, None],
+        replacement: Union[dict, None],
+        many: bool,
+        upsert: bool,
+        transaction: Transaction,
+    ) -> dict:
+        # Matched before writing, an updated document would be matched again from the writes
+        documents = list(
+            islice(
+                self._transaction_documents(
+                    database_name, collection_name, filter_, transaction
+                ),
+                None if many else 1,
+            )
+        )
+
+        writes = transaction.collection_writes(database_name, collection_name)
+        modified_count = 0
+
+        for document in documents:
+            updated_document = self._updated_document(document.data, override, replacement)
+
+            if updated_document != document.data:
+                writes[updated_document["_id"]] = updated_document
+                modified_count += 1
+
+        result = {"matched_count": len(documents), "modified_count": modified_count}
+
+        if upsert and not documents:
+            document = self._upsert(
+                database_name, collection_name, filter_, override, replacement, transaction
+            )
+            result["upserted_id"] = document["_id"]
+
+        return result
+
+    def create_index(
+        self, database_name: str, collection_name: str, index: dict, **options
+    ):
         if not self._is_indexing_engine_used:
             return
 
         index_uuid = self._indexing_engine.create_index(
-            database_name, collection_name, index
+            database_name, collection_name, index, **options
         )
         if index_uuid is None:
             return False
@@ -329,7 +1263,7 @@ class ChunkedEngine(BaseEngine):
         ):
             documents = [(document.data, document.lookup_key) for document in documents]
             self._indexing_engine.insert_documents(
-                database_name, collection_name, documents=documents
+                database_name, collection_name, documents=documents, fields={index_field}
             )
 
         return index_uuid
@@ -368,8 +1302,21 @@ class ChunkedEngine(BaseEngine):
             raise CollectionIsRequired()
 
     def _iter_read_documents(
-        self, database: str, collection: str, read_instructions: ReadInstructions
+        self,
+        database: str,
+        collection: str,
+        read_instructions: ReadInstructions,
+        read_ahead: bool = False,
     ):
+        if read_ahead and self._read_ahead_chunks:
+            chunks = self._read_ahead(database, collection, read_instructions)
+        else:
+            chunks = self._read_chunks(database, collection, read_instructions)
+
+        for documents in chunks:
+            yield from documents
+
+    def _read_chunks(self, database: str, collection: str, read_instructions: ReadInstructions):
         while not read_instructions.ended:
             documents = self._storage_engine.get_documents(
                 database_name=database,
@@ -377,12 +1324,49 @@ class ChunkedEngine(BaseEngine):
                 read_instructions=read_instructions,
             )
 
-            if not documents:
-                break
+            if read_instructions.scores is not None:
+                for document in documents:
+                    document.score = read_instructions.scores.get(document.lookup_key)
 
-            for document in documents:
-                document.data["_id"] = ObjectId(document.data["_id"])
-                yield document
+            yield documents
+
+    def _read_ahead(self, database: str, collection: str, read_instructions: ReadInstructions):
+        """
+        Chunks read by a background thread while the previous ones are consumed,
+        at most `read_ahead_chunks` of them wait. Closing the generator stops the thread.
+        """
+        chunks = Queue(self._read_ahead_chunks)
+        cancelled = Event()
+
+        def read():
+            try:
+                for documents in self._read_chunks(database, collection, read_instructions):
+                    chunks.put((documents, None))
+                    if cancelled.is_set():
+                        return
+                chunks.put((None, None))
+            except BaseException as error:
+                chunks.put((None, error))
+
+        Thread(target=read, daemon=True).start()
+
+        try:
+            while True:
+                documents, error = chunks.get()
+                if error is not None:
+                    raise error
+                if documents is None:
+                    return
+
+                yield documents
+        finally:
+            cancelled.set()
+            # The thread checks the event after every put, there is room for its last one
+            try:
+                while True:
+                    chunks.get_nowait()
+            except Empty:
+                pass
 
     def _pre_extraction_filtering(
             self,
@@ -408,28 +1392,67 @@ class ChunkedEngine(BaseEngine):
         ), True
 
     def _iter_documents_filtered(
-        self, database: str, collection: str, filter_: dict, use_indexes: bool = True
+        self,
+        database: str,
+        collection: str,
+        filter_: dict,
+        use_indexes: bool = True,
+        raw_documents: bool = False,
+        read_ahead: bool = False,
     ):
-        read_instructions = ReadInstructions(offset=0, chunk_size=self._chunk_size)
+        """
+        The indexes are queried and the snapshot is taken now, the documents are read lazily
+        as they were at this point even when writes happen in between.
+        `read_ahead` reads the next chunks from a thread, not for reads under the storage lock.
+        """
+        if filter_:
+            validate_filter(filter_)
 
-        read_instructions, is_post_filtering_needed = self._pre_extraction_filtering(
-            database_name=database,
-            collection_name=collection,
-            read_instructions=read_instructions,
-            filter_=filter_,
-            use_indexes=use_indexes,
+        read_instructions = ReadInstructions(
+            offset=0,
+            chunk_size=self._chunk_size,
+            raw_documents=raw_documents,
         )
 
+        with self.__collection_lock(database, collection).read_locked():
+            read_instructions, is_post_filtering_needed = self._pre_extraction_filtering(
+                database_name=database,
+                collection_name=collection,
+                read_instructions=read_instructions,
+                filter_=filter_,
+                use_indexes=use_indexes,
+            )
+            read_instructions.snapshot = self._storage_engine.open_snapshot(
+                database, collection
+            )
+
+        if is_post_filtering_needed:
+            read_instructions.needles = raw_needles(filter_)
+
+        return self._iter_matching_documents(
+            database,
+            collection,
+            read_instructions,
+            filter_ if is_post_filtering_needed else None,
+            read_ahead,
+        )
+
+    def _iter_matching_documents(
+        self,
+        database: str,
+        collection: str,
+        read_instructions: ReadInstructions,
+        filter_: Union[dict, None],
+        read_ahead: bool = False,
+    ):
         for document in self._iter_read_documents(
-            database, collection, read_instructions
+            database, collection, read_instructions, read_ahead
         ):
-            if is_post_filtering_needed:
-                if document_filter_match(document.data, filter_):
-                    yield document
-            else:
+            if filter_ is None or document_filter_match(document.data, filter_):
                 yield document
 
     def _filtered_chunks(self, database_name: str, collection_name: str, filter_: dict, many: bool):
+        # Updated documents are appended after the snapshot watermark, they aren't read again
         for documents_chunk in grouper(
             self._chunk_size,
             self._iter_documents_filtered(database_name, collection_name, filter_),
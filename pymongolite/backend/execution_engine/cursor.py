@@ -23,5 +23,14 @@ class Cursor:
         return next(self.__iter__())
 
     def close(self):
+        if self._closed:
+            return
+
         self._closed = True
+        iterator = self._iterator
         del self._iterator
+
+        # Stops the generators reading the documents, and their read ahead thread
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
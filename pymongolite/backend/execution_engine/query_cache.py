@@ -0,0 +1,163 @@
+from typing import Any, Dict, Hashable, Iterable, Iterator, Optional, Set, Tuple
+from collections import OrderedDict, defaultdict
+from copy import deepcopy
+from threading import Lock
+import json
+
+from pymongolite.backend.transaction import CollectionKey
+
+DEFAULT_QUERY_CACHE_SIZE = 32 * 1024 * 1024
+
+
+class QueryCacheStats:
+    """Lookups and evictions of the query cache"""
+
+    __slots__ = ("hits", "misses", "evictions", "invalidations", "entries", "size")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"QueryCacheStats({self.to_dict()})"
+
+
+class _Entry:
+    __slots__ = ("version", "value", "size")
+
+    def __init__(self, version: int, value: Any, size: int):
+        self.version = version
+        self.value = value
+        self.size = size
+
+
+class QueryCache:
+    """
+    Results of reads, least recently used entries are evicted past `max_size` bytes.
+    Every collection has a version, changed by each write to it, an entry is only
+    returned while the version it was read at is current.
+    A result larger than `max_entry_size` isn't kept so one big scan doesn't
+    evict every other entry.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_QUERY_CACHE_SIZE,
+        max_entry_size: Optional[int] = None,
+    ):
+        self.max_size = max_size
+        self.max_entry_size = max_size // 8 if max_entry_size is None else max_entry_size
+        self.stats = QueryCacheStats()
+
+        self._lock = Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._versions: Dict[CollectionKey, int] = defaultdict(int)
+        self._collection_keys: Dict[CollectionKey, Set[Hashable]] = defaultdict(set)
+
+    @staticmethod
+    def make_key(
+        database_name: str, collection_name: str, operation: str, *arguments: Any
+    ) -> Optional[Tuple]:
+        """
+        Key of a read, None when its arguments can't be normalized.
+        Keys keep their order, sort and projection specifications depend on it.
+        """
+        try:
+            normalized = json.dumps(arguments, default=repr, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+
+        return database_name, collection_name, operation, normalized
+
+    def version(self, database_name: str, collection_name: str) -> int:
+        return self._versions[(database_name, collection_name)]
+
+    def get(self, key: Tuple) -> Any:
+        """Cached value, None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != self._versions[key[:2]]:
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry.value
+
+    def put(self, key: Tuple, version: int, value: Any, size: int):
+        if size > self.max_entry_size:
+            return
+
+        with self._lock:
+            # A write happened since the read started
+            if version != self._versions[key[:2]]:
+                return
+
+            self._remove(key)
+            self._entries[key] = _Entry(version, value, size)
+            self._collection_keys[key[:2]].add(key)
+            self.stats.entries += 1
+            self.stats.size += size
+
+            while self.stats.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def documents(self, key: Tuple) -> Optional[Iterator[dict]]:
+        """Copies of cached documents, None on a miss"""
+        documents = self.get(key)
+        if documents is None:
+            return None
+
+        return (deepcopy(document) for document in documents)
+
+    def fill(self, key: Tuple, version: int, documents: Iterable[dict]) -> Iterator[dict]:
+        """Yields `documents`, kept once all of them were read"""
+        kept = []
+        size = 0
+
+        for document in documents:
+            if kept is not None:
+                size += len(json.dumps(document, default=str))
+                if size > self.max_entry_size:
+                    kept = None
+                else:
+                    kept.append(deepcopy(document))
+
+            yield document
+
+        if kept is not None:
+            self.put(key, version, tuple(kept), size)
+
+    def invalidate(self, database_name: str, collection_name: str):
+        collection = (database_name, collection_name)
+
+        with self._lock:
+            self._versions[collection] += 1
+            self.stats.invalidations += 1
+
+            for key in list(self._collection_keys.pop(collection, ())):
+                self._remove(key)
+
+    def invalidate_database(self, database_name: str):
+        with self._lock:
+            collections = {
+                collection
+                for collection in list(self._versions) + list(self._collection_keys)
+                if collection[0] == database_name
+            }
+
+        for database_name, collection_name in collections:
+            self.invalidate(database_name, collection_name)
+
+    def _remove(self, key: Tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        self._collection_keys[key[:2]].discard(key)
+        self.stats.entries -= 1
+        self.stats.size -= entry.size
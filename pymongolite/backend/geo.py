@@ -0,0 +1,188 @@
+from typing import List, Tuple, Optional, Callable
+import math
+
+EARTH_RADIUS_METERS = 6378100.0
+
+Point = Tuple[float, float]
+BoundingBox = Tuple[float, float, float, float]  # min x, min y, max x, max y
+
+
+def parse_point(value) -> Optional[Point]:
+    """[x, y] / (x, y) / {"type": "Point", "coordinates": [x, y]} -> (x, y)"""
+    if isinstance(value, dict):
+        if value.get("type") != "Point":
+            return None
+        value = value.get("coordinates")
+
+    if (
+        isinstance(value, (list, tuple))
+        and len(value) == 2
+        and all(isinstance(axis, (int, float)) and not isinstance(axis, bool) for axis in value)
+    ):
+        return float(value[0]), float(value[1])
+
+    return None
+
+
+def planar_distance(a: Point, b: Point) -> float:
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def spherical_distance(a: Point, b: Point) -> float:
+    """Haversine distance in meters between two [longitude, latitude] points"""
+    lon1, lat1, lon2, lat2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(h)))
+
+
+def point_in_polygon(point: Point, polygon) -> bool:
+    x, y = point
+    inside = False
+    j = len(polygon) - 1
+
+    for i in range(len(polygon)):
+        xi, yi = polygon[i]
+        xj, yj = polygon[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+
+    return inside
+
+
+def spherical_radius_bounding_box(center: Point, radius_meters: float) -> BoundingBox:
+    """Longitudes of the box go past ±180° near the antimeridian, see `split_antimeridian`"""
+    radius_degrees = math.degrees(radius_meters / EARTH_RADIUS_METERS)
+    min_lat = max(-90.0, center[1] - radius_degrees)
+    max_lat = min(90.0, center[1] + radius_degrees)
+
+    if max_lat >= 90.0 or min_lat <= -90.0:
+        return -180.0, min_lat, 180.0, max_lat
+
+    lon_radius = radius_degrees / math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if lon_radius >= 180.0:
+        return -180.0, min_lat, 180.0, max_lat
+
+    return center[0] - lon_radius, min_lat, center[0] + lon_radius, max_lat
+
+
+def split_antimeridian(bounding_box: BoundingBox) -> List[BoundingBox]:
+    """[longitude, latitude] box going past ±180° as a box on each side of the antimeridian"""
+    min_x, min_y, max_x, max_y = bounding_box
+
+    if min_x < -180.0:
+        return [(min_x + 360.0, min_y, 180.0, max_y), (-180.0, min_y, max_x, max_y)]
+
+    if max_x > 180.0:
+        return [(min_x, min_y, 180.0, max_y), (-180.0, min_y, max_x - 360.0, max_y)]
+
+    return [bounding_box]
+
+
+class Shape:
+    def __init__(self, contains: Callable[[Point], bool], bounding_box: BoundingBox):
+        self.contains = contains
+        self.bounding_box = bounding_box
+
+
+def parse_shape(value: dict) -> Shape:
+    """
+    $geoWithin shapes
+    {"$box": [[x1, y1], [x2, y2]]}
+    {"$polygon": [[x1, y1], [x2, y2], ...]}
+    {"$center": [[x, y], radius]}
+    {"$centerSphere": [[longitude, latitude], radius in radians]}
+    {"$geometry": {"type": "Polygon", "coordinates": [[[x1, y1], ...]]}}
+    """
+    if "$box" in value:
+        (x1, y1), (x2, y2) = value["$box"]
+        box = min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+        return Shape(
+            lambda p: box[0] <= p[0] <= box[2] and box[1] <= p[1] <= box[3], box
+        )
+
+    if "$polygon" in value or "$geometry" in value:
+        if "$polygon" in value:
+            polygon = [tuple(point) for point in value["$polygon"]]
+        else:
+            geometry = value["$geometry"]
+            if geometry.get("type") != "Polygon":
+                raise ValueError(f"Geometry of type '{geometry.get('type')}' not supported")
+            polygon = [tuple(point) for point in geometry["coordinates"][0]]
+
+        xs = [point[0] for point in polygon]
+        ys = [point[1] for point in polygon]
+        return Shape(
+            lambda p: point_in_polygon(p, polygon), (min(xs), min(ys), max(xs), max(ys))
+        )
+
+    if "$center" in value:
+        center, radius = value["$center"]
+        center = parse_point(center)
+        return Shape(
+            lambda p: planar_distance(center, p) <= radius,
+            (center[0] - radius, center[1] - radius, center[0] + radius, center[1] + radius),
+        )
+
+    if "$centerSphere" in value:
+        center, radius = value["$centerSphere"]
+        center = parse_point(center)
+        radius_meters = radius * EARTH_RADIUS_METERS
+        return Shape(
+            lambda p: spherical_distance(center, p) <= radius_meters,
+            spherical_radius_bounding_box(center, radius_meters),
+        )
+
+    raise ValueError(f"Unknown $geoWithin shape {value}")
+
+
+class NearQuery:
+    def __init__(
+        self,
+        point: Point,
+        max_distance: float = None,
+        min_distance: float = None,
+        spherical: bool = False,
+    ):
+        self.point = point
+        self.max_distance = max_distance
+        self.min_distance = min_distance
+        self.spherical = spherical
+
+    def distance(self, point: Point) -> float:
+        if self.spherical:
+            return spherical_distance(self.point, point)
+        return planar_distance(self.point, point)
+
+    def in_range(self, distance: float) -> bool:
+        if self.max_distance is not None and distance > self.max_distance:
+            return False
+        if self.min_distance is not None and distance < self.min_distance:
+            return False
+        return True
+
+
+def parse_near(pattern: dict) -> NearQuery:
+    """
+    {"$near": [x, y], "$maxDistance": d}
+    {"$near": {"$geometry": {"type": "Point", "coordinates": [x, y]}, "$maxDistance": d}}
+    """
+    near = pattern["$near"]
+    max_distance = pattern.get("$maxDistance")
+    min_distance = pattern.get("$minDistance")
+
+    # GeoJSON points are measured in meters on the sphere, legacy points on the plane
+    spherical = isinstance(near, dict)
+    if spherical and "$geometry" in near:
+        max_distance = near.get("$maxDistance", max_distance)
+        min_distance = near.get("$minDistance", min_distance)
+        near = near["$geometry"]
+
+    point = parse_point(near)
+    if point is None:
+        raise ValueError(f"Invalid $near point {near}")
+
+    return NearQuery(point, max_distance, min_distance, spherical)
@@ -1,15 +1,15 @@
-from typing import List, Tuple, Any
+from typing import List, Tuple, Union, Set, Any
 from abc import ABC, abstractmethod
 from functools import reduce
 
 from pymongolite.backend.read_instructions import ReadInstructions
-from pymongolite.backend.utils import is_condition
+from pymongolite.backend.utils import is_condition, compile_regex
 
 
 class BaseEngine(ABC):
     @abstractmethod
     def create_index(
-        self, database_name: str, collection_name: str, index: dict
+        self, database_name: str, collection_name: str, index: dict, **options
     ) -> bool:
         raise NotImplementedError
 
@@ -23,13 +23,37 @@ class BaseEngine(ABC):
     def get_indexes_list(self, database_name: str, collection_name: str) -> list:
         raise NotImplementedError
 
+    @abstractmethod
+    def drop_collection(self, database_name: str, collection_name: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def drop_database(self, database_name: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset_collection(self, database_name: str, collection_name: str):
+        """Forget the indexed documents of the collection, its indexes stay defined"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_collection_loaded(self, database_name: str, collection_name: str) -> bool:
+        """Every document of the collection was indexed since it was reset or dropped"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_collection_loaded(self, database_name: str, collection_name: str):
+        raise NotImplementedError
+
     @abstractmethod
     def insert_documents(
         self,
         database_name: str,
         collection_name: str,
         documents: List[Tuple[dict, Any]],
+        fields: Set[str] = None,
     ):
+        """Index the documents, only in the indexes of `fields` when given"""
         raise NotImplementedError
 
     @abstractmethod
@@ -39,8 +63,36 @@ class BaseEngine(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def _query(
+    def update_documents(
+        self,
+        database_name: str,
+        collection_name: str,
+        documents: List[Tuple[dict, dict, Any]],
+    ):
+        """(old document, new document, new lookup key) of every updated document"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_documents(
         self, database_name: str, collection_name: str, filter_: dict
+    ) -> Union[int, None]:
+        """Count from the indexes, None when they can't answer the filter exactly"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def distinct(
+        self, database_name: str, collection_name: str, field: str
+    ) -> Union[list, None]:
+        """Distinct values of the field from its index, None when no index can list them"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _query(
+        self,
+        database_name: str,
+        collection_name: str,
+        filter_: dict,
+        query_filter: dict = None,
     ) -> ReadInstructions:
         raise NotImplementedError
 
@@ -54,13 +106,24 @@ class BaseEngine(ABC):
         if not filter_:
             return read_instructions
 
+        # $text is only answered by the text index, so it must narrow the read before any early return
+        if "$text" in filter_:
+            read_instructions &= self._query(
+                database_name, collection_name, {"$text": filter_["$text"]}, filter_
+            )
+
         for field, pattern in filter_.items():
+            if field == "$text":
+                continue
+
             pattern_is_condition = is_condition(pattern)
             field_is_gate_condition = field.startswith("$")
 
             if not pattern_is_condition and not field_is_gate_condition:
-                result = self._query(database_name, collection_name, {field: {"$eq": pattern}})
-                return read_instructions & result
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$eq": pattern}}, filter_
+                )
+                continue
 
             if field_is_gate_condition:
                 if field == "$and":
@@ -90,54 +153,97 @@ class BaseEngine(ABC):
                         )
                     )
                 if field == "$nor":
+                    # Negated alone, the siblings may be a superset that can't be negated
                     read_instructions &= ~reduce(
                         lambda a, b: a | b,
                         map(
                             lambda subfilter: self.query(
                                 database_name,
                                 collection_name,
-                                read_instructions,
+                                ReadInstructions(offset=0),
                                 subfilter
                             ),
                             pattern,
                         )
                     )
-                return read_instructions
+                continue
 
             if "$not" in pattern:
                 res = self.query(
                     database_name,
                     collection_name,
-                    read_instructions,
+                    ReadInstructions(offset=0),
                     {field: pattern["$not"]},
                 )
                 read_instructions &= ~res
 
-            if subpattern := pattern.get("$eq"):
-                read_instructions &= self._query(database_name, collection_name, {field: {"$eq": subpattern}})
+            if (subpattern := pattern.get("$eq")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$eq": subpattern}}, filter_
+                )
+
+            if (subpattern := pattern.get("$ne")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$ne": subpattern}}, filter_
+                )
+
+            if (subpattern := pattern.get("$gt")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$gt": subpattern}}, filter_
+                )
+
+            if (subpattern := pattern.get("$gte")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$gte": subpattern}}, filter_
+                )
 
-            if subpattern := pattern.get("$ne"):
-                read_instructions &= self._query(database_name, collection_name, {field: {"$ne": subpattern}})
+            if (subpattern := pattern.get("$lt")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$lt": subpattern}}, filter_
+                )
 
-            if subpattern := pattern.get("$gt"):
-                read_instructions &= self._query(database_name, collection_name, {field: {"$gt": subpattern}})
+            if (subpattern := pattern.get("$lte")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$lte": subpattern}}, filter_
+                )
 
-            if subpattern := pattern.get("$gte"):
-                read_instructions &= self._query(database_name, collection_name, {field: {"$gte": subpattern}})
+            if (subpattern := pattern.get("$exists")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$exists": subpattern}}, filter_
+                )
+
+            if (subpattern := pattern.get("$in")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$in": subpattern}}, filter_
+                )
 
-            if subpattern := pattern.get("$lt"):
-                read_instructions &= self._query(database_name, collection_name, {field: {"$lt": subpattern}})
+            if (subpattern := pattern.get("$regex")) is not None:
+                read_instructions &= self._query(
+                    database_name,
+                    collection_name,
+                    {field: {"$regex": compile_regex(subpattern, pattern.get("$options", ""))}},
+                    filter_,
+                )
 
-            if subpattern := pattern.get("$lte"):
-                read_instructions &= self._query(database_name, collection_name, {field: {"$lte": subpattern}})
+            if (subpattern := pattern.get("$geoWithin")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$geoWithin": subpattern}}, filter_
+                )
 
-            if subpattern := pattern.get("$exists"):
-                read_instructions &= self._query(database_name, collection_name, {field: {"$exists": subpattern}})
+            # $maxDistance / $minDistance are siblings of $near so the whole pattern is passed
+            if "$near" in pattern:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$near": pattern}}, filter_
+                )
 
-            if subpattern := pattern.get("$in"):
-                read_instructions &= self._query(database_name, collection_name, {field: {"$in": subpattern}})
+            if (subpattern := pattern.get("$vectorSearch")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$vectorSearch": subpattern}}, filter_
+                )
 
-            if subpattern := pattern.get("$nin"):
-                read_instructions &= self._query(database_name, collection_name, {field: {"$nin": subpattern}})
+            if (subpattern := pattern.get("$nin")) is not None:
+                read_instructions &= self._query(
+                    database_name, collection_name, {field: {"$nin": subpattern}}, filter_
+                )
 
         return read_instructions
@@ -1,4 +1,4 @@
-from typing import Union
+from typing import Union, Dict, Iterable, Any
 from abc import ABC, abstractmethod
 
 
@@ -15,6 +15,14 @@ class BaseIndex(ABC):
     def query(self, operation: str, value) -> Union[set, None]:
         raise NotImplementedError
 
+    def score(self, operation: str, value) -> Union[Dict[Any, float], None]:
+        """Ranked query, {id: score} of matching ids or None if the index can't rank the operation"""
+        return None
+
+    def keys(self) -> Union[Iterable, None]:
+        """Unique indexed values in order or None if the index can't list them"""
+        return None
+
     @abstractmethod
     def __len__(self):
         raise NotImplementedError
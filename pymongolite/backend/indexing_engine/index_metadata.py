@@ -1,5 +1,28 @@
+from pymongolite.backend.utils import document_filter_match
+
+
 class IndexMetadata:
-    def __init__(self, field, type_, **options):
+    def __init__(
+        self, field, type_, database_name: str = None, collection_name: str = None, **options
+    ):
         self.field = field
         self.type_ = type_
+        self.database_name = database_name
+        self.collection_name = collection_name
         self.options = options
+
+    @property
+    def partial_filter(self) -> dict:
+        return self.options.get("partialFilterExpression")
+
+    def should_index(self, document: dict) -> bool:
+        # Documents without the field are never indexed, so every index is sparse
+        if self.field not in document:
+            return False
+
+        if self.partial_filter and not document_filter_match(
+            document, self.partial_filter
+        ):
+            return False
+
+        return True
@@ -0,0 +1,131 @@
+from typing import Union, Dict, Set, Tuple, Any, Iterable
+from collections import defaultdict
+import math
+
+from pymongolite.backend.geo import (
+    Point,
+    BoundingBox,
+    parse_point,
+    parse_shape,
+    parse_near,
+    planar_distance,
+    spherical_distance,
+    spherical_radius_bounding_box,
+    split_antimeridian,
+)
+from pymongolite.backend.indexing_engine.base_index import BaseIndex
+
+Cell = Tuple[int, int]
+
+
+class GeoIndex(BaseIndex):
+    """
+    Grid index of points, every cell holds the ids of the points inside it.
+    2d indexes measure distances on the plane, 2dsphere indexes hold [longitude, latitude]
+    and measure distances in meters.
+    """
+
+    def __init__(self, spherical: bool = False, cell_size: float = 1.0):
+        self.__spherical = spherical
+        self.__cell_size = cell_size
+        self.__cells: Dict[Cell, Set[Any]] = defaultdict(set)  # {cell: {id}}
+        self.__points: Dict[Any, Point] = {}  # {id: point}
+
+    def _cell(self, point: Point) -> Cell:
+        return (
+            math.floor(point[0] / self.__cell_size),
+            math.floor(point[1] / self.__cell_size),
+        )
+
+    def _distance(self, a: Point, b: Point) -> float:
+        if self.__spherical:
+            return spherical_distance(a, b)
+        return planar_distance(a, b)
+
+    def _candidates(self, bounding_box: BoundingBox) -> Iterable[Tuple[Any, Point]]:
+        boxes = split_antimeridian(bounding_box) if self.__spherical else [bounding_box]
+        cell_ranges = [(self._cell(box[:2]), self._cell(box[2:])) for box in boxes]
+
+        # Shape bigger than the data, cheaper to check every point
+        cells_count = sum(
+            (max_x - min_x + 1) * (max_y - min_y + 1)
+            for (min_x, min_y), (max_x, max_y) in cell_ranges
+        )
+        if cells_count > len(self.__cells):
+            yield from self.__points.items()
+            return
+
+        for (min_x, min_y), (max_x, max_y) in cell_ranges:
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    for id_ in self.__cells.get((x, y), ()):
+                        yield id_, self.__points[id_]
+
+    def add(self, value, id_):
+        point = parse_point(value)
+        if point is None:
+            return
+
+        self.__points[id_] = point
+        self.__cells[self._cell(point)].add(id_)
+
+    def remove(self, value, id_):
+        point = self.__points.pop(id_, None)
+        if point is None:
+            return
+
+        cell = self._cell(point)
+        self.__cells[cell].discard(id_)
+        if not self.__cells[cell]:
+            del self.__cells[cell]
+
+    def score(self, operation: str, value) -> Union[Dict[Any, float], None]:
+        """
+        $near, closer documents get higher score (-distance).
+        Without $maxDistance every point is in the result and is measured, the grid isn't used.
+        """
+        if operation != "$near":
+            return None
+
+        near = parse_near(value)
+        # The matcher measures with the metric of the query, it must be the metric of the index
+        if near.spherical != self.__spherical:
+            if near.spherical:
+                raise ValueError("$near with a GeoJSON point requires a 2dsphere index")
+            raise ValueError("$near with a legacy point requires a 2d index")
+
+        if near.max_distance is None:
+            candidates = self.__points.items()
+        elif self.__spherical:
+            candidates = self._candidates(
+                spherical_radius_bounding_box(near.point, near.max_distance)
+            )
+        else:
+            x, y = near.point
+            radius = near.max_distance
+            candidates = self._candidates((x - radius, y - radius, x + radius, y + radius))
+
+        scores = {}
+        for id_, point in candidates:
+            distance = self._distance(near.point, point)
+            if near.in_range(distance):
+                scores[id_] = -distance
+
+        return scores
+
+    def query(self, operation: str, value) -> Union[set, None]:
+        if operation == "$near":
+            return set(self.score(operation, value))
+
+        if operation == "$geoWithin":
+            shape = parse_shape(value)
+            return {
+                id_
+                for id_, point in self._candidates(shape.bounding_box)
+                if shape.contains(point)
+            }
+
+        return None
+
+    def __len__(self):
+        return len(self.__points)
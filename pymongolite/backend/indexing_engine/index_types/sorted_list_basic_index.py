@@ -1,10 +1,12 @@
-from typing import Union
+from typing import Union, Iterator
 from bisect import bisect_left, bisect_right
 from itertools import chain
+import sys
 
 from sortedcontainers import SortedKeyList as sortedlist
 
 from pymongolite.backend.indexing_engine.base_index import BaseIndex
+from pymongolite.backend.utils import compile_regex, regex_literal_prefix
 
 
 class SortedListBasicIndex(BaseIndex):
@@ -66,6 +68,20 @@ class SortedListBasicIndex(BaseIndex):
                 ids.update({value_id[1] for value_id in self.__sortedlist[s:e]})
             return ids
 
+        if operation == "$regex":
+            # ^abc -> range scan of ["abc", "abd")
+            prefix = regex_literal_prefix(compile_regex(value))
+            if prefix is None:
+                return None
+
+            s = bisect_left(self.__index_values, prefix)
+            if ord(prefix[-1]) == sys.maxunicode:
+                return {value_id[1] for value_id in self.__sortedlist[s:]}
+
+            upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            e = bisect_left(self.__index_values, upper_bound)
+            return {value_id[1] for value_id in self.__sortedlist[s:e]}
+
         if operation == "$nin":
             return None  # TODO: implement exclude
             # ids = set()
@@ -79,5 +95,13 @@ class SortedListBasicIndex(BaseIndex):
 
         return None
 
+    def keys(self) -> Iterator:
+        # Jump over the duplicates of every value, O(unique values * log n)
+        i = 0
+        while i < len(self.__index_values):
+            value = self.__index_values[i]
+            yield value
+            i = bisect_right(self.__index_values, value, i)
+
     def __len__(self):
         return len(self.__sortedlist)
@@ -0,0 +1,139 @@
+from typing import Union, Dict, List, Any
+from array import array
+from bisect import bisect_left
+from collections import Counter
+import math
+import re
+
+from pymongolite.backend.indexing_engine.base_index import BaseIndex
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text) -> List[str]:
+    if isinstance(text, list):
+        text = " ".join(item for item in text if isinstance(item, str))
+
+    if not isinstance(text, str):
+        return []
+
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+class TextIndex(BaseIndex):
+    """
+    Inverted index, every term holds a posting list of document numbers stored in a sorted array
+    and a parallel array with the term frequency in each document.
+    Document numbers only grow so new postings are appended at the end of the arrays.
+    """
+
+    def __init__(self):
+        self.__postings: Dict[str, array] = {}  # {term: array of document numbers}
+        self.__frequencies: Dict[str, array] = {}  # {term: array of term frequency}
+        self.__document_numbers: Dict[Any, int] = {}  # {id: document number}
+        self.__ids: Dict[int, Any] = {}  # {document number: id}
+        self.__next_document_number = 0
+
+    def add(self, value, id_):
+        terms = Counter(tokenize(value))
+        if not terms:
+            return
+
+        document_number = self.__next_document_number
+        self.__next_document_number += 1
+        self.__document_numbers[id_] = document_number
+        self.__ids[document_number] = id_
+
+        for term, frequency in terms.items():
+            if term not in self.__postings:
+                self.__postings[term] = array("Q")
+                self.__frequencies[term] = array("I")
+
+            self.__postings[term].append(document_number)
+            self.__frequencies[term].append(frequency)
+
+    def remove(self, value, id_):
+        document_number = self.__document_numbers.pop(id_, None)
+        if document_number is None:
+            return
+
+        del self.__ids[document_number]
+
+        for term in set(tokenize(value)):
+            postings = self.__postings[term]
+            i = bisect_left(postings, document_number)
+            del postings[i]
+            del self.__frequencies[term][i]
+
+            if not postings:
+                del self.__postings[term]
+                del self.__frequencies[term]
+
+    def _search_terms(self, value) -> List[str]:
+        """Unique terms of the search sorted from the shortest posting list"""
+        if isinstance(value, dict):
+            value = value.get("$search", "")
+
+        terms = dict.fromkeys(tokenize(value))
+        return sorted(terms, key=lambda term: len(self.__postings.get(term, ())))
+
+    def _intersect(self, terms: List[str]) -> Dict[int, List[int]]:
+        """
+        Walk the shortest posting list and binary search the others
+        :return: {document number: [frequency of every term]} for documents containing all the terms
+        """
+        if not terms or any(term not in self.__postings for term in terms):
+            return {}
+
+        shortest, others = terms[0], terms[1:]
+        positions = [0] * len(others)
+        matches = {}
+
+        for i, document_number in enumerate(self.__postings[shortest]):
+            frequencies = [self.__frequencies[shortest][i]]
+
+            for j, term in enumerate(others):
+                postings = self.__postings[term]
+                position = bisect_left(postings, document_number, positions[j])
+                positions[j] = position
+
+                if position == len(postings) or postings[position] != document_number:
+                    break
+
+                frequencies.append(self.__frequencies[term][position])
+            else:
+                matches[document_number] = frequencies
+
+        return matches
+
+    def score(self, operation: str, value) -> Union[Dict[Any, float], None]:
+        if operation != "$text":
+            return None
+
+        terms = self._search_terms(value)
+        documents_count = len(self.__document_numbers)
+
+        idfs = [
+            math.log(1 + documents_count / len(self.__postings[term]))
+            for term in terms
+            if term in self.__postings
+        ]
+
+        return {
+            self.__ids[document_number]: sum(
+                frequency * idf for frequency, idf in zip(frequencies, idfs)
+            )
+            for document_number, frequencies in self._intersect(terms).items()
+        }
+
+    def query(self, operation: str, value) -> Union[set, None]:
+        if operation != "$text":
+            return None
+
+        return {
+            self.__ids[document_number]
+            for document_number in self._intersect(self._search_terms(value))
+        }
+
+    def __len__(self):
+        return len(self.__document_numbers)
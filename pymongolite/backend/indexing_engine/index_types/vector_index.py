@@ -0,0 +1,213 @@
+from typing import Union, Dict, List, Any
+
+from pymongolite.backend.indexing_engine.base_index import BaseIndex
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+SIMILARITIES = ("cosine", "dotProduct", "euclidean")
+INITIAL_CAPACITY = 1024
+KMEANS_ITERATIONS = 10
+
+
+class VectorIndex(BaseIndex):
+    """
+    Vectors are kept in one contiguous float32 matrix, row per document.
+    exact mode scores every row with a single matrix product,
+    ivf mode clusters the rows with k-means and only scores the lists closest to the query.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = None,
+        similarity: str = "cosine",
+        mode: str = "exact",
+        num_lists: int = None,
+        num_probes: int = 8,
+        train_threshold: int = 10000,
+    ):
+        if np is None:
+            raise ImportError("Vector indexes require numpy, install it with 'pip install numpy'")
+
+        if similarity not in SIMILARITIES:
+            raise ValueError(f"Similarity must be one of {SIMILARITIES}")
+
+        if mode not in ("exact", "ivf"):
+            raise ValueError("Mode must be 'exact' or 'ivf'")
+
+        self.__dimensions = dimensions
+        self.__similarity = similarity
+        self.__mode = mode
+        self.__num_lists = num_lists
+        self.__num_probes = num_probes
+        self.__train_threshold = train_threshold
+
+        self.__matrix = None  # float32 (capacity, dimensions)
+        self.__size = 0
+        self.__ids: List[Any] = []  # row -> id
+        self.__rows: Dict[Any, int] = {}  # {id: row}
+
+        # ivf
+        self.__centroids = None  # float32 (lists, dimensions)
+        self.__assignments = None  # int32 (capacity,) list of every row
+        self.__trained_size = 0
+
+    def _to_vector(self, value):
+        if not isinstance(value, (list, tuple)) or not value:
+            return None
+
+        try:
+            vector = np.asarray(value, dtype=np.float32)
+        except (TypeError, ValueError):
+            return None
+
+        if vector.ndim != 1:
+            return None
+
+        if self.__dimensions is None:
+            self.__dimensions = vector.shape[0]
+
+        if vector.shape[0] != self.__dimensions:
+            return None
+
+        if self.__similarity == "cosine":
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+
+        return vector
+
+    def _ensure_capacity(self):
+        if self.__matrix is None:
+            self.__matrix = np.empty((INITIAL_CAPACITY, self.__dimensions), dtype=np.float32)
+            self.__assignments = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        elif self.__size == self.__matrix.shape[0]:
+            self.__matrix = np.concatenate([self.__matrix, np.empty_like(self.__matrix)])
+            self.__assignments = np.concatenate(
+                [self.__assignments, np.zeros_like(self.__assignments)]
+            )
+
+    def _scores(self, vectors, query):
+        if self.__similarity == "euclidean":
+            return -np.linalg.norm(vectors - query, axis=1)
+
+        # Cosine vectors are already normalized
+        return vectors @ query
+
+    def _nearest_centroids(self, vectors):
+        if self.__similarity == "euclidean":
+            distances = (
+                (vectors ** 2).sum(axis=1)[:, None]
+                - 2 * vectors @ self.__centroids.T
+                + (self.__centroids ** 2).sum(axis=1)[None, :]
+            )
+            return distances.argmin(axis=1)
+
+        return (vectors @ self.__centroids.T).argmax(axis=1)
+
+    def _train(self):
+        """k-means over the current rows, every row is assigned to its closest centroid"""
+        vectors = self.__matrix[: self.__size]
+        # Every list starts at a distinct row
+        num_lists = min(self.__num_lists or max(1, int(np.sqrt(self.__size))), self.__size)
+        rng = np.random.default_rng(0)
+        self.__centroids = vectors[rng.choice(self.__size, num_lists, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignments = self._nearest_centroids(vectors)
+            for list_number in range(num_lists):
+                members = vectors[assignments == list_number]
+                if len(members):
+                    self.__centroids[list_number] = members.mean(axis=0)
+
+            if self.__similarity == "cosine":
+                norms = np.linalg.norm(self.__centroids, axis=1, keepdims=True)
+                norms[norms == 0] = 1
+                self.__centroids /= norms
+
+        self.__assignments[: self.__size] = self._nearest_centroids(vectors)
+        self.__trained_size = self.__size
+
+    def add(self, value, id_):
+        vector = self._to_vector(value)
+        if vector is None:
+            return
+
+        self._ensure_capacity()
+        row = self.__size
+        self.__matrix[row] = vector
+        self.__ids.append(id_)
+        self.__rows[id_] = row
+        self.__size += 1
+
+        if self.__mode != "ivf":
+            return
+
+        if self.__centroids is not None:
+            self.__assignments[row] = self._nearest_centroids(vector[None, :])[0]
+
+        # Retrain when the collection doubled since the last training
+        if self.__size >= self.__train_threshold and self.__size >= 2 * self.__trained_size:
+            self._train()
+
+    def remove(self, value, id_):
+        row = self.__rows.pop(id_, None)
+        if row is None:
+            return
+
+        # Move the last row into the hole to keep the matrix contiguous
+        last_row = self.__size - 1
+        if row != last_row:
+            last_id = self.__ids[last_row]
+            self.__matrix[row] = self.__matrix[last_row]
+            self.__assignments[row] = self.__assignments[last_row]
+            self.__ids[row] = last_id
+            self.__rows[last_id] = row
+
+        self.__ids.pop()
+        self.__size -= 1
+
+    def _search(self, query, limit: int):
+        vectors = self.__matrix[: self.__size]
+        rows = None
+
+        if self.__mode == "ivf" and self.__centroids is not None:
+            lists = np.argsort(-self._scores(self.__centroids, query))[: self.__num_probes]
+            rows = np.flatnonzero(np.isin(self.__assignments[: self.__size], lists))
+            vectors = vectors[rows]
+
+        scores = self._scores(vectors, query)
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+
+        if rows is not None:
+            return rows[top], scores[top]
+        return top, scores[top]
+
+    def score(self, operation: str, value) -> Union[Dict[Any, float], None]:
+        """
+        $vectorSearch: {"queryVector": [...], "limit": 10}
+        """
+        if operation != "$vectorSearch":
+            return None
+
+        if self.__size == 0:
+            return {}
+
+        query = self._to_vector(value["queryVector"])
+        if query is None:
+            raise ValueError(f"queryVector must be a vector of {self.__dimensions} numbers")
+
+        rows, scores = self._search(query, value.get("limit", 10))
+        return {self.__ids[row]: float(score) for row, score in zip(rows, scores)}
+
+    def query(self, operation: str, value) -> Union[set, None]:
+        scores = self.score(operation, value)
+        return None if scores is None else set(scores)
+
+    def __len__(self):
+        return self.__size
@@ -0,0 +1,56 @@
+from typing import Dict, Iterable, List, Set, Any, Union
+from array import array
+
+DELETED = -1
+
+
+class RowTable:
+    """
+    Stable row ids of a collection.
+    Every document gets an integer row id when inserted, secondary indexes hold row ids
+    and the row id -> file offset table is a compact array so moving a document touches one slot.
+    """
+
+    def __init__(self):
+        self.__offsets = array("q")  # row id -> offset or DELETED
+        self.__rows: Dict[Any, int] = {}  # {document id: row id}
+        self.__free_rows: List[int] = []  # rows of deleted documents, reused by inserts
+        self.loaded = False  # every document of the collection has a row
+
+    def insert(self, document_id, offset: int) -> int:
+        if self.__free_rows:
+            row = self.__free_rows.pop()
+            self.__offsets[row] = offset
+        else:
+            row = len(self.__offsets)
+            self.__offsets.append(offset)
+
+        self.__rows[document_id] = row
+        return row
+
+    def relocate(self, document_id, offset: int) -> Union[int, None]:
+        row = self.__rows.get(document_id)
+        if row is not None:
+            self.__offsets[row] = offset
+        return row
+
+    def delete(self, document_id) -> Union[int, None]:
+        row = self.__rows.pop(document_id, None)
+        if row is not None:
+            # The indexes drop the row with the document, a later insert can take it
+            self.__offsets[row] = DELETED
+            self.__free_rows.append(row)
+        return row
+
+    def row(self, document_id) -> Union[int, None]:
+        return self.__rows.get(document_id)
+
+    def offset(self, row: int) -> int:
+        return self.__offsets[row]
+
+    def offsets(self, rows: Iterable[int]) -> Set[int]:
+        offsets = self.__offsets
+        return {offsets[row] for row in rows}
+
+    def __len__(self):
+        return len(self.__rows)
@@ -1,22 +1,39 @@
-from typing import List, Tuple, Union, Dict, Any
+from typing import List, Tuple, Union, Dict, Set
 from uuid import uuid4, UUID
 
-from pymongolite.backend.objectid import ObjectId
+from pymongolite.backend.exceptions import IndexRequired
+from pymongolite.backend.utils import (
+    filter_implies,
+    is_condition,
+    regex_literal_prefix,
+    unique_values,
+    Null,
+)
 from pymongolite.backend.read_instructions import ReadInstructions
 from pymongolite.backend.indexing_engine.base_engine import BaseEngine
 from pymongolite.backend.indexing_engine.index_metadata import IndexMetadata
 from pymongolite.backend.indexing_engine.base_index import BaseIndex
+from pymongolite.backend.indexing_engine.row_table import RowTable
 from pymongolite.backend.indexing_engine.index_types.sorted_list_basic_index import SortedListBasicIndex
+from pymongolite.backend.indexing_engine.index_types.text_index import TextIndex
+from pymongolite.backend.indexing_engine.index_types.geo_index import GeoIndex
+from pymongolite.backend.indexing_engine.index_types.vector_index import VectorIndex
+
+# Operations that can't be answered without an index
+INDEX_ONLY_OPERATIONS = {"$near", "$vectorSearch"}
+
+# Operations the sorted list index answers exactly, no need to match the documents
+COVERED_OPERATIONS = {"$eq", "$gt", "$gte", "$lt", "$lte", "$in", "$exists"}
 
 
 class V1Engine(BaseEngine):
     def __init__(self):
-        self._root_index: Dict[ObjectId, Any] = {}  # {ObjectID: file_index}
+        self._rows: Dict[str, Dict[str, RowTable]] = {}  # {db_name: {collection_name: row_table}}
         self._indexes: Dict[str, Dict[str, Dict[str, BaseIndex]]] = {}  # {db_name: {collection_name: {field: index}}
         self._indexes_meta: Dict[str, IndexMetadata] = {}  # {index_id: index_metadata}
 
     def create_index(
-        self, database_name: str, collection_name: str, index: dict
+        self, database_name: str, collection_name: str, index: dict, **options
     ) -> Union[UUID, None]:
         if len(index) > 1:
             raise ValueError("Index must be with one pair of key and value")
@@ -32,16 +49,48 @@ class V1Engine(BaseEngine):
 
         if field not in self._indexes[database_name][collection_name]:
             index_uuid = uuid4()
-            if index_type == 1:
-                self._indexes[database_name][collection_name][field] = SortedListBasicIndex()
-            else:
-                raise TypeError(f"Index of type '{index_type}' not implemented")
+            if index_type == "text" and any(
+                index_metadata.type_ == "text"
+                for index_metadata in self._get_collection_indexes_meta(
+                    database_name, collection_name
+                ).values()
+            ):
+                raise ValueError("Collection can have only one text index")
+            self._indexes[database_name][collection_name][field] = self._new_index(
+                index_type, **options
+            )
             self._indexes_meta[str(index_uuid)] = IndexMetadata(
-                field=field, type_=index_type
+                field=field,
+                type_=index_type,
+                database_name=database_name,
+                collection_name=collection_name,
+                **options,
             )
 
         return index_uuid
 
+    @staticmethod
+    def _new_index(index_type, **options) -> BaseIndex:
+        if index_type == 1:
+            return SortedListBasicIndex()
+        if index_type == "text":
+            return TextIndex()
+        if index_type in ("2d", "2dsphere"):
+            return GeoIndex(
+                spherical=index_type == "2dsphere",
+                cell_size=options.get("cellSize", 1.0),
+            )
+        if index_type == "vector":
+            return VectorIndex(
+                dimensions=options.get("dimensions"),
+                similarity=options.get("similarity", "cosine"),
+                mode=options.get("mode", "exact"),
+                num_lists=options.get("numLists"),
+                num_probes=options.get("numProbes", 8),
+                train_threshold=options.get("trainThreshold", 10000),
+            )
+        raise TypeError(f"Index of type '{index_type}' not implemented")
+
     def delete_index(
             self,
             database_name: str,
@@ -78,25 +127,84 @@ class V1Engine(BaseEngine):
                 "size": len(
                     self._indexes[database_name][collection_name][index_metadata.field]
                 ),
+                **index_metadata.options,
             }
             for index_uuid, index_metadata in self._indexes_meta.items()
+            if index_metadata.database_name == database_name
+            and index_metadata.collection_name == collection_name
         ]
 
-    def _insert_to_root_index(self, document_id: ObjectId, lookup_key: int):
-        self._root_index[document_id] = lookup_key
+    def _get_collection_indexes_meta(
+        self, database_name: str, collection_name: str
+    ) -> Dict[str, IndexMetadata]:
+        return {
+            index_metadata.field: index_metadata
+            for index_metadata in self._indexes_meta.values()
+            if index_metadata.database_name == database_name
+            and index_metadata.collection_name == collection_name
+        }
+
+    def _get_row_table(self, database_name: str, collection_name: str) -> RowTable:
+        collections_rows = self._rows.setdefault(database_name, {})
+        if collection_name not in collections_rows:
+            collections_rows[collection_name] = RowTable()
+
+        return collections_rows[collection_name]
+
+    def drop_collection(self, database_name: str, collection_name: str):
+        self._rows.get(database_name, {}).pop(collection_name, None)
+        self._indexes.get(database_name, {}).pop(collection_name, None)
+
+        for index_uuid, index_metadata in list(self._indexes_meta.items()):
+            if (
+                index_metadata.database_name == database_name
+                and index_metadata.collection_name == collection_name
+            ):
+                del self._indexes_meta[index_uuid]
+
+    def reset_collection(self, database_name: str, collection_name: str):
+        self._rows.get(database_name, {}).pop(collection_name, None)
+
+        indexes = self._indexes.get(database_name, {}).get(collection_name)
+        if not indexes:
+            return
+
+        for field, index_metadata in self._get_collection_indexes_meta(
+            database_name, collection_name
+        ).items():
+            indexes[field] = self._new_index(index_metadata.type_, **index_metadata.options)
 
-    def _remove_from_root_index(self, document_id: ObjectId) -> bool:
-        return self._root_index.pop(document_id, None) is not None
+    def is_collection_loaded(self, database_name: str, collection_name: str) -> bool:
+        row_table = self._rows.get(database_name, {}).get(collection_name)
+        return row_table is not None and row_table.loaded
+
+    def set_collection_loaded(self, database_name: str, collection_name: str):
+        self._get_row_table(database_name, collection_name).loaded = True
+
+    def drop_database(self, database_name: str):
+        for collection_name in set(self._rows.get(database_name, {})) | set(
+            self._indexes.get(database_name, {})
+        ):
+            self.drop_collection(database_name, collection_name)
 
     def insert_documents(
         self,
         database_name: str,
         collection_name: str,
         documents: List[Tuple[dict, int]],
+        fields: Set[str] = None,
     ):
+        row_table = self._get_row_table(database_name, collection_name)
+        rows = []
+
         for document, lookup_key in documents:
             document_id = document["_id"]
-            self._insert_to_root_index(document_id, lookup_key)
+
+            # Documents indexed again by create_index keep their row
+            row = row_table.relocate(document_id, lookup_key)
+            if row is None:
+                row = row_table.insert(document_id, lookup_key)
+            rows.append(row)
 
         if (
             database_name not in self._indexes
@@ -104,23 +212,22 @@ class V1Engine(BaseEngine):
         ):
             return
 
-        for document, lookup_key in documents:
-            document_id = document["_id"]
+        indexes_meta = self._get_collection_indexes_meta(database_name, collection_name)
 
-            for field in document.keys():
+        for (document, _), row in zip(documents, rows):
+            for field in document.keys() if fields is None else fields.intersection(document):
                 if (
                     index := self._indexes[database_name][collection_name].get(
                         field, None
                     )
-                ) is not None:
-                    index.add(document[field], document_id)
+                ) is not None and indexes_meta[field].should_index(document):
+                    index.add(document[field], row)
 
     def delete_documents(
         self, database_name: str, collection_name: str, documents: List[dict]
     ):
-        for document in documents:
-            document_id = document["_id"]
-            self._remove_from_root_index(document_id)
+        row_table = self._get_row_table(database_name, collection_name)
+        rows = [row_table.delete(document["_id"]) for document in documents]
 
         if (
             database_name not in self._indexes
@@ -129,28 +236,173 @@ class V1Engine(BaseEngine):
             return
 
         fields_with_indexes = set(self._indexes[database_name][collection_name].keys())
+        indexes_meta = self._get_collection_indexes_meta(database_name, collection_name)
 
-        for document in documents:
-            document_id = document["_id"]
+        for document, row in zip(documents, rows):
+            if row is None:
+                continue
 
             for field in fields_with_indexes.intersection(set(document.keys())):
+                if not indexes_meta[field].should_index(document):
+                    continue
+
                 index = self._indexes[database_name][collection_name][field]
-                index.remove(document[field], document_id)
+                index.remove(document[field], row)
+
+    def update_documents(
+        self,
+        database_name: str,
+        collection_name: str,
+        documents: List[Tuple[dict, dict, int]],
+    ):
+        # Secondary indexes hold row ids, a moved document only changes its row offset
+        row_table = self._get_row_table(database_name, collection_name)
+        rows = [
+            row_table.relocate(new_document["_id"], lookup_key)
+            for _, new_document, lookup_key in documents
+        ]
+
+        indexes = self._indexes.get(database_name, {}).get(collection_name)
+        if not indexes:
+            return
+
+        indexes_meta = self._get_collection_indexes_meta(database_name, collection_name)
+        partial_indexes_meta = [
+            index_metadata
+            for index_metadata in indexes_meta.values()
+            if index_metadata.partial_filter
+        ]
+
+        for (old_document, new_document, _), row in zip(documents, rows):
+            if row is None:
+                continue
+
+            changed_fields = {
+                field
+                for field in old_document.keys() | new_document.keys()
+                if field != "_id"
+                and old_document.get(field, Null()) != new_document.get(field, Null())
+            }
+
+            affected_fields = changed_fields.intersection(indexes)
+
+            # A change to another field can move the document in or out of a partial index
+            if changed_fields:
+                affected_fields.update(
+                    index_metadata.field
+                    for index_metadata in partial_indexes_meta
+                    if index_metadata.should_index(old_document)
+                    != index_metadata.should_index(new_document)
+                )
+
+            for field in affected_fields:
+                index = indexes[field]
+
+                if indexes_meta[field].should_index(old_document):
+                    index.remove(old_document[field], row)
+
+                if indexes_meta[field].should_index(new_document):
+                    index.add(new_document[field], row)
+
+    def _is_covered_value(self, value) -> bool:
+        # null also matches documents without the field, the index doesn't hold them
+        return isinstance(value, (str, int, float))
+
+    def _is_covered(
+        self, database_name: str, collection_name: str, filter_: dict, query_filter: dict
+    ) -> bool:
+        indexes = self._indexes.get(database_name, {}).get(collection_name, {})
+        indexes_meta = self._get_collection_indexes_meta(database_name, collection_name)
+
+        for field, pattern in filter_.items():
+            if field == "$and":
+                if not all(
+                    self._is_covered(database_name, collection_name, subfilter, query_filter)
+                    for subfilter in pattern
+                ):
+                    return False
+                continue
+
+            if field not in indexes or indexes_meta[field].type_ != 1:
+                return False
+
+            partial_filter = indexes_meta[field].partial_filter
+            if partial_filter and not filter_implies(query_filter, partial_filter):
+                return False
+
+            condition = pattern if is_condition(pattern) else {"$eq": pattern}
+            if not condition or not COVERED_OPERATIONS.issuperset(condition):
+                return False
+
+            for operation, value in condition.items():
+                if operation == "$exists":
+                    covered = value is True
+                elif operation == "$in":
+                    covered = isinstance(value, list) and all(map(self._is_covered_value, value))
+                else:
+                    covered = self._is_covered_value(value)
+
+                if not covered:
+                    return False
+
+        return True
+
+    def count_documents(
+        self, database_name: str, collection_name: str, filter_: dict
+    ) -> Union[int, None]:
+        if not filter_ or not self._is_covered(
+            database_name, collection_name, filter_, filter_
+        ):
+            return None
+
+        read_instructions = self.query(
+            database_name, collection_name, ReadInstructions(offset=0), filter_
+        )
+        if read_instructions.indexes is None:
+            return None
+
+        return len(read_instructions.indexes - read_instructions.exclude_indexes)
+
+    def distinct(
+        self, database_name: str, collection_name: str, field: str
+    ) -> Union[list, None]:
+        indexes = self._indexes.get(database_name, {}).get(collection_name, {})
+        if field not in indexes:
+            return None
+
+        # A partial index doesn't hold the values of every document
+        if self._get_collection_indexes_meta(database_name, collection_name)[field].partial_filter:
+            return None
+
+        keys = indexes[field].keys()
+        if keys is None:
+            return None
+
+        return unique_values(keys)
 
     def _query(
             self,
             database_name: str,
             collection_name: str,
             filter_: dict,
+            query_filter: dict = None,
     ) -> ReadInstructions:
         if len(filter_) > 1:
             raise ValueError("Can't handle filter with multiple expressions use query instead")
 
         field, expression = list(filter_.items())[0]
 
+        if field == "$text":
+            return self._text_query(database_name, collection_name, expression)
+
         # {"name": "mosh"} -> {"name": {"$eq": "mosh"}}
         if not isinstance(expression, dict):
-            expression = {field: {"$eq": expression}}
+            expression = {"$eq": expression}
+
+        if field == "_id":
+            read_instructions = self._ids_query(database_name, collection_name, expression)
+            if read_instructions is not None:
+                return read_instructions
 
         have_collection_indexes = (
                 database_name in self._indexes
@@ -161,20 +413,97 @@ class V1Engine(BaseEngine):
             not have_collection_indexes
             or field not in self._indexes[database_name][collection_name]
         ):
-            if field == "_id" and isinstance(expression, ObjectId):
-                return ReadInstructions(indexes={self._root_index[expression],})
-            return ReadInstructions(offset=0)
+            if INDEX_ONLY_OPERATIONS.intersection(expression):
+                raise IndexRequired(next(iter(INDEX_ONLY_OPERATIONS.intersection(expression))))
+            return self._full_scan()
+
+        index_metadata = self._get_collection_indexes_meta(database_name, collection_name)[field]
+        if index_metadata.partial_filter and not filter_implies(
+            query_filter or filter_, index_metadata.partial_filter
+        ):
+            # The index doesn't hold every document the query may match
+            return self._full_scan()
 
         index = self._indexes[database_name][collection_name][field]
         operation, value = list(expression.items())[0]
+
+        scores = index.score(operation, value)
+        if scores is not None:
+            return self._ranked_read_instructions(database_name, collection_name, scores)
+
         ids = index.query(operation, value)
 
         if ids is None:
-            return ReadInstructions(offset=0)
+            if operation in INDEX_ONLY_OPERATIONS:
+                raise IndexRequired(operation)
+            return self._full_scan()
 
-        if not ids:
-            read_instructions = ReadInstructions(offset=0)
-            read_instructions.end()
-            return read_instructions
+        read_instructions = ReadInstructions(
+            indexes=self._get_row_table(database_name, collection_name).offsets(ids)
+        )
+        # A regex is answered with the range of its literal prefix, ^abc alone is exact
+        if operation == "$regex":
+            read_instructions.exact = regex_literal_prefix(value) == value.pattern[1:]
+
+        return read_instructions
+
+    def _ids_query(
+        self, database_name: str, collection_name: str, expression: dict
+    ) -> Union[ReadInstructions, None]:
+        """$eq / $in on _id from the row table, None when it can't answer"""
+        row_table = self._rows.get(database_name, {}).get(collection_name)
+        if row_table is None or not row_table.loaded or len(expression) != 1:
+            return None
+
+        operation, value = next(iter(expression.items()))
+        if operation == "$eq":
+            ids = [value]
+        elif operation == "$in" and isinstance(value, list):
+            ids = value
+        else:
+            return None
+
+        rows = set()
+        for document_id in ids:
+            try:
+                row = row_table.row(document_id)
+            except TypeError:  # Unhashable, no document has this id
+                continue
+
+            if row is not None:
+                rows.add(row)
+
+        return ReadInstructions(indexes=row_table.offsets(rows))
+
+    @staticmethod
+    def _full_scan() -> ReadInstructions:
+        # Every document is read and matched, not only the ones the expression matches
+        read_instructions = ReadInstructions(offset=0)
+        read_instructions.exact = False
+        return read_instructions
+
+    def _ranked_read_instructions(
+        self, database_name: str, collection_name: str, scores: Dict[int, float]
+    ) -> ReadInstructions:
+        row_table = self._get_row_table(database_name, collection_name)
+        scores = {row_table.offset(row): score for row, score in scores.items()}
+        return ReadInstructions(indexes=set(scores), scores=scores)
 
-        return ReadInstructions(indexes={self._root_index[id_] for id_ in ids})
+    def _text_query(
+        self, database_name: str, collection_name: str, expression: dict
+    ) -> ReadInstructions:
+        text_fields = [
+            index_metadata.field
+            for index_metadata in self._get_collection_indexes_meta(
+                database_name, collection_name
+            ).values()
+            if index_metadata.type_ == "text"
+        ]
+
+        if not text_fields:
+            raise IndexRequired("$text")
+
+        index = self._indexes[database_name][collection_name][text_fields[0]]
+        return self._ranked_read_instructions(
+            database_name, collection_name, index.score("$text", expression)
+        )
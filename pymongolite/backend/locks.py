@@ -0,0 +1,149 @@
+from threading import Condition, Lock, get_ident
+from contextlib import contextmanager
+from time import perf_counter
+
+from pymongolite.backend.exceptions import LockUpgradeError
+
+
+class LockStats:
+    """Acquisitions and time spent waiting for a lock, per mode"""
+
+    __slots__ = (
+        "read_acquisitions",
+        "read_contended",
+        "read_wait_time",
+        "max_read_wait_time",
+        "write_acquisitions",
+        "write_contended",
+        "write_wait_time",
+        "max_write_wait_time",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def record_read(self, wait_time: float, contended: bool):
+        self.read_acquisitions += 1
+        self.read_contended += contended
+        self.read_wait_time += wait_time
+        self.max_read_wait_time = max(self.max_read_wait_time, wait_time)
+
+    def record_write(self, wait_time: float, contended: bool):
+        self.write_acquisitions += 1
+        self.write_contended += contended
+        self.write_wait_time += wait_time
+        self.max_write_wait_time = max(self.max_write_wait_time, wait_time)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"LockStats({self.to_dict()})"
+
+
+class ReadWriteLock:
+    """
+    Shared / exclusive lock, many readers or one writer.
+    A waiting writer stops new readers from entering so writers are not starved,
+    readers that were already waiting go in once the writer before them is done.
+    Both sides are reentrant and the writer may take the read side,
+    a reader can't upgrade to the write side.
+    """
+
+    def __init__(self):
+        self._condition = Condition(Lock())
+        self._readers = {}  # {thread id: depth}
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._writes_done = 0
+        self.stats = LockStats()
+
+    def acquire_read(self):
+        me = get_ident()
+
+        with self._condition:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                self.stats.record_read(0, False)
+                return
+
+            start = perf_counter()
+            writes_done = self._writes_done
+            contended = False
+
+            while self._writer is not None or (
+                self._waiting_writers and writes_done == self._writes_done
+            ):
+                contended = True
+                self._condition.wait()
+
+            self._readers[me] = 1
+            self.stats.record_read(perf_counter() - start, contended)
+
+    def release_read(self):
+        me = get_ident()
+
+        with self._condition:
+            depth = self._readers[me] - 1
+            if depth:
+                self._readers[me] = depth
+                return
+
+            del self._readers[me]
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        me = get_ident()
+
+        with self._condition:
+            if self._writer == me:
+                self._write_depth += 1
+                self.stats.record_write(0, False)
+                return
+
+            if me in self._readers:
+                raise LockUpgradeError()
+
+            start = perf_counter()
+            contended = False
+
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    contended = True
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+
+            self._writer = me
+            self._write_depth = 1
+            self.stats.record_write(perf_counter() - start, contended)
+
+    def release_write(self):
+        with self._condition:
+            self._write_depth -= 1
+            if self._write_depth:
+                return
+
+            self._writer = None
+            self._writes_done += 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
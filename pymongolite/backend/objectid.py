@@ -1,39 +1,174 @@
-from uuid import uuid4
+from typing import Union
+from datetime import datetime, timezone
+from itertools import count
+from uuid import UUID
+import binascii
+import calendar
+import os
+import random
+import struct
+import time
+
+from pymongolite.backend.exceptions import InvalidId
+
+_MAX_COUNTER = 0xFFFFFF
+
+
+class _Generator:
+    """Per process random value and counter, regenerated after a fork"""
+
+    def __init__(self):
+        self.pid = None
+        self.random = None
+        self.counter = None
+
+    def next(self):
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.random = os.urandom(5)
+            self.counter = count(random.randint(0, _MAX_COUNTER))
+
+        return self.random, next(self.counter) & _MAX_COUNTER
+
+
+_generator = _Generator()
 
 
 class ObjectId:
-    def __init__(self, oid: str = None):
+    """
+    MongoDB compatible 12 bytes id, 4 bytes timestamp + 5 bytes random + 3 bytes counter.
+    Ids sort by creation time and are stored on disk as 24 hex characters.
+    Ids of older collections (uuid4 strings) are still readable, they sort before the new ids.
+    """
+
+    __slots__ = ("__id",)
+
+    def __init__(self, oid: Union["ObjectId", bytes, str] = None):
         if oid is None:
-            oid = str(uuid4())
+            random_bytes, counter = _generator.next()
+            self.__id = (
+                struct.pack(">I", int(time.time()) & 0xFFFFFFFF)
+                + random_bytes
+                + counter.to_bytes(3, "big")
+            )
+        elif isinstance(oid, ObjectId):
+            self.__id = oid.__id
+        elif isinstance(oid, bytes) and len(oid) == 12:
+            self.__id = oid
+        elif isinstance(oid, str) and len(oid) == 24:
+            try:
+                self.__id = bytes.fromhex(oid)
+            except ValueError:
+                raise InvalidId(oid)
+        elif isinstance(oid, str) and len(oid) == 36:
+            # Legacy uuid4 id
+            try:
+                UUID(oid)
+            except ValueError:
+                raise InvalidId(oid)
+            self.__id = oid
+        else:
+            raise InvalidId(oid)
 
-        self._oid = oid
+    @classmethod
+    def from_datetime(cls, generation_time: datetime) -> "ObjectId":
+        """Smallest id generated at `generation_time`, useful for range queries on _id"""
+        if generation_time.utcoffset() is not None:
+            generation_time = generation_time - generation_time.utcoffset()
 
-    def __gt__(self, other):
-        if isinstance(other, str):
-            return self._oid > other
-        elif isinstance(other, ObjectId):
-            return self._oid > other._oid
-        raise NotImplemented
+        timestamp = calendar.timegm(generation_time.timetuple())
+        return cls(struct.pack(">I", timestamp & 0xFFFFFFFF) + b"\x00" * 8)
+
+    @classmethod
+    def is_valid(cls, oid) -> bool:
+        try:
+            cls(oid)
+            return True
+        except (InvalidId, TypeError):
+            return False
+
+    @property
+    def is_legacy(self) -> bool:
+        return isinstance(self.__id, str)
+
+    @property
+    def binary(self) -> bytes:
+        if self.is_legacy:
+            return UUID(self.__id).bytes
+        return self.__id
+
+    @property
+    def generation_time(self) -> Union[datetime, None]:
+        if self.is_legacy:
+            return None
+
+        timestamp = struct.unpack(">I", self.__id[:4])[0]
+        return datetime.fromtimestamp(timestamp, timezone.utc)
+
+    def _sort_key(self):
+        return (not self.is_legacy, self.__id)
 
     def __eq__(self, other):
-        if isinstance(other, str):
-            return self._oid == other
-        elif isinstance(other, ObjectId):
-            return self._oid == other._oid
-        raise NotImplemented
+        if isinstance(other, ObjectId):
+            return self.__id == other.__id
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, ObjectId):
+            return self.__id != other.__id
+        return NotImplemented
 
     def __lt__(self, other):
-        if isinstance(other, str):
-            return self._oid < other
-        elif isinstance(other, ObjectId):
-            return self._oid < other._oid
-        raise NotImplemented
+        if isinstance(other, ObjectId):
+            return self._sort_key() < other._sort_key()
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, ObjectId):
+            return self._sort_key() <= other._sort_key()
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, ObjectId):
+            return self._sort_key() > other._sort_key()
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, ObjectId):
+            return self._sort_key() >= other._sort_key()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.__id)
 
     def __str__(self):
-        return self._oid
+        if self.is_legacy:
+            return self.__id
+        return binascii.hexlify(self.__id).decode()
 
     def __repr__(self):
-        return f"ObjectId({self._oid})"
+        return f"ObjectId('{self}')"
 
-    def __hash__(self):
-        return hash(self._oid)
+    def __reduce__(self):
+        return self.__class__, (str(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+# ObjectIds are stored as {"$oid": hex}, a string in the form of an ObjectId stays a string
+OBJECT_ID_TAG = "$oid"
+
+
+def decode_object_id(fields: dict):
+    """json object_hook turning the tagged ObjectIds back into ObjectIds"""
+    if len(fields) == 1 and OBJECT_ID_TAG in fields:
+        try:
+            return ObjectId(fields[OBJECT_ID_TAG])
+        except InvalidId:
+            pass
+
+    return fields
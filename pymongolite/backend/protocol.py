@@ -0,0 +1,154 @@
+"""
+Framing of the local server protocol.
+
+Every message is a 9 bytes header followed by a JSON body:
+payload length (4 bytes), request id (4 bytes), operation (1 byte), all big endian.
+A reply carries the request id of the request it answers, so a client may send
+many requests before reading the replies.
+Values JSON can't hold are tagged, {"$oid": hex} for an ObjectId,
+{"$date": iso format} for a datetime and {"$tuple": [...]} for a tuple,
+index ids and exceptions inside results are sent as strings.
+"""
+from typing import Any, BinaryIO, Tuple
+from collections.abc import Mapping
+from datetime import datetime
+from enum import IntEnum
+from uuid import UUID
+import importlib
+import json
+import struct
+
+from pymongolite.backend.command import COMMANDS, Command
+from pymongolite.backend.exceptions import ProtocolError, RemoteCommandError
+from pymongolite.backend.objectid import ObjectId
+
+HEADER = struct.Struct(">IIB")
+MAX_MESSAGE_SIZE = 48 * 1024 * 1024
+
+
+class OPS(IntEnum):
+    command = 1
+    get_more = 2
+    kill_cursors = 3
+    reply = 4
+
+
+def encode_value(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+
+    if isinstance(value, Mapping):
+        return {key: encode_value(item) for key, item in value.items()}
+
+    if isinstance(value, tuple):
+        return {"$tuple": [encode_value(item) for item in value]}
+
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+
+    if isinstance(value, UUID):
+        # Index ids, used as strings by delete_index
+        return str(value)
+
+    if isinstance(value, Exception):
+        # Errors of bulk_write results are only shown as messages
+        return str(value)
+
+    return value
+
+
+def _decode_object(value: dict) -> Any:
+    if len(value) == 1:
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+        if "$tuple" in value:
+            return tuple(value["$tuple"])
+
+    return value
+
+
+def dumps(body: Any) -> bytes:
+    return json.dumps(encode_value(body), separators=(",", ":")).encode()
+
+
+def loads(payload: bytes) -> Any:
+    return json.loads(payload, object_hook=_decode_object)
+
+
+def pack_message(request_id: int, op: OPS, body: Any) -> bytes:
+    payload = dumps(body)
+    return HEADER.pack(len(payload), request_id, op) + payload
+
+
+def read_message(stream: BinaryIO) -> Tuple[int, OPS, Any]:
+    """Next message of the stream, None when the other side closed it"""
+    header = stream.read(HEADER.size)
+    if not header:
+        return None
+
+    if len(header) < HEADER.size:
+        raise ProtocolError("Connection closed in the middle of a message")
+
+    length, request_id, op = HEADER.unpack(header)
+    if length > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"Message of {length} bytes is too large")
+
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise ProtocolError("Connection closed in the middle of a message")
+
+    return request_id, OPS(op), loads(payload)
+
+
+def command_to_body(command: Command) -> dict:
+    return {
+        "cmd": int(command.cmd),
+        "database_name": command.database_name,
+        "collection_name": command.collection_name,
+        "arguments": command.arguments,
+    }
+
+
+def command_from_body(body: dict) -> Command:
+    return Command(
+        cmd=COMMANDS(body["cmd"]),
+        database_name=body["database_name"],
+        collection_name=body["collection_name"],
+        **body["arguments"],
+    )
+
+
+def error_to_body(error: Exception) -> dict:
+    error_type = type(error)
+    args = list(error.args)
+    try:
+        dumps(args)
+    except (TypeError, ValueError):
+        # Rebuilt from the message only
+        args = []
+
+    return {
+        "type": f"{error_type.__module__}.{error_type.__qualname__}",
+        "args": args,
+        "message": str(error),
+    }
+
+
+def error_from_body(body: dict) -> Exception:
+    """Error raised by the server, rebuilt when it's a pymongolite or builtin exception"""
+    module_name, _, name = body["type"].rpartition(".")
+
+    if module_name == "builtins" or module_name.startswith("pymongolite."):
+        try:
+            error_type = getattr(importlib.import_module(module_name), name)
+            if isinstance(error_type, type) and issubclass(error_type, Exception):
+                return error_type(*body["args"])
+        except Exception:
+            pass
+
+    return RemoteCommandError(body["type"], body["message"])
@@ -0,0 +1,91 @@
+from typing import Iterator, Any
+from collections.abc import Mapping
+from json.decoder import WHITESPACE, scanstring
+from json.scanner import make_scanner
+import json
+
+from pymongolite.backend.objectid import OBJECT_ID_TAG, decode_object_id
+
+_scan_once = make_scanner(json.JSONDecoder())
+_scan_once_tagged = make_scanner(json.JSONDecoder(object_hook=decode_object_id))
+_TAG = f'"{OBJECT_ID_TAG}"'
+
+
+class RawDocument(Mapping):
+    """
+    Serialized document that decodes its top level fields on access.
+    The line is scanned from the start only as far as the requested field,
+    decoded fields are kept and the next lookup continues from the same place.
+    """
+
+    __slots__ = ("raw", "_fields", "_position", "_complete")
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self._fields = {}
+        self._position = raw.index("{") + 1
+        self._complete = False
+
+    def _decode_until(self, key: str = None):
+        raw, fields, position = self.raw, self._fields, self._position
+        scan_once = _scan_once_tagged if _TAG in raw else _scan_once
+
+        while not self._complete:
+            position = WHITESPACE.match(raw, position).end()
+            if raw[position] == "}":
+                self._complete = True
+                break
+
+            field, position = scanstring(raw, position + 1)
+            position = WHITESPACE.match(raw, position).end() + 1  # ':'
+            position = WHITESPACE.match(raw, position).end()
+            value, position = scan_once(raw, position)
+            fields[field] = value
+
+            position = WHITESPACE.match(raw, position).end()
+            if raw[position] == ",":
+                position += 1
+
+            if field == key:
+                break
+
+        self._position = position
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields and not self._complete:
+            self._decode_until(key)
+
+        return self._fields[key]
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_dict())
+
+    def __len__(self) -> int:
+        return len(self.to_dict())
+
+    def to_dict(self) -> dict:
+        """Every field decoded, a new dict the caller can change"""
+        if not self._complete:
+            # One call to the C decoder is faster than continuing field by field
+            if _TAG in self.raw:
+                fields = json.loads(self.raw, object_hook=decode_object_id)
+            else:
+                fields = json.loads(self.raw)
+
+            self._fields = fields
+            self._complete = True
+
+        return dict(self._fields)
+
+    def __reduce__(self):
+        return self.__class__, (self.raw,)
+
+    def __repr__(self):
+        return f"RawDocument({self.raw.strip()!r})"
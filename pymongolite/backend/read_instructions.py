@@ -1,4 +1,4 @@
-from typing import Set
+from typing import Set, Dict, List, Tuple
 from itertools import count
 
 DocumentIndex = int
@@ -11,6 +11,9 @@ class ReadInstructions:
         indexes: Set[DocumentIndex] = None,
         exclude_indexes: Set[DocumentIndex] = None,
         chunk_size: int = None,
+        scores: Dict[DocumentIndex, float] = None,
+        stop_offset: DocumentIndex = None,
+        raw_documents: bool = False,
     ):
         if offset is None and indexes is None:
             raise ValueError("You must pass offset or indexes")
@@ -22,8 +25,15 @@ class ReadInstructions:
         self.exclude_indexes = exclude_indexes
         self.offset: DocumentIndex = offset
         self.chunk_size = chunk_size
+        self.scores = scores  # {document_index: score} documents are read by descending score
+        self.stop_offset = stop_offset  # documents at or after this offset are not read
+        self.raw_documents = raw_documents  # documents are RawDocument decoded on field access
+        self.needles: List[Tuple[str, ...]] = []  # lines without a needle of every group are skipped
+        self.snapshot = None  # documents are read as they were when the snapshot was taken
+        self.exact = True  # False when the documents read are a superset of the matches
 
         self._ended = False
+        self._iterator = None
 
     @classmethod
     def from_set_of_indexes(cls, indexes: Set[DocumentIndex]):
@@ -35,13 +45,24 @@ class ReadInstructions:
 
     @property
     def is_index_list(self):
-        return bool(self.indexes)
+        return self.indexes is not None
 
     def end(self):
         self._ended = True
 
     def __iter__(self):
-        if self.indexes:
+        # The same iterator is shared between chunks so reading continues where the last chunk stopped
+        if self._iterator is None:
+            self._iterator = self._iterate()
+
+        return self._iterator
+
+    def _iterate(self):
+        if self.indexes is not None and self.scores:
+            iterator = sorted(
+                self.indexes, key=lambda index: self.scores.get(index, 0), reverse=True
+            )
+        elif self.indexes is not None:
             iterator = self.indexes
         else:
             iterator = count(self.offset, 1)
@@ -49,14 +70,28 @@ class ReadInstructions:
         yield from iterator
         self.end()
 
+    def _merged_scores(self, other) -> Dict[DocumentIndex, float]:
+        if self.scores is None or other.scores is None:
+            return self.scores if other.scores is None else other.scores
+
+        return {**self.scores, **other.scores}
+
     def __and__(self, other):
         if not isinstance(other, ReadInstructions):
             print(type(self) == type(other))
             return NotImplemented
 
-        new_instruction = self.__class__(self.offset, self.indexes, self.exclude_indexes, self.chunk_size)
-
-        if new_instruction is not None and other.offset is not None:
+        new_instruction = self.__class__(
+            self.offset,
+            None if self.indexes is None else set(self.indexes),
+            set(self.exclude_indexes),
+            self.chunk_size,
+            self._merged_scores(other),
+            self.stop_offset,
+            self.raw_documents,
+        )
+
+        if new_instruction.offset is not None and other.offset is not None:
             if new_instruction.offset < other.offset:
                 new_instruction.offset = other.offset
 
@@ -68,6 +103,7 @@ class ReadInstructions:
             new_instruction.indexes = other.indexes
 
         new_instruction.exclude_indexes.update(other.exclude_indexes)
+        new_instruction.exact = self.exact and other.exact
 
         return new_instruction
 
@@ -75,9 +111,17 @@ class ReadInstructions:
         if not isinstance(other, ReadInstructions):
             return NotImplemented
 
-        new_instruction = self.__class__(self.offset, self.indexes, self.exclude_indexes, self.chunk_size)
-
-        if new_instruction is not None and other.offset is not None:
+        new_instruction = self.__class__(
+            self.offset,
+            None if self.indexes is None else set(self.indexes),
+            set(self.exclude_indexes),
+            self.chunk_size,
+            self._merged_scores(other),
+            self.stop_offset,
+            self.raw_documents,
+        )
+
+        if new_instruction.offset is not None and other.offset is not None:
             if new_instruction.offset > other.offset:
                 new_instruction.offset = other.offset
 
@@ -89,10 +133,18 @@ class ReadInstructions:
             new_instruction.indexes = None
 
         new_instruction.exclude_indexes.intersection_update(other.exclude_indexes)
+        new_instruction.exact = self.exact and other.exact
 
         return new_instruction
 
     def __invert__(self):
+        self.scores = None
+
+        # The complement of a superset would drop matches, every document is read
+        if not self.exact:
+            self.offset, self.indexes, self.exclude_indexes = 0, None, set()
+            return self
+
         if self.indexes:
             self.indexes, self.exclude_indexes = self.exclude_indexes, self.indexes
 
@@ -0,0 +1,225 @@
+from typing import Any, Iterable, List, Tuple
+from collections import deque
+from contextlib import contextmanager
+from itertools import count
+from threading import BoundedSemaphore, Lock
+import socket
+
+from pymongolite.backend.command import Command
+from pymongolite.backend.exceptions import ProtocolError, SessionClosedError
+from pymongolite.backend.protocol import (
+    OPS,
+    command_to_body,
+    error_from_body,
+    pack_message,
+    read_message,
+)
+from pymongolite.backend.server import DEFAULT_BATCH_SIZE, Address
+
+DEFAULT_POOL_SIZE = 10
+
+
+class Connection:
+    """Socket to a server, requests sent together are answered in order"""
+
+    def __init__(self, address: Address):
+        if isinstance(address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(address)
+        else:
+            self._socket = socket.create_connection(address)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self._reader = self._socket.makefile("rb")
+        self._request_ids = count(1)
+
+    def request(self, op: OPS, body: dict) -> dict:
+        return self.pipeline([(op, body)])[0]
+
+    def pipeline(self, requests: Iterable[Tuple[OPS, dict]]) -> List[dict]:
+        """Send every request before reading the first reply"""
+        request_ids = []
+        data = []
+        for op, body in requests:
+            request_id = next(self._request_ids) & 0xFFFFFFFF
+            request_ids.append(request_id)
+            data.append(pack_message(request_id, op, body))
+
+        self._socket.sendall(b"".join(data))
+
+        replies = []
+        for request_id in request_ids:
+            message = read_message(self._reader)
+            if message is None:
+                raise ProtocolError("Connection closed by the server")
+
+            response_to, op, body = message
+            if op != OPS.reply or response_to != request_id:
+                raise ProtocolError(f"Unexpected reply to request {response_to}")
+
+            replies.append(body)
+
+        return replies
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+
+class ConnectionPool:
+    """
+    Connections to one server shared by the threads of a client.
+    At most `max_size` connections are open, a thread waits for a free one
+    when all of them are in use.
+    """
+
+    def __init__(self, address: Address, max_size: int = DEFAULT_POOL_SIZE):
+        self.address = address
+        self._slots = BoundedSemaphore(max_size)
+        self._lock = Lock()
+        self._idle: List[Connection] = []
+        self._closed = False
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                connection = Connection(self.address)
+
+            try:
+                yield connection
+            except BaseException:
+                # Replies may still be on the way, the connection can't be reused
+                connection.close()
+                raise
+
+            with self._lock:
+                if not self._closed:
+                    self._idle.append(connection)
+                    return
+
+            connection.close()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+
+        for connection in idle:
+            connection.close()
+
+
+class RemoteCursor:
+    """Documents of a server cursor, the next batch is requested when one runs out"""
+
+    def __init__(self, session: "RemoteSession", cursor: dict):
+        self._session = session
+        self._id = cursor["id"]
+        self._batch = deque(cursor["batch"])
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._batch:
+            if not self._id:
+                raise StopIteration()
+
+            cursor = self._session._get_more(self._id)
+            self._id = cursor["id"]
+            self._batch.extend(cursor["batch"])
+
+        return self._batch.popleft()
+
+    def close(self):
+        self._batch.clear()
+        if self._id:
+            cursor_id, self._id = self._id, 0
+            self._session._kill_cursors([cursor_id])
+
+
+class RemoteSession:
+    """
+    Runs the commands on a :class:`~pymongolite.backend.server.Server`,
+    used by :class:`~pymongolite.client.MongoClient` in place of a
+    :class:`~pymongolite.backend.session.Session` when given a server uri.
+    """
+
+    def __init__(
+        self,
+        address: Address,
+        max_pool_size: int = DEFAULT_POOL_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self._pool = ConnectionPool(address, max_pool_size)
+        self._batch_size = batch_size
+        self._closed = False
+
+    def exc_command(self, command: Command) -> Any:
+        return self.exc_commands([command])[0]
+
+    def exc_commands(self, commands: Iterable[Command]) -> List[Any]:
+        """Run the commands in order, sent together in one round trip.
+        Every command runs, the first error is raised once all the replies are read."""
+        if self.closed:
+            raise SessionClosedError()
+
+        requests = [
+            (
+                OPS.command,
+                {"command": command_to_body(command), "batch_size": self._batch_size},
+            )
+            for command in commands
+        ]
+
+        with self._pool.connection() as connection:
+            replies = connection.pipeline(requests)
+
+        return [self._result(reply) for reply in replies]
+
+    def _result(self, reply: dict) -> Any:
+        self._raise_on_error(reply)
+
+        if "cursor" in reply:
+            return RemoteCursor(self, reply["cursor"])
+
+        return reply["result"]
+
+    @staticmethod
+    def _raise_on_error(reply: dict):
+        if not reply["ok"]:
+            raise error_from_body(reply["error"])
+
+    def _get_more(self, cursor_id: int) -> dict:
+        with self._pool.connection() as connection:
+            reply = connection.request(
+                OPS.get_more, {"cursor_id": cursor_id, "batch_size": self._batch_size}
+            )
+
+        self._raise_on_error(reply)
+        return reply["cursor"]
+
+    def _kill_cursors(self, cursor_ids: List[int]):
+        if self.closed:
+            return
+
+        with self._pool.connection() as connection:
+            reply = connection.request(OPS.kill_cursors, {"cursor_ids": cursor_ids})
+
+        self._raise_on_error(reply)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        self._closed = True
+        self._pool.close()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
@@ -0,0 +1,294 @@
+from typing import Any, Dict, Iterator, Tuple, Union
+from itertools import count, islice
+from threading import Lock, Thread
+import os
+import socket
+import socketserver
+
+from pymongolite.backend.command import COMMANDS, Command
+from pymongolite.backend.exceptions import ProtocolError, TransactionNotActive
+from pymongolite.backend.execution_engine.cursor import Cursor
+from pymongolite.backend.protocol import (
+    OPS,
+    command_from_body,
+    error_to_body,
+    pack_message,
+    read_message,
+)
+from pymongolite.backend.session import Session
+from pymongolite.backend.transaction import Transaction
+
+Address = Union[str, Tuple[str, int]]  # Unix socket path or (host, port)
+
+DEFAULT_PORT = 27117
+DEFAULT_BATCH_SIZE = 100
+
+
+def format_address(address: Address) -> str:
+    if isinstance(address, str):
+        return f"mongolite+unix://{address}"
+
+    host, port = address[:2]
+    return f"mongolite://{host}:{port}"
+
+
+def parse_address(uri: str) -> Union[Address, None]:
+    """Address of a server uri, None when `uri` is not one"""
+    if uri.startswith("mongolite+unix://"):
+        return uri[len("mongolite+unix://") :]
+
+    if uri.startswith("mongolite://"):
+        host, _, port = uri[len("mongolite://") :].rstrip("/").rpartition(":")
+        if not host:
+            return port, DEFAULT_PORT
+        return host, int(port)
+
+    return None
+
+
+class _Owner:
+    """Cursors and transactions opened through one connection"""
+
+    def __init__(self):
+        self.cursor_ids = set()
+        self.transaction_ids = set()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        if self.request.family in (socket.AF_INET, socket.AF_INET6):
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        server = self.server.mongolite_server
+        owner = _Owner()
+
+        try:
+            # Requests of a connection are answered in the order they came in,
+            # the client may send the next ones before reading the replies.
+            while True:
+                message = read_message(self.rfile)
+                if message is None:
+                    return
+
+                request_id, op, body = message
+                reply = server.handle_message(op, body, owner)
+
+                try:
+                    data = pack_message(request_id, OPS.reply, reply)
+                except (TypeError, ValueError) as error:
+                    data = pack_message(
+                        request_id, OPS.reply, {"ok": 0, "error": error_to_body(error)}
+                    )
+
+                self.wfile.write(data)
+        except (ProtocolError, OSError):
+            pass
+        finally:
+            server.release(owner)
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+
+    class _ThreadingUnixServer(
+        socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+    ):
+        daemon_threads = True
+
+
+class Server:
+    """
+    Serves one Session, and so one set of in memory indexes, to the clients of
+    a Unix socket or a localhost TCP port.
+    Every connection is handled by its own thread, cursors are read in batches
+    and kept on the server between the getMore requests of the client.
+
+    :Parameters:
+      - `dirpath`: Directory of the databases.
+      - `address`: Path of a Unix socket or (host, port).
+      - `batch_size` (optional): Documents sent in a cursor batch when the
+        client doesn't choose.
+      - `**kwargs` (optional): Passed to :class:`~pymongolite.backend.session.Session`.
+    """
+
+    def __init__(
+        self,
+        dirpath: str,
+        address: Address,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        **kwargs: Any,
+    ):
+        self._session = Session(dirpath, **kwargs)
+        self._batch_size = batch_size
+
+        self._lock = Lock()
+        self._cursor_ids = count(1)
+        self._cursors: Dict[int, Tuple[Cursor, Iterator]] = {}
+        self._transactions: Dict[str, Transaction] = {}
+
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self._server = _ThreadingUnixServer(address, _RequestHandler)
+        else:
+            self._server = _ThreadingTCPServer(address, _RequestHandler)
+
+        self._server.mongolite_server = self
+        self._thread = None
+
+    @property
+    def address(self) -> Address:
+        return self._server.server_address
+
+    @property
+    def uri(self) -> str:
+        """Uri to pass to :class:`~pymongolite.client.MongoClient`"""
+        return format_address(self.address)
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self) -> "Server":
+        """Serve from a background thread"""
+        self._thread = Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+        with self._lock:
+            cursors = [cursor for cursor, _ in self._cursors.values()]
+            self._cursors.clear()
+        for cursor in cursors:
+            if not cursor._closed:
+                cursor.close()
+
+        self._session.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def handle_message(self, op: OPS, body: dict, owner: _Owner) -> dict:
+        try:
+            if op == OPS.command:
+                return self._handle_command(body, owner)
+
+            if op == OPS.get_more:
+                return {
+                    "ok": 1,
+                    "cursor": self._next_batch(
+                        body["cursor_id"], body.get("batch_size"), owner
+                    ),
+                }
+
+            if op == OPS.kill_cursors:
+                for cursor_id in body["cursor_ids"]:
+                    self._kill_cursor(cursor_id, owner)
+                return {"ok": 1}
+
+            raise ProtocolError(f"Unexpected operation '{op.name}'")
+        except Exception as error:
+            return {"ok": 0, "error": error_to_body(error)}
+
+    def release(self, owner: _Owner):
+        """Close what a disconnected client left open"""
+        for cursor_id in list(owner.cursor_ids):
+            self._kill_cursor(cursor_id, owner)
+
+        with self._lock:
+            transactions = [
+                self._transactions.pop(transaction_id)
+                for transaction_id in owner.transaction_ids
+                if transaction_id in self._transactions
+            ]
+
+        for transaction in transactions:
+            try:
+                self._session.exc_command(
+                    Command(
+                        cmd=COMMANDS.abort_transaction,
+                        database_name=None,
+                        transaction=transaction,
+                    )
+                )
+            except TransactionNotActive:
+                pass
+
+    def _handle_command(self, body: dict, owner: _Owner) -> dict:
+        command = command_from_body(body["command"])
+
+        transaction_id = command.transaction
+        if transaction_id is not None:
+            with self._lock:
+                if transaction_id not in self._transactions:
+                    raise TransactionNotActive()
+                command.arguments["transaction"] = self._transactions[transaction_id]
+
+        try:
+            result = self._session.exc_command(command)
+        finally:
+            if command.cmd in (COMMANDS.commit_transaction, COMMANDS.abort_transaction):
+                with self._lock:
+                    self._transactions.pop(transaction_id, None)
+                owner.transaction_ids.discard(transaction_id)
+
+        if isinstance(result, Transaction):
+            with self._lock:
+                self._transactions[result.id] = result
+            owner.transaction_ids.add(result.id)
+            return {"ok": 1, "result": result.id}
+
+        if isinstance(result, Cursor):
+            with self._lock:
+                cursor_id = next(self._cursor_ids)
+                self._cursors[cursor_id] = (result, iter(result))
+            owner.cursor_ids.add(cursor_id)
+
+            return {
+                "ok": 1,
+                "cursor": self._next_batch(cursor_id, body.get("batch_size"), owner),
+            }
+
+        return {"ok": 1, "result": result}
+
+    def _next_batch(
+        self, cursor_id: int, batch_size: Union[int, None], owner: _Owner
+    ) -> dict:
+        batch_size = batch_size or self._batch_size
+
+        with self._lock:
+            if cursor_id not in self._cursors:
+                raise ProtocolError(f"Cursor {cursor_id} not found")
+            _, documents = self._cursors[cursor_id]
+
+        batch = list(islice(documents, batch_size))
+        if len(batch) < batch_size:
+            self._kill_cursor(cursor_id, owner)
+            cursor_id = 0
+
+        return {"id": cursor_id, "batch": batch}
+
+    def _kill_cursor(self, cursor_id: int, owner: _Owner):
+        with self._lock:
+            cursor, _ = self._cursors.pop(cursor_id, (None, None))
+        owner.cursor_ids.discard(cursor_id)
+
+        # A cursor closes itself once it's exhausted
+        if cursor is not None and not cursor._closed:
+            cursor.close()
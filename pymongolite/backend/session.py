@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Union
 from pathlib import Path
 
 from .exceptions import SessionClosedError
@@ -9,12 +9,21 @@ from pymongolite.backend.command import Command
 
 
 class Session:
-    def __init__(self, dirpath: str, **kwargs):
+    def __init__(
+        self,
+        dirpath: str,
+        query_cache_size: int = 0,
+        read_ahead_chunks: int = 0,
+        **kwargs,
+    ):
         self.__dirpath = Path(dirpath)
         self._storage_engine = FilesEngine(self.__dirpath, **kwargs)
         self._indexing_engine = V1Engine()
         self._execution_engine = ChunkedEngine(
-            storage_engine=self._storage_engine, indexing_engine=self._indexing_engine
+            storage_engine=self._storage_engine,
+            indexing_engine=self._indexing_engine,
+            query_cache_size=query_cache_size,
+            read_ahead_chunks=read_ahead_chunks,
         )
         self._closed = False
 
@@ -24,6 +33,21 @@ class Session:
 
         return self._execution_engine.execute_command(command)
 
+    def lock_stats(self) -> dict:
+        """Wait time of the collection locks, at the command and at the storage level"""
+        return {
+            "commands": self._execution_engine.lock_stats(),
+            "storage": self._storage_engine.lock_stats(),
+        }
+
+    def query_cache_stats(self) -> Union[dict, None]:
+        """Hits, misses and size of the query cache, None when it's disabled"""
+        return self._execution_engine.query_cache_stats()
+
+    def document_cache_stats(self) -> Union[dict, None]:
+        """Hits, misses and size of the document cache, None when it's disabled"""
+        return self._storage_engine.document_cache_stats()
+
     @property
     def closed(self) -> bool:
         return self._closed
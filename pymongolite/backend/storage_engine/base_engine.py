@@ -1,9 +1,11 @@
-from typing import List, Any
+from typing import List, Any, Union, Tuple
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 
 from pymongolite.backend.read_instructions import ReadInstructions
 from pymongolite.backend.storage_engine.update_instructions import UpdateInstructions
 from pymongolite.backend.storage_engine.insert_instruction import InsertInstructions
+from pymongolite.backend.storage_engine.snapshot import Snapshot
 
 
 class BaseEngine(ABC):
@@ -23,10 +25,22 @@ class BaseEngine(ABC):
     def drop_collection(self, database_name: str, collection_name: str) -> bool:
         raise NotImplementedError
 
+    @abstractmethod
+    def is_collection_exists(self, database_name: str, collection_name: str) -> bool:
+        raise NotImplementedError
+
     @abstractmethod
     def get_collections_list(self, database_name: str) -> List[str]:
         raise NotImplementedError
 
+    @abstractmethod
+    def get_collection_size(self, database_name: str, collection_name: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_documents_count(self, database_name: str, collection_name: str) -> int:
+        raise NotImplementedError
+
     @abstractmethod
     def get_documents(
         self,
@@ -62,3 +76,47 @@ class BaseEngine(ABC):
         insert_instructions: InsertInstructions,
     ) -> List[Any]:
         raise NotImplementedError
+
+    @abstractmethod
+    def write_journal(self, journal_id: str, entries: list):
+        """Durably write the changes of a commit before they are applied"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_journal(self, journal_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_journals(self) -> List[Tuple[str, list]]:
+        """(journal id, entries) of the commits that were not fully applied"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def sync_collection(self, database_name: str, collection_name: str):
+        """Flush the collection to the disk"""
+        raise NotImplementedError
+
+    @contextmanager
+    def collection_lock(
+        self, database_name: str, collection_name: str, exclusive: bool = False
+    ):
+        """Hold the collection for a whole command, storage calls made inside don't wait on it"""
+        yield
+
+    def open_snapshot(
+        self, database_name: str, collection_name: str
+    ) -> Union[Snapshot, None]:
+        """Snapshot for ReadInstructions.snapshot, None when reads aren't isolated"""
+        return None
+
+    def get_changed_version(
+        self, database_name: str, collection_name: str
+    ) -> Union[int, None]:
+        """
+        Version of the collection when another process changed it since `mark_synced`,
+        None when nothing changed or the engine isn't shared between processes.
+        """
+        return None
+
+    def mark_synced(self, database_name: str, collection_name: str, version: int):
+        pass
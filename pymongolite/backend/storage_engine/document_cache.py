@@ -0,0 +1,216 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict, defaultdict
+from threading import Lock
+
+DEFAULT_DOCUMENT_CACHE_SIZE = 64 * 1024 * 1024
+
+# (database name, collection name, offset of the line)
+DocumentKey = Tuple[str, str, int]
+
+
+def copy_document(value: Any) -> Any:
+    """Copy of the dicts and lists of a decoded document, their items are immutable"""
+    value_type = type(value)
+    if value_type is dict:
+        return {key: copy_document(item) for key, item in value.items()}
+    if value_type is list:
+        return [copy_document(item) for item in value]
+    return value
+
+
+class DocumentCacheStats:
+    """Lookups and evictions of the document cache"""
+
+    __slots__ = (
+        "hits",
+        "misses",
+        "promotions",
+        "evictions",
+        "invalidations",
+        "entries",
+        "size",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"DocumentCacheStats({self.to_dict()})"
+
+
+class CachedDocument:
+    """Line of a document, decoded the first time a reader needs its fields"""
+
+    __slots__ = ("line", "_data", "size")
+
+    def __init__(self, line: str):
+        self.line = line
+        self.size = len(line)
+        self._data = None
+
+    def decoded(self, deserialize) -> dict:
+        """A copy of the fields, callers may change it"""
+        data = self._data
+        if data is None:
+            data = self._data = deserialize(self.line)
+
+        return copy_document(data)
+
+
+class DocumentCache:
+    """
+    Lines of documents by offset, a read of a cached line doesn't touch the file.
+    Entries are bounded by `max_size` characters and evicted with 2Q: a line read
+    for the first time waits in a FIFO holding at most a quarter of the cache,
+    only a line looked up again after leaving it goes to the LRU part. A full
+    scan goes through the FIFO without evicting the lines that are read often.
+
+    Writers invalidate the offsets they tombstone, every collection has a
+    generation and a line read before an invalidation is not kept.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_DOCUMENT_CACHE_SIZE,
+        max_entry_size: Optional[int] = None,
+    ):
+        self.max_size = max_size
+        self.max_entry_size = max_size // 8 if max_entry_size is None else max_entry_size
+        self.stats = DocumentCacheStats()
+
+        self._lock = Lock()
+        self._probation: "OrderedDict[DocumentKey, CachedDocument]" = OrderedDict()
+        self._probation_size = 0
+        self._probation_max_size = max_size // 4
+        # Offsets that left the FIFO recently and the size of their line
+        self._ghosts: "OrderedDict[DocumentKey, int]" = OrderedDict()
+        self._ghosts_size = 0
+        self._ghosts_max_size = max_size // 2
+        self._frequent: "OrderedDict[DocumentKey, CachedDocument]" = OrderedDict()
+        self._generations: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._versions: Dict[Tuple[str, str], int] = {}
+
+    def generation(self, database_name: str, collection_name: str) -> int:
+        return self._generations[(database_name, collection_name)]
+
+    def get(self, key: DocumentKey) -> Optional[CachedDocument]:
+        with self._lock:
+            entry = self._frequent.get(key)
+            if entry is not None:
+                self._frequent.move_to_end(key)
+            else:
+                # A second read while in the FIFO is still the same burst of reads
+                entry = self._probation.get(key)
+
+            if entry is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+
+            return entry
+
+    def put(self, key: DocumentKey, generation: int, line: str, scan: bool = False):
+        """`scan`: read by a full scan, the line isn't promoted even after leaving the FIFO"""
+        entry = CachedDocument(line)
+        if entry.size > self.max_entry_size:
+            return
+
+        with self._lock:
+            # The line may have been tombstoned since it was read
+            if generation != self._generations[key[:2]]:
+                return
+
+            if key in self._frequent or key in self._probation:
+                return
+
+            ghost_size = None if scan else self._ghosts.pop(key, None)
+            if ghost_size is not None:
+                self._ghosts_size -= ghost_size
+                self._frequent[key] = entry
+                self.stats.promotions += 1
+            else:
+                self._probation[key] = entry
+                self._probation_size += entry.size
+
+            self.stats.entries += 1
+            self.stats.size += entry.size
+            self._evict()
+
+    def invalidate(self, database_name: str, collection_name: str, offsets):
+        """Forget tombstoned lines, called after they are marked"""
+        with self._lock:
+            self._generations[(database_name, collection_name)] += 1
+            self.stats.invalidations += 1
+
+            for offset in offsets:
+                self._remove((database_name, collection_name, offset), forget=True)
+
+    def invalidate_collection(self, database_name: str, collection_name: str):
+        """Forget every line, offsets are reused once a collection is dropped"""
+        with self._lock:
+            self._clear(lambda collection: collection == (database_name, collection_name))
+
+    def invalidate_database(self, database_name: str):
+        with self._lock:
+            self._clear(lambda collection: collection[0] == database_name)
+
+    def sync(self, database_name: str, collection_name: str, version: int):
+        """Forget the lines of a collection another process may have changed since the last read"""
+        collection = (database_name, collection_name)
+
+        with self._lock:
+            if self._versions.get(collection) == version:
+                return
+
+            self._clear(lambda cleared: cleared == collection)
+            self._versions[collection] = version
+
+    def _evict(self):
+        while self.stats.size > self.max_size:
+            if self._probation and (
+                self._probation_size > self._probation_max_size or not self._frequent
+            ):
+                key, entry = self._probation.popitem(last=False)
+                self._probation_size -= entry.size
+                self._ghosts[key] = entry.size
+                self._ghosts_size += entry.size
+            else:
+                key, entry = self._frequent.popitem(last=False)
+
+            self.stats.entries -= 1
+            self.stats.size -= entry.size
+            self.stats.evictions += 1
+
+        while self._ghosts_size > self._ghosts_max_size:
+            _, size = self._ghosts.popitem(last=False)
+            self._ghosts_size -= size
+
+    def _remove(self, key: DocumentKey, forget: bool = False):
+        entry = self._frequent.pop(key, None)
+        if entry is None:
+            entry = self._probation.pop(key, None)
+            if entry is not None:
+                self._probation_size -= entry.size
+
+        if forget:
+            size = self._ghosts.pop(key, None)
+            if size is not None:
+                self._ghosts_size -= size
+
+        if entry is not None:
+            self.stats.entries -= 1
+            self.stats.size -= entry.size
+
+    def _clear(self, is_cleared):
+        for collection in list(self._generations):
+            if is_cleared(collection):
+                self._generations[collection] += 1
+        self.stats.invalidations += 1
+
+        for entries in (self._frequent, self._probation, self._ghosts):
+            for key in [key for key in entries if is_cleared(key[:2])]:
+                self._remove(key, forget=True)
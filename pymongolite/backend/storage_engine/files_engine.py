@@ -1,32 +1,75 @@
-from typing import Union, List
+from typing import Union, List, Tuple
 from pathlib import Path
-from threading import Lock
 from collections import defaultdict
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from itertools import count
+from threading import local
 from uuid import uuid4
+from weakref import WeakSet
 import json
+import mmap
 import os
 import io
 import shutil
+import struct
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
 
 from pymongolite.backend.exceptions import (
     DatabaseNotFound,
     CollectionNotFound,
 )
 from pymongolite.backend.document import Document
+from pymongolite.backend.raw_document import RawDocument
+from pymongolite.backend.objectid import OBJECT_ID_TAG, ObjectId, decode_object_id
+from pymongolite.backend.locks import ReadWriteLock
 from pymongolite.backend.storage_engine.base_engine import BaseEngine
 from pymongolite.backend.storage_engine.insert_instruction import InsertInstructions
 from pymongolite.backend.read_instructions import ReadInstructions
 from pymongolite.backend.storage_engine.update_instructions import UpdateInstructions
+from pymongolite.backend.storage_engine.snapshot import Snapshot
+from pymongolite.backend.storage_engine.document_cache import DocumentCache
+
+# Change counter of a collection, shared between the processes through an mmap of its lock file
+VERSION_FORMAT = "<Q"
+VERSION_SIZE = struct.calcsize(VERSION_FORMAT)
 
 
 class FilesEngine(BaseEngine):
-    def __init__(self, dirpath: Union[str, Path], **kwargs):
+    def __init__(
+        self,
+        dirpath: Union[str, Path],
+        multiprocess: bool = False,
+        document_cache_size: int = 0,
+        **kwargs,
+    ):
+        """
+        :Parameters:
+          - `document_cache_size` (optional): Characters of document lines kept in
+            memory, 0 disables the document cache.
+        """
+        if multiprocess and fcntl is None:
+            raise NotImplementedError("Multi-process access requires fcntl file locks")
+
         self._dirpath = str(dirpath)
         self.options = kwargs
-        self._collection_locks = defaultdict(Lock)
+        self._multiprocess = multiprocess
+        self._collection_locks = defaultdict(ReadWriteLock)
+        self._thread_state = local()
+        self._shared_versions = {}  # {collection full name: mmap of the change counter}
+        self._synced_versions = {}  # {collection full name: version this process is in sync with}
+        self._delete_versions = {}  # {collection full name: version of the last write that deleted lines}
+        self._snapshots = defaultdict(WeakSet)  # {collection full name: snapshots of open cursors}
+        self._tombstones = {}  # {collection full name: {offset: version of the write that deleted it}}
+        self._tombstones_pruned_at = {}  # {collection full name: oldest snapshot version}
         self._offsets = {}
+        self._documents_counts = {}  # {(database_name, collection_name): live documents}
+        self._document_cache = (
+            DocumentCache(document_cache_size) if document_cache_size else None
+        )
 
         self._ensure_root_dir()
 
@@ -56,11 +99,66 @@ class FilesEngine(BaseEngine):
 
         return self._get_database_path(database_name) / collection_name
 
+    def _get_metadata_path(self, database_name: str, collection_name: str) -> Path:
+        # Dotfiles are hidden from the collections list
+        return self._get_database_path(database_name) / f".{collection_name}.meta"
+
+    def _get_journal_path(self) -> Path:
+        # Not a database, a dotfile is skipped when listing the root directory
+        return self._root_path / ".journal"
+
+    def _get_lock_path(self, database_name: str, collection_name: str) -> Path:
+        return self._get_database_path(database_name) / f".{collection_name}.lock"
+
+    def _load_documents_count(self, database_name: str, collection_name: str) -> int:
+        metadata_path = self._get_metadata_path(database_name, collection_name)
+
+        if os.path.exists(metadata_path):
+            with open(metadata_path, "r") as metadata_file:
+                return json.load(metadata_file)["count"]
+
+        # Collection from before the metadata file, count it once
+        collection_path = self._get_collection_path(
+            database_name, collection_name, error_not_found=True
+        )
+        with open(collection_path, "r") as collection_file:
+            documents_count = sum(
+                1 for line in collection_file if not self._is_line_marked_as_deleted(line)
+            )
+
+        self._save_documents_count(database_name, collection_name, documents_count)
+        return documents_count
+
+    def _save_documents_count(
+        self, database_name: str, collection_name: str, documents_count: int
+    ):
+        metadata_path = self._get_metadata_path(database_name, collection_name)
+        temporary_path = metadata_path.with_name(metadata_path.name + ".tmp")
+
+        with open(temporary_path, "w") as metadata_file:
+            json.dump({"count": documents_count}, metadata_file)
+        os.replace(temporary_path, metadata_path)
+
+        self._documents_counts[(database_name, collection_name)] = documents_count
+
+    @staticmethod
+    def _encode_default(value):
+        if isinstance(value, ObjectId):
+            return {OBJECT_ID_TAG: str(value)}
+        raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+    @staticmethod
+    def _decode(serialized: str):
+        # The hook is slow, most lines have no tagged ObjectId
+        if f'"{OBJECT_ID_TAG}"' in serialized:
+            return json.loads(serialized, object_hook=decode_object_id)
+        return json.loads(serialized)
+
     def _serialize_document(self, document: dict) -> str:
-        return json.dumps(document)
+        return json.dumps(document, default=self._encode_default)
 
     def _deserialize_document(self, serialized_document: str) -> dict:
-        return json.loads(serialized_document)
+        return self._decode(serialized_document)
 
     def _mark_document_as_deleted(self, file, index: int):
         file.seek(index)
@@ -69,6 +167,11 @@ class FilesEngine(BaseEngine):
     def _is_line_marked_as_deleted(self, line: str) -> bool:
         return line.startswith("0")
 
+    def _invalidate_documents(self, database_name: str, collection_name: str, offsets: List[int]):
+        # After marking, a reader without the lock caches a line only if it saw no mark
+        if self._document_cache is not None:
+            self._document_cache.invalidate(database_name, collection_name, offsets)
+
     def _insert_document(self, file, document: dict) -> int:
         file.seek(0, io.SEEK_END)
         seek_value = file.tell()
@@ -76,11 +179,214 @@ class FilesEngine(BaseEngine):
         return seek_value
 
     @contextmanager
-    def _collection_lock(self, database_name: str, collection_name: str):
+    def collection_lock(
+        self, database_name: str, collection_name: str, exclusive: bool = False
+    ):
+        # Readers share the collection, writers get it alone
+        lock = self._collection_locks[f"{database_name}.{collection_name}"]
+
+        with lock.write_locked() if exclusive else lock.read_locked():
+            if self._multiprocess:
+                with self._process_lock(database_name, collection_name, exclusive):
+                    yield
+            else:
+                yield
+
+    @contextmanager
+    def _process_lock(self, database_name: str, collection_name: str, exclusive: bool):
         collection_full_name = f"{database_name}.{collection_name}"
-        self._collection_locks[collection_full_name].acquire(blocking=True)
-        yield
-        self._collection_locks[collection_full_name].release()
+        depths = self._thread_state.__dict__.setdefault("lock_depths", {})
+
+        # Already held by this thread for the whole command
+        if depths.get(collection_full_name):
+            depths[collection_full_name] += 1
+            try:
+                yield
+            finally:
+                depths[collection_full_name] -= 1
+            return
+
+        try:
+            # Every acquisition opens the file, flock of two descriptors conflict even in one process
+            fd = os.open(
+                self._get_lock_path(database_name, collection_name), os.O_RDWR | os.O_CREAT
+            )
+        except FileNotFoundError:
+            # No database directory yet, nothing to protect
+            yield
+            return
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            depths[collection_full_name] = 1
+            yield
+        finally:
+            depths[collection_full_name] = 0
+            os.close(fd)
+
+    def _get_shared_version(self, database_name: str, collection_name: str) -> mmap.mmap:
+        collection_full_name = f"{database_name}.{collection_name}"
+        shared_version = self._shared_versions.get(collection_full_name)
+
+        if shared_version is None:
+            fd = os.open(
+                self._get_lock_path(database_name, collection_name), os.O_RDWR | os.O_CREAT
+            )
+            try:
+                if os.fstat(fd).st_size < VERSION_SIZE:
+                    os.ftruncate(fd, VERSION_SIZE)
+                shared_version = mmap.mmap(fd, VERSION_SIZE)
+            finally:
+                os.close(fd)
+
+            self._shared_versions[collection_full_name] = shared_version
+
+        return shared_version
+
+    def _bump_version(self, database_name: str, collection_name: str):
+        # Called under the exclusive lock
+        if not self._multiprocess:
+            return
+
+        collection_full_name = f"{database_name}.{collection_name}"
+        shared_version = self._get_shared_version(database_name, collection_name)
+        version = struct.unpack_from(VERSION_FORMAT, shared_version)[0]
+        struct.pack_into(VERSION_FORMAT, shared_version, 0, version + 1)
+
+        # A change of another process in between stays visible
+        if self._synced_versions.get(collection_full_name) == version:
+            self._synced_versions[collection_full_name] = version + 1
+
+    def open_snapshot(self, database_name: str, collection_name: str) -> Snapshot:
+        collection_full_name = f"{database_name}.{collection_name}"
+        collection_path = self._get_collection_path(database_name, collection_name)
+
+        with self.collection_lock(database_name, collection_name):
+            # A missing collection fails on the first read like without a snapshot
+            watermark = os.path.getsize(collection_path) if os.path.exists(collection_path) else 0
+            snapshot = Snapshot(
+                watermark=watermark,
+                version=self._delete_versions.get(collection_full_name, 0),
+            )
+            self._snapshots[collection_full_name].add(snapshot)
+
+        return snapshot
+
+    def _log_tombstones(self, database_name: str, collection_name: str, offsets: List[int]):
+        """
+        Called under the exclusive lock before the lines are marked, a reader without the lock
+        that sees the mark always finds its version.
+        """
+        collection_full_name = f"{database_name}.{collection_name}"
+        version = self._delete_versions.get(collection_full_name, 0) + 1
+        self._delete_versions[collection_full_name] = version
+
+        snapshots_versions = [
+            snapshot.version for snapshot in list(self._snapshots.get(collection_full_name, ()))
+        ]
+        if not snapshots_versions:
+            # Snapshots taken from now on see every existing mark as deleted
+            self._tombstones.pop(collection_full_name, None)
+            self._tombstones_pruned_at.pop(collection_full_name, None)
+            return
+
+        tombstones = self._tombstones.get(collection_full_name, {})
+
+        # Deletes older than every open snapshot look the same as the marks without a version
+        oldest_version = min(snapshots_versions)
+        if self._tombstones_pruned_at.get(collection_full_name) != oldest_version:
+            tombstones = {
+                offset: deleted_version
+                for offset, deleted_version in tombstones.items()
+                if deleted_version > oldest_version
+            }
+            self._tombstones_pruned_at[collection_full_name] = oldest_version
+
+        for offset in offsets:
+            tombstones[offset] = version
+        self._tombstones[collection_full_name] = tombstones
+
+    def _is_deleted_in_snapshot(
+        self, database_name: str, collection_name: str, offset: int, snapshot: Snapshot
+    ) -> bool:
+        tombstones = self._tombstones.get(f"{database_name}.{collection_name}", {})
+        return tombstones.get(offset, 0) <= snapshot.version
+
+    def get_changed_version(
+        self, database_name: str, collection_name: str
+    ) -> Union[int, None]:
+        if not self._multiprocess or not self.is_database_exists(database_name):
+            return None
+
+        shared_version = self._get_shared_version(database_name, collection_name)
+        version = struct.unpack_from(VERSION_FORMAT, shared_version)[0]
+
+        if self._synced_versions.get(f"{database_name}.{collection_name}") == version:
+            return None
+
+        return version
+
+    def mark_synced(self, database_name: str, collection_name: str, version: int):
+        self._synced_versions[f"{database_name}.{collection_name}"] = version
+
+    def lock_stats(self) -> dict:
+        """{collection full name: lock stats}"""
+        return {
+            name: lock.stats.to_dict() for name, lock in list(self._collection_locks.items())
+        }
+
+    def document_cache_stats(self) -> Union[dict, None]:
+        """Hits, misses and size of the document cache, None when it's disabled"""
+        if self._document_cache is None:
+            return None
+
+        return self._document_cache.stats.to_dict()
+
+    def write_journal(self, journal_id: str, entries: list):
+        journal_path = self._get_journal_path()
+        os.makedirs(journal_path, exist_ok=True)
+
+        entry_path = journal_path / f"{journal_id}.json"
+        temporary_path = entry_path.with_name(entry_path.name + ".tmp")
+
+        with open(temporary_path, "w") as journal_file:
+            journal_file.write(json.dumps(entries, default=self._encode_default))
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+        # The commit point, a journal is either complete or missing
+        os.replace(temporary_path, entry_path)
+
+    def remove_journal(self, journal_id: str):
+        try:
+            os.remove(self._get_journal_path() / f"{journal_id}.json")
+        except FileNotFoundError:
+            pass
+
+    def get_journals(self) -> List[Tuple[str, list]]:
+        journal_path = self._get_journal_path()
+        if not os.path.exists(journal_path):
+            return []
+
+        journals = []
+        for entry in sorted(os.scandir(journal_path), key=lambda entry: entry.name):
+            if entry.name.endswith(".tmp"):
+                # Crashed before the commit point, nothing was applied
+                os.remove(entry.path)
+                continue
+
+            with open(entry.path, "r") as journal_file:
+                journals.append((entry.name[: -len(".json")], self._decode(journal_file.read())))
+
+        return journals
+
+    def sync_collection(self, database_name: str, collection_name: str):
+        collection_path = self._get_collection_path(database_name, collection_name)
+        if not os.path.exists(collection_path):
+            return
+
+        with open(collection_path, "r") as collection_file:
+            os.fsync(collection_file.fileno())
 
     def is_database_exists(self, database_name: str) -> bool:
         database_dir_path = self._get_database_path(database_name)
@@ -106,6 +412,17 @@ class FilesEngine(BaseEngine):
         database_dir_path = self._get_database_path(database_name, error_not_found=True)
         shutil.rmtree(database_dir_path)
 
+        for key in [key for key in self._documents_counts if key[0] == database_name]:
+            del self._documents_counts[key]
+
+        if self._document_cache is not None:
+            self._document_cache.invalidate_database(database_name)
+
+        for collection_full_name in list(self._shared_versions):
+            if collection_full_name.startswith(f"{database_name}."):
+                self._shared_versions.pop(collection_full_name).close()
+                self._synced_versions.pop(collection_full_name, None)
+
         return True
 
     def create_collection(self, database_name: str, collection_name: str) -> bool:
@@ -114,6 +431,8 @@ class FilesEngine(BaseEngine):
 
         collection_path = self._get_collection_path(database_name, collection_name)
         collection_path.touch()
+        self._save_documents_count(database_name, collection_name, 0)
+        self._bump_version(database_name, collection_name)
 
         return True
 
@@ -124,7 +443,21 @@ class FilesEngine(BaseEngine):
         collection_path = self._get_collection_path(
             database_name, collection_name, error_not_found=True
         )
-        os.remove(collection_path)
+        with self.collection_lock(database_name, collection_name, exclusive=True):
+            os.remove(collection_path)
+            self._bump_version(database_name, collection_name)
+
+            collection_full_name = f"{database_name}.{collection_name}"
+            self._tombstones.pop(collection_full_name, None)
+            self._tombstones_pruned_at.pop(collection_full_name, None)
+
+            if self._document_cache is not None:
+                self._document_cache.invalidate_collection(database_name, collection_name)
+
+        metadata_path = self._get_metadata_path(database_name, collection_name)
+        if os.path.exists(metadata_path):
+            os.remove(metadata_path)
+        self._documents_counts.pop((database_name, collection_name), None)
 
         return True
 
@@ -132,7 +465,30 @@ class FilesEngine(BaseEngine):
         database_path = self._get_database_path(database_name, error_not_found=True)
         database_dir = os.scandir(database_path)
 
-        return [entry.name for entry in database_dir if entry.is_file()]
+        return [
+            entry.name
+            for entry in database_dir
+            if entry.is_file() and not entry.name.startswith(".")
+        ]
+
+    def get_collection_size(self, database_name: str, collection_name: str) -> int:
+        collection_path = self._get_collection_path(
+            database_name, collection_name, error_not_found=True
+        )
+        return os.path.getsize(collection_path)
+
+    def get_documents_count(self, database_name: str, collection_name: str) -> int:
+        # Other processes change the count, the metadata file is the only copy
+        if self._multiprocess:
+            return self._load_documents_count(database_name, collection_name)
+
+        key = (database_name, collection_name)
+        if key not in self._documents_counts:
+            self._documents_counts[key] = self._load_documents_count(
+                database_name, collection_name
+            )
+
+        return self._documents_counts[key]
 
     def get_documents(
         self,
@@ -143,40 +499,117 @@ class FilesEngine(BaseEngine):
         collection_path = self._get_collection_path(database_name, collection_name)
         documents = []
 
-        with self._collection_lock(database_name, collection_name):
+        snapshot = read_instructions.snapshot
+        stop_offset = read_instructions.stop_offset
+        if snapshot is not None:
+            stop_offset = (
+                snapshot.watermark if stop_offset is None else min(stop_offset, snapshot.watermark)
+            )
+
+        # Below the watermark lines only change by getting a delete mark, snapshot reads need no lock.
+        # Other processes don't log their deletes, their readers and writers still exclude each other.
+        if snapshot is not None and not self._multiprocess:
+            lock = nullcontext()
+        else:
+            lock = self.collection_lock(database_name, collection_name)
+
+        with lock:
+            cache = self._document_cache
+            if cache is not None:
+                if self._multiprocess:
+                    # Other processes don't invalidate the lines they tombstone
+                    cache.sync(
+                        database_name,
+                        collection_name,
+                        struct.unpack_from(
+                            VERSION_FORMAT,
+                            self._get_shared_version(database_name, collection_name),
+                        )[0],
+                    )
+                generation = cache.generation(database_name, collection_name)
+
             with open(collection_path, "r") as collection_file:
                 if read_instructions.chunk_size is None:
                     restrict_loop = count(0, 1)
                 else:
                     restrict_loop = range(read_instructions.chunk_size)
 
-                for document_index, _ in zip(read_instructions, restrict_loop):
-                    if read_instructions.is_index_list:
-                        collection_file.seek(document_index)
-                    else:
-                        document_index = collection_file.tell()
+                if not read_instructions.is_index_list:
+                    collection_file.seek(read_instructions.offset)
 
-                    # Every line is a serialized document
-                    line = collection_file.readline()
+                needles = read_instructions.needles
 
-                    # End of file
-                    if line == "":
+                # restrict_loop goes first so no document index is lost when the chunk is full
+                for _, document_index in zip(restrict_loop, read_instructions):
+                    if not read_instructions.is_index_list:
+                        document_index = collection_file.tell()
+
+                    if stop_offset is not None and document_index >= stop_offset:
+                        if read_instructions.is_index_list:
+                            continue
                         read_instructions.end()
                         break
 
-                    if document_index in read_instructions.exclude_indexes:
-                        continue
+                    # Scans read every line anyway, only lookups by offset skip the file
+                    cached = None
+                    if cache is not None and read_instructions.is_index_list:
+                        if document_index in read_instructions.exclude_indexes:
+                            continue
+                        cached = cache.get((database_name, collection_name, document_index))
 
-                    # Deleted document
-                    if self._is_line_marked_as_deleted(line):
+                    if cached is not None:
+                        line = cached.line
+                    else:
+                        if read_instructions.is_index_list:
+                            collection_file.seek(document_index)
+
+                        # Every line is a serialized document
+                        line = collection_file.readline()
+
+                        # End of file
+                        if line == "":
+                            read_instructions.end()
+                            break
+
+                        if document_index in read_instructions.exclude_indexes:
+                            continue
+
+                        # Deleted document
+                        if self._is_line_marked_as_deleted(line):
+                            if snapshot is None or self._is_deleted_in_snapshot(
+                                database_name, collection_name, document_index, snapshot
+                            ):
+                                continue
+
+                            # Deleted after the snapshot, the mark replaced the opening brace
+                            line = "{" + line[1:]
+                        elif cache is not None:
+                            cache.put(
+                                (database_name, collection_name, document_index),
+                                generation,
+                                line,
+                                scan=not read_instructions.is_index_list,
+                            )
+
+                    # Can't match the filter, skip it before decoding
+                    if needles and not all(
+                        any(needle in line for needle in group) for group in needles
+                    ):
                         continue
 
-                    document = Document(
-                        data=self._deserialize_document(line),
-                        lookup_key=document_index,
-                    )
+                    if read_instructions.raw_documents:
+                        data = RawDocument(line)
+                    elif cached is not None:
+                        data = cached.decoded(self._deserialize_document)
+                    else:
+                        data = self._deserialize_document(line)
+
+                    document = Document(data=data, lookup_key=document_index)
                     documents.append(document)
 
+                if not read_instructions.is_index_list:
+                    read_instructions.offset = collection_file.tell()
+
         return documents
 
     def update_documents(
@@ -189,11 +622,23 @@ class FilesEngine(BaseEngine):
             database_name=database_name, collection_name=collection_name
         )
         documents = []
-        with open(collection_path, "r+") as file:
-            for index, updated_document in update_instructions:
-                self._mark_document_as_deleted(file, index)
-                lookup_key = self._insert_document(file, updated_document)
-                documents.append(Document(lookup_key=lookup_key, data=updated_document))
+        with self.collection_lock(database_name, collection_name, exclusive=True):
+            overwrites = list(update_instructions)
+            self._log_tombstones(
+                database_name, collection_name, [index for index, _ in overwrites]
+            )
+
+            with open(collection_path, "r+") as file:
+                for index, updated_document in overwrites:
+                    self._mark_document_as_deleted(file, index)
+                    lookup_key = self._insert_document(file, updated_document)
+                    documents.append(Document(lookup_key=lookup_key, data=updated_document))
+
+            self._invalidate_documents(
+                database_name, collection_name, [index for index, _ in overwrites]
+            )
+
+            self._bump_version(database_name, collection_name)
         return documents
 
     def delete_documents(
@@ -205,9 +650,22 @@ class FilesEngine(BaseEngine):
         collection_path = self._get_collection_path(
             database_name=database_name, collection_name=collection_name
         )
-        with open(collection_path, "r+") as file:
-            for index in delete_instructions:
-                self._mark_document_as_deleted(file, index)
+        with self.collection_lock(database_name, collection_name, exclusive=True):
+            # Loaded before writing, a missing metadata file is rebuilt by counting the lines
+            documents_count = self.get_documents_count(database_name, collection_name)
+
+            offsets = list(delete_instructions)
+            self._log_tombstones(database_name, collection_name, offsets)
+
+            with open(collection_path, "r+") as file:
+                for index in offsets:
+                    self._mark_document_as_deleted(file, index)
+                    documents_count -= 1
+
+            self._invalidate_documents(database_name, collection_name, offsets)
+
+            self._save_documents_count(database_name, collection_name, documents_count)
+            self._bump_version(database_name, collection_name)
 
     def insert_documents(
         self,
@@ -220,9 +678,27 @@ class FilesEngine(BaseEngine):
         )
         lookup_keys = []
 
-        with open(collection_path, "r+") as file:
-            for document in insert_instructions:
-                document_lookup_key = self._insert_document(file, document)
-                lookup_keys.append(document_lookup_key)
+        with self.collection_lock(database_name, collection_name, exclusive=True):
+            documents_count = self.get_documents_count(database_name, collection_name)
+
+            # Serialized first, a document that can't be stored writes none of them
+            lines = [
+                self._serialize_document(document) + "\n"
+                for document in insert_instructions
+            ]
+
+            with open(collection_path, "r+") as file:
+                file.seek(0, io.SEEK_END)
+                offset = file.tell()
+                for line in lines:
+                    lookup_keys.append(offset)
+                    # json.dumps escapes to ascii, one character is one byte
+                    offset += len(line)
+                file.write("".join(lines))
+
+            self._save_documents_count(
+                database_name, collection_name, documents_count + len(lookup_keys)
+            )
+            self._bump_version(database_name, collection_name)
 
         return lookup_keys
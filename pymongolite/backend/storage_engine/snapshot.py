@@ -0,0 +1,15 @@
+class Snapshot:
+    """
+    Point in time view of a collection for a reader.
+    Lines at or after `watermark` were appended later, lines deleted by a write
+    with a version above `version` were still alive when the snapshot was taken.
+    """
+
+    __slots__ = ("watermark", "version", "__weakref__")
+
+    def __init__(self, watermark: int, version: int):
+        self.watermark = watermark
+        self.version = version
+
+    def __repr__(self):
+        return f"Snapshot(watermark={self.watermark}, version={self.version})"
@@ -0,0 +1,100 @@
+from typing import Any, Dict, Iterable, Set, Tuple, Union
+from threading import Lock
+from uuid import uuid4
+from weakref import WeakSet
+
+CollectionKey = Tuple[str, str]  # (database name, collection name)
+
+
+class Transaction:
+    """
+    Writes of a transaction, kept in memory until the commit.
+    The documents read are remembered, the commit fails when one of them or one
+    of the written documents was changed by someone else after the transaction started.
+    """
+
+    def __init__(self, start_version: int):
+        self.id = uuid4().hex
+        self.start_version = start_version
+        # {collection: {document id: document, None when deleted}}
+        self.writes: Dict[CollectionKey, Dict[Any, Union[dict, None]]] = {}
+        # {collection: ids of the documents read}
+        self.reads: Dict[CollectionKey, Set[Any]] = {}
+        self.active = True
+
+    def collection_writes(
+        self, database_name: str, collection_name: str
+    ) -> Dict[Any, Union[dict, None]]:
+        return self.writes.setdefault((database_name, collection_name), {})
+
+    def collection_reads(self, database_name: str, collection_name: str) -> Set[Any]:
+        return self.reads.setdefault((database_name, collection_name), set())
+
+    @property
+    def collections(self) -> Set[CollectionKey]:
+        return set(self.writes) | set(self.reads)
+
+    def __repr__(self):
+        return f"Transaction({self.id!r})"
+
+
+class TransactionManager:
+    """
+    Version of the last write of every document changed while transactions are open.
+    Writes done when no transaction is open can't conflict with anything and aren't recorded.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = 0
+        self._active = WeakSet()
+        self._document_versions: Dict[CollectionKey, Dict[Any, int]] = {}
+
+    def start(self) -> Transaction:
+        with self._lock:
+            transaction = Transaction(self._version)
+            self._active.add(transaction)
+
+        return transaction
+
+    def finish(self, transaction: Transaction):
+        with self._lock:
+            transaction.active = False
+            self._active.discard(transaction)
+
+            if not self._active:
+                self._document_versions.clear()
+                return
+
+            # Writes older than every open transaction can't conflict anymore
+            oldest_version = min(active.start_version for active in self._active)
+            for key, versions in list(self._document_versions.items()):
+                self._document_versions[key] = {
+                    document_id: version
+                    for document_id, version in versions.items()
+                    if version > oldest_version
+                }
+
+    def record(self, database_name: str, collection_name: str, document_ids: Iterable[Any]):
+        with self._lock:
+            if not self._active:
+                return
+
+            self._version += 1
+            versions = self._document_versions.setdefault((database_name, collection_name), {})
+            for document_id in document_ids:
+                versions[document_id] = self._version
+
+    def is_conflicting(self, transaction: Transaction) -> bool:
+        with self._lock:
+            for key in transaction.collections:
+                versions = self._document_versions.get(key, {})
+                document_ids = transaction.writes.get(key, {}).keys() | transaction.reads.get(key, set())
+
+                if any(
+                    versions.get(document_id, 0) > transaction.start_version
+                    for document_id in document_ids
+                ):
+                    return True
+
+        return False
@@ -1,4 +1,13 @@
+from typing import Optional, Iterable, List, Tuple
+from functools import lru_cache
+from copy import deepcopy
 from itertools import islice
+import operator
+import json
+import re
+
+from pymongolite.backend.geo import parse_point, parse_shape, parse_near
+from pymongolite.backend.objectid import ObjectId
 
 
 class Null:
@@ -6,10 +15,79 @@ class Null:
         return False
 
 
+def _compare(compare, value, other) -> bool:
+    # A missing field or a value of another type never matches a range
+    if isinstance(value, Null):
+        return False
+
+    try:
+        return compare(value, other)
+    except TypeError:
+        return False
+
+
 def is_condition(item) -> bool:
     return isinstance(item, dict) and next(iter(item.keys())).startswith("$")
 
 
+REGEX_OPTIONS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
+REGEX_SPECIAL_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+@lru_cache(maxsize=256)
+def _compile_regex(pattern: str, options: str) -> re.Pattern:
+    flags = 0
+    for option in options:
+        flags |= REGEX_OPTIONS.get(option, 0)
+
+    return re.compile(pattern, flags)
+
+
+def compile_regex(pattern, options: str = "") -> re.Pattern:
+    if isinstance(pattern, re.Pattern):
+        return pattern
+
+    return _compile_regex(pattern, options)
+
+
+def regex_literal_prefix(regex: re.Pattern) -> Optional[str]:
+    """
+    The literal prefix every string matching an anchored regex starts with
+    ^abc.* -> abc, ^ab?c -> a, abc -> None
+    """
+    if regex.flags & (re.IGNORECASE | re.MULTILINE | re.VERBOSE):
+        return None
+
+    source = regex.pattern
+    if not isinstance(source, str) or not source.startswith("^") or "|" in source:
+        return None
+
+    prefix = []
+    for char in source[1:]:
+        # Quantifier that can make the previous char optional
+        if char in "*?{":
+            if prefix:
+                prefix.pop()
+            break
+
+        if char in REGEX_SPECIAL_CHARACTERS:
+            break
+
+        prefix.append(char)
+
+    return "".join(prefix) or None
+
+
+def validate_filter(filter_: dict):
+    """$text is answered by the text index for the whole filter, it can't be nested"""
+    for field, pattern in filter_.items():
+        if field in ("$and", "$or", "$nor"):
+            for sub_filter in pattern:
+                if "$text" in sub_filter:
+                    raise ValueError(f"$text can't be nested under {field}")
+                validate_filter(sub_filter)
+
+
 def document_filter_match(document: dict, filter: dict) -> bool:
     if not filter:
         return True
@@ -26,6 +104,10 @@ def document_filter_match(document: dict, filter: dict) -> bool:
                 continue
 
         if field_is_gate_condition:
+            # Answered by the text index
+            if field == "$text":
+                continue
+
             if field == "$and" and not all(
                     map(
                         lambda filter_: document_filter_match(document, filter_),
@@ -56,16 +138,16 @@ def document_filter_match(document: dict, filter: dict) -> bool:
         if "$ne" in pattern and value == pattern["$ne"]:
             return False
 
-        if "$gt" in pattern and value <= pattern["$gt"]:
+        if "$gt" in pattern and not _compare(operator.gt, value, pattern["$gt"]):
             return False
 
-        if "$gte" in pattern and value < pattern["$gte"]:
+        if "$gte" in pattern and not _compare(operator.ge, value, pattern["$gte"]):
             return False
 
-        if "$lt" in pattern and value >= pattern["$lt"]:
+        if "$lt" in pattern and not _compare(operator.lt, value, pattern["$lt"]):
             return False
 
-        if "$lte" in pattern and value > pattern["$lte"]:
+        if "$lte" in pattern and not _compare(operator.le, value, pattern["$lte"]):
             return False
 
         if "$exists" in pattern:
@@ -80,6 +162,26 @@ def document_filter_match(document: dict, filter: dict) -> bool:
         if "$nin" in pattern and value in pattern["$nin"]:
             return False
 
+        if "$regex" in pattern and not (
+            isinstance(value, str)
+            and compile_regex(pattern["$regex"], pattern.get("$options", "")).search(value)
+        ):
+            return False
+
+        if "$geoWithin" in pattern:
+            point = parse_point(value)
+            if point is None or not parse_shape(pattern["$geoWithin"]).contains(point):
+                return False
+
+        if "$near" in pattern:
+            point = parse_point(value)
+            if point is None:
+                return False
+
+            near = parse_near(pattern)
+            if not near.in_range(near.distance(point)):
+                return False
+
         if "$not" in pattern and document_filter_match(
             document, {field: pattern["$not"]}
         ):
@@ -88,11 +190,111 @@ def document_filter_match(document: dict, filter: dict) -> bool:
     return True
 
 
+def _normalize_condition(pattern) -> dict:
+    if is_condition(pattern):
+        return pattern
+
+    return {"$eq": pattern}
+
+
+def _field_conditions(filter_: dict, field: str) -> list:
+    """Collect the conditions the filter puts on a field (top level and $and)"""
+    conditions = []
+
+    for key, pattern in filter_.items():
+        if key == field:
+            conditions.append(_normalize_condition(pattern))
+
+        if key == "$and":
+            for sub_filter in pattern:
+                conditions.extend(_field_conditions(sub_filter, field))
+
+    return conditions
+
+
+# {implied operation: {operation of the query: how its value must relate to the implied value}}
+_IMPLIED_BOUNDS = {
+    "$gt": {"$gt": operator.ge, "$gte": operator.gt, "$eq": operator.gt},
+    "$gte": {"$gt": operator.ge, "$gte": operator.ge, "$eq": operator.ge},
+    "$lt": {"$lt": operator.le, "$lte": operator.lt, "$eq": operator.lt},
+    "$lte": {"$lt": operator.le, "$lte": operator.le, "$eq": operator.le},
+}
+
+
+def _condition_implies(condition: dict, operation: str, value) -> bool:
+    if operation in condition and condition[operation] == value:
+        return True
+
+    equal_values = None
+    if "$eq" in condition:
+        equal_values = [condition["$eq"]]
+    elif "$in" in condition:
+        equal_values = list(condition["$in"])
+
+    if operation == "$exists":
+        if not value:
+            return False
+        return equal_values is not None or condition.get("$exists") is True
+
+    if operation == "$eq":
+        return equal_values is not None and all(v == value for v in equal_values)
+
+    if operation == "$in":
+        return equal_values is not None and all(v in value for v in equal_values)
+
+    if operation not in _IMPLIED_BOUNDS:
+        return False
+
+    try:
+        for bound_operation, compare in _IMPLIED_BOUNDS[operation].items():
+            if bound_operation == "$eq":
+                if equal_values and all(compare(v, value) for v in equal_values):
+                    return True
+            elif bound_operation in condition and compare(condition[bound_operation], value):
+                return True
+    except TypeError:
+        return False
+
+    return False
+
+
+def filter_implies(filter_: dict, expression: dict) -> bool:
+    """
+    Conservative check that every document matching filter_ also matches expression.
+    False negatives are allowed (the caller just loses an optimization), false positives are not.
+    """
+    if not expression:
+        return True
+
+    if not filter_:
+        return False
+
+    for field, pattern in expression.items():
+        if field == "$and":
+            if not all(filter_implies(filter_, sub_expression) for sub_expression in pattern):
+                return False
+            continue
+
+        if field.startswith("$"):
+            return False
+
+        conditions = _field_conditions(filter_, field)
+        for operation, value in _normalize_condition(pattern).items():
+            if not any(
+                _condition_implies(condition, operation, value)
+                for condition in conditions
+            ):
+                return False
+
+    return True
+
+
 def update_with_fields(document: dict, fields: dict):
     if not fields:
         return document
 
-    if next(iter(fields.values())) == 0:
+    # _id can be excluded next to included fields, any included field makes it an inclusion
+    if not any(fields.values()):
         new_doc = document
     else:
         new_doc = {}
@@ -107,7 +309,8 @@ def update_with_fields(document: dict, fields: dict):
 
 
 def update_document_with_override(document: dict, override: dict):
-    document = document.copy()
+    # Deep copy, array operators must not change the original document
+    document = deepcopy(document)
     for action, fields in override.items():
         if action == "$set":
             for field, value in fields.items():
@@ -119,8 +322,7 @@ def update_document_with_override(document: dict, override: dict):
 
         if action == "$inc":
             for field, value in fields.items():
-                if field in document:
-                    document[field] += value
+                document[field] = document.get(field, 0) + value
 
         if action == "$addToSet":
             for field, value in fields.items():
@@ -171,6 +373,96 @@ def update_document_with_override(document: dict, override: dict):
     return document
 
 
+# Numbers past this are written in exponent form, their text differs between int and float
+_MAX_NEEDLE_NUMBER = 10 ** 15
+
+
+def _value_needle(value) -> Optional[str]:
+    """Text every serialized document equal to the value must contain"""
+    if isinstance(value, ObjectId):
+        value = str(value)
+
+    if isinstance(value, str):
+        return json.dumps(value)
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+
+    if abs(value) >= _MAX_NEEDLE_NUMBER:
+        return None
+
+    # 5 == 5.0, "5" is in both "5" and "5.0"
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def raw_needles(filter_: dict) -> List[Tuple[str, ...]]:
+    """
+    Byte level prefilter of a filter, a line can only match when it contains
+    at least one needle of every group. Only equality and $in add groups.
+    """
+    needles = []
+
+    for field, pattern in filter_.items():
+        if field == "$and":
+            for subfilter in pattern:
+                needles.extend(raw_needles(subfilter))
+            continue
+
+        if field.startswith("$"):
+            continue
+
+        if not is_condition(pattern):
+            values = [pattern]
+        elif "$eq" in pattern:
+            values = [pattern["$eq"]]
+        elif isinstance(pattern.get("$in"), list) and pattern["$in"]:
+            values = pattern["$in"]
+        else:
+            continue
+
+        group = tuple(_value_needle(value) for value in values)
+        if None not in group:
+            needles.append(group)
+
+    return needles
+
+
+def build_upsert_document(
+    filter_: dict, override: dict = None, replacement: dict = None
+) -> dict:
+    """
+    The document inserted by an upsert that matched nothing.
+    An equality on _id in the filter is its id, repeating the upsert finds it.
+    """
+    if replacement is not None:
+        document = dict(replacement)
+
+        id_pattern = filter_.get("_id")
+        if "_id" not in document and id_pattern is not None:
+            if not is_condition(id_pattern):
+                document = {"_id": id_pattern, **document}
+            elif "$eq" in id_pattern:
+                document = {"_id": id_pattern["$eq"], **document}
+    else:
+        # Equality fields of the filter are the base of the new document
+        document = {}
+        for field, pattern in filter_.items():
+            if field.startswith("$"):
+                continue
+
+            if not is_condition(pattern):
+                document[field] = pattern
+            elif "$eq" in pattern:
+                document[field] = pattern["$eq"]
+
+        document = update_document_with_override(document, override)
+        document.update(override.get("$setOnInsert", {}))
+
+    return document
+
+
 def grouper(n, iterable):
     it = iter(iterable)
     while True:
@@ -178,3 +470,29 @@ def grouper(n, iterable):
         if not chunk:
             return
         yield chunk
+
+
+def unique_values(values: Iterable) -> list:
+    """Distinct values in order of appearance, arrays contribute each of their items"""
+    unique = []
+    seen = set()
+
+    for value in values:
+        items = value if isinstance(value, list) else (value,)
+
+        for item in items:
+            if isinstance(item, Null):
+                continue
+
+            try:
+                if item in seen:
+                    continue
+                seen.add(item)
+            except TypeError:
+                # Unhashable documents are compared one by one
+                if item in unique:
+                    continue
+
+            unique.append(item)
+
+    return unique
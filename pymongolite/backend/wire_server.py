@@ -0,0 +1,836 @@
+"""
+MongoDB wire protocol front end, lets MongoDB drivers use a pymongolite directory.
+Speaks OP_MSG, and OP_QUERY for the handshake older drivers start with.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import count, islice
+from threading import Lock
+import asyncio
+import os
+import struct
+import time
+
+from pymongolite.backend import bson_codec
+from pymongolite.backend.bson_codec import Int64, InvalidBSON
+from pymongolite.backend.command import COMMANDS, Command
+from pymongolite.backend.exceptions import (
+    CollectionAlreadyExists,
+    CollectionNotFound,
+    DatabaseNotFound,
+    DuplicateKeyError,
+    IndexRequired,
+    ProtocolError,
+)
+from pymongolite.backend.session import Session
+
+OP_REPLY = 1
+OP_QUERY = 2004
+OP_MSG = 2013
+
+_HEADER = struct.Struct("<iiii")  # length, request id, response to, op code
+_UINT32 = struct.Struct("<I")
+_INT32 = struct.Struct("<i")
+_OP_REPLY_PREFIX = struct.Struct("<iqii")
+
+_CHECKSUM_PRESENT = 1 << 0
+_MORE_TO_COME = 1 << 1
+
+DEFAULT_WIRE_PORT = 27017
+MAX_BSON_OBJECT_SIZE = 16 * 1024 * 1024
+MAX_MESSAGE_SIZE = 48 * 1024 * 1024
+MAX_WRITE_BATCH_SIZE = 100000
+MAX_WIRE_VERSION = 17  # MongoDB 6.0
+FIRST_BATCH_SIZE = 101
+GET_MORE_BATCH_SIZE = 1000
+CURSOR_TIMEOUT = 600  # Seconds an unused cursor stays open
+
+_ERROR_CODES = [
+    (CollectionNotFound, 26, "NamespaceNotFound"),
+    (DatabaseNotFound, 26, "NamespaceNotFound"),
+    (CollectionAlreadyExists, 48, "NamespaceExists"),
+    (IndexRequired, 27, "IndexNotFound"),
+    (DuplicateKeyError, 11000, "DuplicateKey"),
+    (InvalidBSON, 22, "InvalidBSON"),
+    (ValueError, 2, "BadValue"),
+    (TypeError, 14, "TypeMismatch"),
+]
+
+
+class CommandError(Exception):
+    def __init__(self, message: str, code: int = 8, code_name: str = "UnknownError"):
+        super().__init__(message)
+        self.code = code
+        self.code_name = code_name
+
+    @classmethod
+    def from_exception(cls, error: Exception) -> "CommandError":
+        if isinstance(error, cls):
+            return error
+
+        for error_type, code, code_name in _ERROR_CODES:
+            if isinstance(error, error_type):
+                return cls(str(error), code, code_name)
+
+        return cls(str(error))
+
+    def to_document(self) -> dict:
+        return {
+            "ok": 0.0,
+            "errmsg": str(self),
+            "code": self.code,
+            "codeName": self.code_name,
+        }
+
+
+class _ServerCursor:
+    __slots__ = ("namespace", "documents", "last_used")
+
+    def __init__(self, namespace: str, documents: Iterator[dict]):
+        self.namespace = namespace
+        self.documents = documents
+        self.last_used = time.monotonic()
+
+
+def _index_name(key: dict) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in key.items())
+
+
+def _split_update(update: Any) -> Tuple[Optional[dict], Optional[dict]]:
+    """(override, replacement) of an update document"""
+    if not isinstance(update, dict):
+        raise CommandError("Update pipelines are not supported", 2, "BadValue")
+
+    if update and all(key.startswith("$") for key in update):
+        return update, None
+
+    return None, update
+
+
+class WireServer:
+    """
+    Serves one Session over the MongoDB wire protocol.
+    Connections are handled by asyncio, the commands run in a thread pool so
+    commands on different collections run in parallel.
+    Cursors stay on the server between getMore commands and can be
+    continued from any connection, like MongoDB cursors.
+
+    :Parameters:
+      - `dirpath`: Directory of the databases.
+      - `address` (optional): (host, port) or the path of a Unix socket.
+      - `max_workers` (optional): Size of the thread pool running the commands.
+      - `**kwargs` (optional): Passed to :class:`~pymongolite.backend.session.Session`.
+    """
+
+    def __init__(
+        self,
+        dirpath: str,
+        address: Union[str, Tuple[str, int]] = ("127.0.0.1", DEFAULT_WIRE_PORT),
+        max_workers: Optional[int] = None,
+        **kwargs: Any,
+    ):
+        self._session = Session(dirpath, **kwargs)
+        self._address = address
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pymongolite-wire"
+        )
+        self._server = None
+
+        self._lock = Lock()
+        self._cursor_ids = count(1)
+        self._cursors: Dict[int, _ServerCursor] = {}
+
+        self._commands: Dict[str, Callable[[str, dict], dict]] = {
+            "hello": self._hello,
+            "isMaster": self._hello,
+            "ismaster": self._hello,
+            "ping": self._ping,
+            "buildInfo": self._build_info,
+            "buildinfo": self._build_info,
+            "endSessions": self._ping,
+            "create": self._create,
+            "drop": self._drop,
+            "dropDatabase": self._drop_database,
+            "listCollections": self._list_collections,
+            "insert": self._insert,
+            "update": self._update,
+            "delete": self._delete,
+            "find": self._find,
+            "getMore": self._get_more,
+            "killCursors": self._kill_cursors,
+            "aggregate": self._aggregate,
+            "count": self._count,
+            "distinct": self._distinct,
+            "findAndModify": self._find_and_modify,
+            "findandmodify": self._find_and_modify,
+            "createIndexes": self._create_indexes,
+            "dropIndexes": self._drop_indexes,
+            "listIndexes": self._list_indexes,
+        }
+
+    @property
+    def address(self) -> Union[str, Tuple[str, int]]:
+        """Address listened on, the real port when started on port 0"""
+        if self._server is None:
+            return self._address
+        return self._server.sockets[0].getsockname()
+
+    async def start(self):
+        if isinstance(self._address, str):
+            if os.path.exists(self._address):
+                os.remove(self._address)
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, self._address
+            )
+        else:
+            host, port = self._address
+            self._server = await asyncio.start_server(
+                self._handle_connection, host, port
+            )
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        if isinstance(self._address, str) and os.path.exists(self._address):
+            os.remove(self._address)
+
+        self._executor.shutdown()
+        with self._lock:
+            self._cursors.clear()
+        self._session.close()
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        loop = asyncio.get_running_loop()
+
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    return
+
+                length, request_id, _, op_code = _HEADER.unpack(header)
+                if not _HEADER.size < length <= MAX_MESSAGE_SIZE:
+                    raise ProtocolError(f"Invalid message length {length}")
+
+                data = await reader.readexactly(length - _HEADER.size)
+                reply = await loop.run_in_executor(
+                    self._executor,
+                    self._handle_message,
+                    op_code,
+                    data,
+                    request_id,
+                )
+
+                if reply is not None:
+                    writer.write(reply)
+                    await writer.drain()
+        except (
+            ProtocolError,
+            InvalidBSON,
+            ConnectionError,
+            asyncio.IncompleteReadError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    def _handle_message(
+        self, op_code: int, data: bytes, request_id: int
+    ) -> Optional[bytes]:
+        if op_code == OP_MSG:
+            flags, database_name, body = self._parse_op_msg(data)
+            reply = self._run_command(database_name, body)
+
+            # The client doesn't wait for a reply, writes with w=0 are sent that way
+            if flags & _MORE_TO_COME:
+                return None
+
+            payload = _UINT32.pack(0) + b"\x00" + bson_codec.encode(reply)
+            return self._message(payload, request_id, OP_MSG)
+
+        if op_code == OP_QUERY:
+            namespace, body = self._parse_op_query(data)
+            database_name, _, collection_name = namespace.partition(".")
+            if collection_name != "$cmd":
+                reply = CommandError(
+                    "OP_QUERY is only supported for commands",
+                    352,
+                    "UnsupportedOpQueryCommand",
+                ).to_document()
+            else:
+                reply = self._run_command(database_name, body)
+
+            payload = _OP_REPLY_PREFIX.pack(0, 0, 0, 1) + bson_codec.encode(reply)
+            return self._message(payload, request_id, OP_REPLY)
+
+        raise ProtocolError(f"Unsupported op code {op_code}")
+
+    @staticmethod
+    def _message(payload: bytes, response_to: int, op_code: int) -> bytes:
+        header = _HEADER.pack(_HEADER.size + len(payload), 0, response_to, op_code)
+        return header + payload
+
+    @staticmethod
+    def _parse_op_msg(data: bytes) -> Tuple[int, str, dict]:
+        (flags,) = _UINT32.unpack_from(data)
+        end = len(data) - 4 if flags & _CHECKSUM_PRESENT else len(data)
+        position = 4
+        body = None
+        sequences = {}
+
+        while position < end:
+            kind = data[position]
+            position += 1
+
+            if kind == 0:
+                body, position = bson_codec.decode(data, position)
+            elif kind == 1:
+                (size,) = _INT32.unpack_from(data, position)
+                section_end = position + size
+                identifier_end = data.index(b"\x00", position + 4)
+                identifier = data[position + 4 : identifier_end].decode()
+                position = identifier_end + 1
+
+                documents = []
+                while position < section_end:
+                    document, position = bson_codec.decode(data, position)
+                    documents.append(document)
+                sequences[identifier] = documents
+            else:
+                raise ProtocolError(f"Unknown OP_MSG section kind {kind}")
+
+        if body is None:
+            raise ProtocolError("OP_MSG without a body section")
+
+        # Document sequences are fields of the command, like `documents` of insert
+        body.update(sequences)
+        return flags, body.get("$db", "admin"), body
+
+    @staticmethod
+    def _parse_op_query(data: bytes) -> Tuple[str, dict]:
+        namespace_end = data.index(b"\x00", 4)
+        namespace = data[4:namespace_end].decode()
+        query, _ = bson_codec.decode(data, namespace_end + 1 + 8)
+
+        # Drivers may wrap the command with its read preference
+        if "$query" in query:
+            query = query["$query"]
+        elif "query" in query and len(query) > 1 and "readPreference" in query:
+            query = query["query"]
+
+        return namespace, query
+
+    def _run_command(self, database_name: str, body: dict) -> dict:
+        if not body:
+            return CommandError("Empty command", 59, "CommandNotFound").to_document()
+
+        name = next(iter(body))
+        handler = self._commands.get(name)
+        if handler is None:
+            return CommandError(
+                f"no such command: '{name}'", 59, "CommandNotFound"
+            ).to_document()
+
+        try:
+            reply = handler(database_name, body)
+        except Exception as error:
+            return CommandError.from_exception(error).to_document()
+
+        reply["ok"] = 1.0
+        return reply
+
+    def _exc(
+        self,
+        cmd: COMMANDS,
+        database_name: str,
+        collection_name: Optional[str] = None,
+        **arguments: Any,
+    ) -> Any:
+        return self._session.exc_command(
+            Command(
+                cmd=cmd,
+                database_name=database_name,
+                collection_name=collection_name,
+                **arguments,
+            )
+        )
+
+    def _ensure_collection(self, database_name: str, collection_name: str):
+        """Writes create their collection, like they do on MongoDB"""
+        self._exc(COMMANDS.create_database, database_name)
+        self._exc(COMMANDS.create_collection, database_name, collection_name)
+
+    def _collection_exists(self, database_name: str, collection_name: str) -> bool:
+        try:
+            return collection_name in self._exc(
+                COMMANDS.get_collection_list, database_name
+            )
+        except DatabaseNotFound:
+            return False
+
+    # Cursors
+
+    def _open_cursor(
+        self,
+        namespace: str,
+        documents: Iterator[dict],
+        batch_size: Optional[int],
+        single_batch: bool = False,
+    ) -> dict:
+        documents = iter(documents)
+        batch = list(islice(documents, batch_size or FIRST_BATCH_SIZE))
+        cursor_id = 0
+
+        if not single_batch and len(batch) == (batch_size or FIRST_BATCH_SIZE):
+            with self._lock:
+                self._reap_cursors()
+                cursor_id = next(self._cursor_ids)
+                self._cursors[cursor_id] = _ServerCursor(namespace, documents)
+
+        return {
+            "cursor": {"firstBatch": batch, "id": Int64(cursor_id), "ns": namespace}
+        }
+
+    def _reap_cursors(self):
+        deadline = time.monotonic() - CURSOR_TIMEOUT
+        for cursor_id, cursor in list(self._cursors.items()):
+            if cursor.last_used < deadline:
+                del self._cursors[cursor_id]
+
+    def _get_more(self, database_name: str, body: dict) -> dict:
+        cursor_id = body["getMore"]
+        batch_size = body.get("batchSize") or GET_MORE_BATCH_SIZE
+
+        with self._lock:
+            cursor = self._cursors.get(cursor_id)
+        if cursor is None:
+            raise CommandError(f"cursor id {cursor_id} not found", 43, "CursorNotFound")
+
+        batch = list(islice(cursor.documents, batch_size))
+        cursor.last_used = time.monotonic()
+
+        if len(batch) < batch_size:
+            with self._lock:
+                self._cursors.pop(cursor_id, None)
+            cursor_id = 0
+
+        return {
+            "cursor": {
+                "nextBatch": batch,
+                "id": Int64(cursor_id),
+                "ns": cursor.namespace,
+            }
+        }
+
+    def _kill_cursors(self, database_name: str, body: dict) -> dict:
+        killed, not_found = [], []
+
+        with self._lock:
+            for cursor_id in body.get("cursors", []):
+                if self._cursors.pop(cursor_id, None) is None:
+                    not_found.append(Int64(cursor_id))
+                else:
+                    killed.append(Int64(cursor_id))
+
+        return {
+            "cursorsKilled": killed,
+            "cursorsNotFound": not_found,
+            "cursorsAlive": [],
+            "cursorsUnknown": [],
+        }
+
+    # Server commands
+
+    def _hello(self, database_name: str, body: dict) -> dict:
+        return {
+            "helloOk": True,
+            "isWritablePrimary": True,
+            "ismaster": True,
+            "maxBsonObjectSize": MAX_BSON_OBJECT_SIZE,
+            "maxMessageSizeBytes": MAX_MESSAGE_SIZE,
+            "maxWriteBatchSize": MAX_WRITE_BATCH_SIZE,
+            "localTime": datetime.utcnow(),
+            "minWireVersion": 0,
+            "maxWireVersion": MAX_WIRE_VERSION,
+            "readOnly": False,
+        }
+
+    def _ping(self, database_name: str, body: dict) -> dict:
+        return {}
+
+    def _build_info(self, database_name: str, body: dict) -> dict:
+        return {
+            "version": "6.0.0",
+            "versionArray": [6, 0, 0, 0],
+            "maxBsonObjectSize": MAX_BSON_OBJECT_SIZE,
+        }
+
+    # Database and collection commands
+
+    def _create(self, database_name: str, body: dict) -> dict:
+        self._exc(COMMANDS.create_collection, database_name, body["create"])
+        return {}
+
+    def _drop(self, database_name: str, body: dict) -> dict:
+        if not self._collection_exists(database_name, body["drop"]):
+            raise CommandError("ns not found", 26, "NamespaceNotFound")
+
+        self._exc(COMMANDS.drop_collection, database_name, body["drop"])
+        return {"ns": f"{database_name}.{body['drop']}"}
+
+    def _drop_database(self, database_name: str, body: dict) -> dict:
+        try:
+            self._exc(COMMANDS.drop_database, database_name)
+        except DatabaseNotFound:
+            pass
+        return {"dropped": database_name}
+
+    def _list_collections(self, database_name: str, body: dict) -> dict:
+        try:
+            names = self._exc(COMMANDS.get_collection_list, database_name)
+        except DatabaseNotFound:
+            names = []
+
+        name_filter = (body.get("filter") or {}).get("name")
+        collections = [
+            {
+                "name": name,
+                "type": "collection",
+                "options": {},
+                "info": {"readOnly": False},
+            }
+            for name in names
+            if name_filter is None or name == name_filter
+        ]
+
+        batch_size = (body.get("cursor") or {}).get("batchSize")
+        return self._open_cursor(
+            f"{database_name}.$cmd.listCollections", collections, batch_size
+        )
+
+    # Write commands
+
+    def _insert(self, database_name: str, body: dict) -> dict:
+        collection_name = body["insert"]
+        documents = body.get("documents", [])
+        self._ensure_collection(database_name, collection_name)
+
+        self._exc(COMMANDS.insert, database_name, collection_name, documents=documents)
+        return {"n": len(documents)}
+
+    def _write_each(
+        self, statements: List[dict], ordered: bool, write: Callable[[int, dict], None]
+    ) -> List[dict]:
+        """Run every statement, the errors are returned as write errors"""
+        write_errors = []
+
+        for index, statement in enumerate(statements):
+            try:
+                write(index, statement)
+            except Exception as error:
+                error = CommandError.from_exception(error)
+                write_errors.append(
+                    {"index": index, "code": error.code, "errmsg": str(error)}
+                )
+                if ordered:
+                    break
+
+        return write_errors
+
+    def _update(self, database_name: str, body: dict) -> dict:
+        collection_name = body["update"]
+        self._ensure_collection(database_name, collection_name)
+
+        reply = {"n": 0, "nModified": 0}
+        upserted = []
+
+        def write(index: int, statement: dict):
+            override, replacement = _split_update(statement["u"])
+            if replacement is not None and statement.get("multi"):
+                raise CommandError(
+                    "multi update is not supported for replacement-style update",
+                    9,
+                    "FailedToParse",
+                )
+
+            result = self._exc(
+                COMMANDS.update if override is not None else COMMANDS.replace,
+                database_name,
+                collection_name,
+                filter=statement.get("q", {}),
+                override=override,
+                replacement=replacement,
+                many=bool(statement.get("multi")),
+                upsert=bool(statement.get("upsert")),
+            )
+
+            reply["n"] += result["matched_count"]
+            reply["nModified"] += result["modified_count"]
+            if "upserted_id" in result:
+                reply["n"] += 1
+                upserted.append({"index": index, "_id": result["upserted_id"]})
+
+        write_errors = self._write_each(
+            body.get("updates", []), body.get("ordered", True), write
+        )
+
+        if upserted:
+            reply["upserted"] = upserted
+        if write_errors:
+            reply["writeErrors"] = write_errors
+        return reply
+
+    def _delete(self, database_name: str, body: dict) -> dict:
+        collection_name = body["delete"]
+        reply = {"n": 0}
+
+        if not self._collection_exists(database_name, collection_name):
+            return reply
+
+        def write(index: int, statement: dict):
+            result = self._exc(
+                COMMANDS.delete,
+                database_name,
+                collection_name,
+                filter=statement.get("q", {}),
+                many=statement.get("limit", 0) == 0,
+            )
+            reply["n"] += result["deleted_count"]
+
+        write_errors = self._write_each(
+            body.get("deletes", []), body.get("ordered", True), write
+        )
+
+        if write_errors:
+            reply["writeErrors"] = write_errors
+        return reply
+
+    def _find_and_modify(self, database_name: str, body: dict) -> dict:
+        collection_name = body.get("findAndModify", body.get("findandmodify"))
+        if body.get("sort"):
+            raise CommandError("sort is not supported by findAndModify", 2, "BadValue")
+
+        self._ensure_collection(database_name, collection_name)
+
+        override = replacement = None
+        remove = bool(body.get("remove"))
+        if not remove:
+            override, replacement = _split_update(body.get("update"))
+
+        value = self._exc(
+            COMMANDS.find_and_modify,
+            database_name,
+            collection_name,
+            filter=body.get("query", {}),
+            override=override,
+            replacement=replacement,
+            remove=remove,
+            upsert=bool(body.get("upsert")),
+            return_new=bool(body.get("new")),
+            fields=body.get("fields"),
+        )
+
+        found = value is not None
+        return {
+            "value": value,
+            "lastErrorObject": {
+                "n": int(found),
+                "updatedExisting": found and not remove,
+            },
+        }
+
+    # Read commands
+
+    def _find(self, database_name: str, body: dict) -> dict:
+        collection_name = body["find"]
+        namespace = f"{database_name}.{collection_name}"
+        filter_ = body.get("filter") or {}
+        projection = body.get("projection") or {}
+        limit = body.get("limit") or 0
+        skip = body.get("skip") or 0
+        single_batch = bool(body.get("singleBatch")) or limit < 0
+        limit = abs(limit)
+
+        if not self._collection_exists(database_name, collection_name):
+            return self._open_cursor(namespace, [], None)
+
+        if body.get("sort") or skip:
+            pipeline = [{"$match": filter_}]
+            if body.get("sort"):
+                pipeline.append({"$sort": body["sort"]})
+            if skip:
+                pipeline.append({"$skip": skip})
+            if limit:
+                pipeline.append({"$limit": limit})
+            if projection:
+                pipeline.append({"$project": projection})
+
+            documents = self._exc(
+                COMMANDS.aggregate, database_name, collection_name, pipeline=pipeline
+            )
+        else:
+            documents = self._exc(
+                COMMANDS.find,
+                database_name,
+                collection_name,
+                filter=filter_,
+                fields=projection,
+                many=True,
+                limit=limit or None,
+            )
+
+        return self._open_cursor(
+            namespace, documents, body.get("batchSize"), single_batch
+        )
+
+    def _aggregate(self, database_name: str, body: dict) -> dict:
+        collection_name = body["aggregate"]
+        namespace = f"{database_name}.{collection_name}"
+        batch_size = (body.get("cursor") or {}).get("batchSize")
+
+        if not self._collection_exists(database_name, collection_name):
+            return self._open_cursor(namespace, [], batch_size)
+
+        documents = self._exc(
+            COMMANDS.aggregate,
+            database_name,
+            collection_name,
+            pipeline=body.get("pipeline", []),
+        )
+        return self._open_cursor(namespace, documents, batch_size)
+
+    def _count(self, database_name: str, body: dict) -> dict:
+        collection_name = body["count"]
+        if not self._collection_exists(database_name, collection_name):
+            return {"n": 0}
+
+        query = body.get("query") or {}
+        if query:
+            count_ = self._exc(
+                COMMANDS.count_documents, database_name, collection_name, filter=query
+            )
+        else:
+            count_ = self._exc(
+                COMMANDS.estimated_document_count, database_name, collection_name
+            )
+
+        skip = body.get("skip") or 0
+        count_ = max(count_ - skip, 0)
+        if body.get("limit"):
+            count_ = min(count_, abs(body["limit"]))
+
+        return {"n": count_}
+
+    def _distinct(self, database_name: str, body: dict) -> dict:
+        collection_name = body["distinct"]
+        if not self._collection_exists(database_name, collection_name):
+            return {"values": []}
+
+        values = self._exc(
+            COMMANDS.distinct,
+            database_name,
+            collection_name,
+            field=body["key"],
+            filter=body.get("query") or {},
+        )
+        return {"values": list(values)}
+
+    # Index commands
+
+    def _indexes(self, database_name: str, collection_name: str) -> List[dict]:
+        return self._exc(COMMANDS.get_index_list, database_name, collection_name)
+
+    def _create_indexes(self, database_name: str, body: dict) -> dict:
+        collection_name = body["createIndexes"]
+        created_collection = not self._collection_exists(database_name, collection_name)
+        self._ensure_collection(database_name, collection_name)
+
+        indexes_before = len(self._indexes(database_name, collection_name)) + 1
+
+        for index in body.get("indexes", []):
+            key = index["key"]
+            if len(key) != 1:
+                raise CommandError(
+                    "Only single field indexes are supported", 67, "CannotCreateIndex"
+                )
+            if index.get("unique"):
+                raise CommandError(
+                    "Unique indexes are not supported", 67, "CannotCreateIndex"
+                )
+
+            # A sorted index serves both directions
+            field, index_type = next(iter(key.items()))
+            if index_type == -1:
+                index_type = 1
+
+            # Kept with the index, listIndexes shows the name the driver chose
+            options = {
+                option: value
+                for option, value in index.items()
+                if option not in ("key", "v", "ns")
+            }
+            self._exc(
+                COMMANDS.create_index,
+                database_name,
+                collection_name,
+                index={field: index_type},
+                options=options,
+            )
+
+        return {
+            "createdCollectionAutomatically": created_collection,
+            "numIndexesBefore": indexes_before,
+            "numIndexesAfter": len(self._indexes(database_name, collection_name)) + 1,
+        }
+
+    def _drop_indexes(self, database_name: str, body: dict) -> dict:
+        collection_name = body["dropIndexes"]
+        index = body.get("index")
+        indexes = self._indexes(database_name, collection_name)
+
+        for metadata in indexes:
+            key = {metadata["field"]: metadata["type"]}
+            names = (metadata["id"], metadata.get("name"), _index_name(key))
+            if index == "*" or index in names or index == key:
+                self._exc(
+                    COMMANDS.delete_index,
+                    database_name,
+                    collection_name,
+                    index_id=metadata["id"],
+                )
+
+        return {"nIndexesWas": len(indexes) + 1}
+
+    def _list_indexes(self, database_name: str, body: dict) -> dict:
+        collection_name = body["listIndexes"]
+        if not self._collection_exists(database_name, collection_name):
+            raise CommandError(
+                f"ns does not exist: {database_name}.{collection_name}",
+                26,
+                "NamespaceNotFound",
+            )
+
+        indexes = [{"v": 2, "key": {"_id": 1}, "name": "_id_"}]
+        for metadata in self._indexes(database_name, collection_name):
+            key = {metadata["field"]: metadata["type"]}
+            indexes.append(
+                {"v": 2, "key": key, "name": metadata.get("name") or _index_name(key)}
+            )
+
+        batch_size = (body.get("cursor") or {}).get("batchSize")
+        return self._open_cursor(
+            f"{database_name}.$cmd.listIndexes.{collection_name}", indexes, batch_size
+        )
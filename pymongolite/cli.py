@@ -0,0 +1,118 @@
+from typing import List, Optional
+import argparse
+import asyncio
+
+from pymongolite.backend.server import DEFAULT_BATCH_SIZE, DEFAULT_PORT, Server
+from pymongolite.backend.wire_server import DEFAULT_WIRE_PORT, WireServer
+
+
+def serve_wire(args: argparse.Namespace):
+    port = DEFAULT_WIRE_PORT if args.port is None else args.port
+    address = args.unix if args.unix else (args.host, port)
+    server = WireServer(
+        args.dirpath,
+        address,
+        multiprocess=args.multiprocess,
+        query_cache_size=args.query_cache_size,
+        document_cache_size=args.document_cache_size,
+        read_ahead_chunks=args.read_ahead_chunks,
+    )
+
+    async def run():
+        await server.start()
+        print(
+            f"Serving {args.dirpath} to MongoDB drivers on {server.address}",
+            flush=True,
+        )
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(args: argparse.Namespace):
+    if args.wire:
+        return serve_wire(args)
+
+    port = DEFAULT_PORT if args.port is None else args.port
+    address = args.unix if args.unix else (args.host, port)
+    server = Server(
+        args.dirpath,
+        address,
+        batch_size=args.batch_size,
+        multiprocess=args.multiprocess,
+        query_cache_size=args.query_cache_size,
+        document_cache_size=args.document_cache_size,
+        read_ahead_chunks=args.read_ahead_chunks,
+    )
+
+    print(f"Serving {args.dirpath} on {server.uri}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="pymongolite")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    serve_parser = commands.add_parser(
+        "serve", help="Share a database directory with other processes over a socket"
+    )
+    serve_parser.add_argument(
+        "--dirpath", required=True, help="Directory of the databases"
+    )
+    serve_parser.add_argument("--unix", metavar="PATH", help="Listen on a Unix socket")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument(
+        "--port",
+        type=int,
+        help=f"Defaults to {DEFAULT_PORT}, or {DEFAULT_WIRE_PORT} with --wire",
+    )
+    serve_parser.add_argument(
+        "--wire",
+        action="store_true",
+        help="Speak the MongoDB wire protocol, for MongoDB drivers and tools",
+    )
+    serve_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Documents sent in a cursor batch",
+    )
+    serve_parser.add_argument(
+        "--multiprocess",
+        action="store_true",
+        help="Other processes open the directory directly too",
+    )
+    serve_parser.add_argument(
+        "--query-cache-size",
+        type=int,
+        default=0,
+        help="Bytes of query results kept in memory, 0 disables the cache",
+    )
+    serve_parser.add_argument(
+        "--document-cache-size",
+        type=int,
+        default=0,
+        help="Characters of documents kept in memory, 0 disables the cache",
+    )
+    serve_parser.add_argument(
+        "--read-ahead-chunks",
+        type=int,
+        default=0,
+        help="Chunks of documents read ahead of every cursor by a background thread",
+    )
+    serve_parser.set_defaults(handler=serve)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
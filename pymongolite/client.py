@@ -4,14 +4,52 @@ import contextlib
 
 from pymongolite.exceptions import MissingDatabaseName
 from pymongolite.database import Database
+from pymongolite.client_session import ClientSession
 from pymongolite.backend.command import COMMANDS, Command
 from pymongolite.backend.session import Session
+from pymongolite.backend.server import parse_address
+from pymongolite.backend.remote_session import DEFAULT_POOL_SIZE, RemoteSession
 
 
 class MongoClient:
-    def __init__(self, dirpath: str, database: Optional[str] = None):
+    def __init__(
+        self,
+        dirpath: str,
+        database: Optional[str] = None,
+        multiprocess: bool = False,
+        max_pool_size: int = DEFAULT_POOL_SIZE,
+        query_cache_size: int = 0,
+        document_cache_size: int = 0,
+        read_ahead_chunks: int = 0,
+    ):
+        """
+        :Parameters:
+          - `dirpath`: Directory of the databases, or the uri of a server started
+            with `pymongolite serve` (mongolite://host:port or mongolite+unix:///path).
+          - `database` (optional): Name of the default database.
+          - `multiprocess` (optional): Other processes use the same directory,
+            collections are locked with file locks and the indexes follow their changes.
+          - `max_pool_size` (optional): Connections open to a server at most.
+          - `query_cache_size` (optional): Bytes of find, aggregate and count results
+            kept in memory until their collection changes, 0 disables the cache.
+          - `document_cache_size` (optional): Characters of document lines kept in
+            memory for the reads through an index, 0 disables the cache.
+          - `read_ahead_chunks` (optional): Chunks of documents a background thread
+            reads ahead of every cursor, 0 reads them only when they are needed.
+        """
         self.dirpath = dirpath
-        self.__session = Session(self.dirpath)
+
+        address = parse_address(str(dirpath))
+        if address is None:
+            self.__session = Session(
+                self.dirpath,
+                multiprocess=multiprocess,
+                query_cache_size=query_cache_size,
+                document_cache_size=document_cache_size,
+                read_ahead_chunks=read_ahead_chunks,
+            )
+        else:
+            self.__session = RemoteSession(address, max_pool_size=max_pool_size)
         self.__default_database_name = database
         self._closed = False
 
@@ -21,6 +59,9 @@ class MongoClient:
 
     @property
     def path(self) -> str:
+        if isinstance(self.__session, RemoteSession):
+            return self.dirpath
+
         return str(Path(self.dirpath).absolute())
 
     def get_database(self, name: Optional[str] = None):
@@ -50,6 +91,14 @@ class MongoClient:
 
         return Database(self, default)
 
+    def start_session(self) -> ClientSession:
+        """Start a session, transactions are started from it.
+
+        :Returns:
+          An instance of :class:`~pymongolite.client_session.ClientSession`.
+        """
+        return ClientSession(self)
+
     def close(self):
         self._closed = True
         self.__session.close()
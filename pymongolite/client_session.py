@@ -0,0 +1,113 @@
+from typing import Optional
+
+from pymongolite.exceptions import InvalidOperation
+from pymongolite.backend.command import Command, COMMANDS
+
+
+class _TransactionContext:
+    """Commits the transaction when the block ends, aborts it on an exception."""
+
+    def __init__(self, session: "ClientSession"):
+        self.__session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.__session.in_transaction:
+            return
+
+        if exc_type is None:
+            self.__session.commit_transaction()
+        else:
+            self.__session.abort_transaction()
+
+
+class ClientSession:
+    """A session for ordering sequential operations.
+
+    Writes done inside a transaction are kept in the session and applied
+    together by commit_transaction. The commit fails with
+    :class:`~pymongolite.backend.exceptions.TransactionConflict` when a
+    document the transaction read or wrote was changed after it started.
+
+    Should not be created directly, use
+    :meth:`~pymongolite.client.MongoClient.start_session`.
+    """
+
+    def __init__(self, client):
+        self.__client = client
+        self._transaction = None
+        self._ended = False
+
+    @property
+    def client(self):
+        return self.__client
+
+    @property
+    def has_ended(self) -> bool:
+        return self._ended
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._transaction is not None
+
+    def _check_ended(self):
+        if self._ended:
+            raise InvalidOperation("Cannot use ended session")
+
+    def _exc_transaction_command(self, cmd: COMMANDS, transaction=None):
+        with self.__client._open_session() as session:
+            return session.exc_command(
+                command=Command(cmd=cmd, database_name=None, transaction=transaction),
+            )
+
+    def start_transaction(self) -> _TransactionContext:
+        """Start a multi-statement transaction.
+
+        Can be used as a context manager, the transaction is committed at the
+        end of the block or aborted when it raises.
+        """
+        self._check_ended()
+        if self.in_transaction:
+            raise InvalidOperation("Transaction already in progress")
+
+        self._transaction = self._exc_transaction_command(COMMANDS.start_transaction)
+        return _TransactionContext(self)
+
+    def commit_transaction(self):
+        """Apply the writes of the transaction at once."""
+        self._check_ended()
+        if not self.in_transaction:
+            raise InvalidOperation("No transaction started")
+
+        transaction, self._transaction = self._transaction, None
+        self._exc_transaction_command(COMMANDS.commit_transaction, transaction)
+
+    def abort_transaction(self):
+        """Discard the writes of the transaction."""
+        self._check_ended()
+        if not self.in_transaction:
+            raise InvalidOperation("No transaction started")
+
+        transaction, self._transaction = self._transaction, None
+        self._exc_transaction_command(COMMANDS.abort_transaction, transaction)
+
+    def end_session(self):
+        """Finish this session, a transaction in progress is aborted."""
+        if self._ended:
+            return
+
+        if self.in_transaction:
+            self.abort_transaction()
+        self._ended = True
+
+    def _transaction_for_command(self) -> Optional[object]:
+        self._check_ended()
+        return self._transaction
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end_session()
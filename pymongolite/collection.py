@@ -1,9 +1,18 @@
 from typing import Optional, Any, NoReturn, Dict, List
 
-from pymongolite.exceptions import InvalidName
+from pymongolite.exceptions import InvalidName, BulkWriteError
+from pymongolite.results import BulkWriteResult
+from pymongolite.client_session import ClientSession
 from pymongolite.backend.command import Command, COMMANDS
 
 
+class ReturnDocument:
+    """Which document find_one_and_update / find_one_and_replace return."""
+
+    BEFORE = False
+    AFTER = True
+
+
 class Collection:
     def __init__(
         self, database, name: str, create: Optional[bool] = False, **kwargs: Any
@@ -94,7 +103,13 @@ class Collection:
             "with None instead: collection is not None"
         )
 
-    def insert_one(self, doc: Dict):
+    @staticmethod
+    def __transaction(session: Optional[ClientSession]):
+        return None if session is None else session._transaction_for_command()
+
+    def insert_one(self, doc: Dict, session: Optional[ClientSession] = None):
+        transaction = self.__transaction(session)
+
         with self.__database._open_session() as session:
             return session.exc_command(
                 command=Command(
@@ -102,10 +117,13 @@ class Collection:
                     database_name=self.__database.name,
                     collection_name=self.__name,
                     documents=[doc],
+                    transaction=transaction,
                 ),
             )[0]
 
-    def insert_many(self, docs: List[Dict]):
+    def insert_many(self, docs: List[Dict], session: Optional[ClientSession] = None):
+        transaction = self.__transaction(session)
+
         with self.__database._open_session() as session:
             return session.exc_command(
                 command=Command(
@@ -113,10 +131,13 @@ class Collection:
                     database_name=self.__database.name,
                     collection_name=self.__name,
                     documents=docs,
+                    transaction=transaction,
                 ),
             )
 
-    def delete_one(self, filter: Dict):
+    def delete_one(self, filter: Dict, session: Optional[ClientSession] = None):
+        transaction = self.__transaction(session)
+
         with self.__database._open_session() as session:
             return session.exc_command(
                 command=Command(
@@ -125,10 +146,13 @@ class Collection:
                     collection_name=self.__name,
                     filter=filter,
                     many=False,
+                    transaction=transaction,
                 ),
             )
 
-    def delete_many(self, filter: Dict):
+    def delete_many(self, filter: Dict, session: Optional[ClientSession] = None):
+        transaction = self.__transaction(session)
+
         with self.__database._open_session() as session:
             return session.exc_command(
                 command=Command(
@@ -137,10 +161,19 @@ class Collection:
                     collection_name=self.__name,
                     filter=filter,
                     many=True,
+                    transaction=transaction,
                 ),
             )
 
-    def update_one(self, filter: Dict, override: Dict):
+    def update_one(
+        self,
+        filter: Dict,
+        override: Dict,
+        upsert: bool = False,
+        session: Optional[ClientSession] = None,
+    ):
+        transaction = self.__transaction(session)
+
         with self.__database._open_session() as session:
             return session.exc_command(
                 command=Command(
@@ -150,10 +183,20 @@ class Collection:
                     filter=filter,
                     override=override,
                     many=False,
+                    upsert=upsert,
+                    transaction=transaction,
                 ),
             )
 
-    def update_many(self, filter: Dict, override: Dict):
+    def update_many(
+        self,
+        filter: Dict,
+        override: Dict,
+        upsert: bool = False,
+        session: Optional[ClientSession] = None,
+    ):
+        transaction = self.__transaction(session)
+
         with self.__database._open_session() as session:
             return session.exc_command(
                 command=Command(
@@ -163,10 +206,20 @@ class Collection:
                     filter=filter,
                     override=override,
                     many=True,
+                    upsert=upsert,
+                    transaction=transaction,
                 ),
             )
 
-    def replace_one(self, filter: Dict, replacement: Dict):
+    def replace_one(
+        self,
+        filter: Dict,
+        replacement: Dict,
+        upsert: bool = False,
+        session: Optional[ClientSession] = None,
+    ):
+        transaction = self.__transaction(session)
+
         with self.__database._open_session() as session:
             return session.exc_command(
                 command=Command(
@@ -176,6 +229,8 @@ class Collection:
                     filter=filter,
                     replacement=replacement,
                     many=False,
+                    upsert=upsert,
+                    transaction=transaction,
                 ),
             )
 
@@ -192,6 +247,52 @@ class Collection:
                 ),
             )
 
+    def bulk_write(self, requests: List[Any], ordered: bool = True) -> BulkWriteResult:
+        """Send a batch of write operations to the server.
+
+        The whole batch runs under one collection lock, consecutive inserts
+        are written together, updates and deletes run one after the other.
+
+        Raises BulkWriteError if any of the operations failed.
+
+        :Parameters:
+          - `requests`: a list of write operations (InsertOne, UpdateOne,
+            UpdateMany, ReplaceOne, DeleteOne or DeleteMany)
+          - `ordered` (optional): if True the operations run in order and
+            stop at the first error, if False all of them are attempted
+        """
+        if not isinstance(requests, list):
+            raise TypeError("requests must be a list")
+
+        try:
+            requests = [request._to_request() for request in requests]
+        except AttributeError:
+            raise TypeError("%r is not a valid request" % (requests,))
+
+        with self.__database._open_session() as session:
+            result = session.exc_command(
+                command=Command(
+                    cmd=COMMANDS.bulk_write,
+                    database_name=self.__database.name,
+                    collection_name=self.__name,
+                    requests=requests,
+                    ordered=ordered,
+                ),
+            )
+
+        if result["errors"]:
+            raise BulkWriteError(
+                {
+                    "results": result["results"],
+                    "writeErrors": [
+                        {"index": error["index"], "errmsg": str(error["error"])}
+                        for error in result["errors"]
+                    ],
+                }
+            )
+
+        return BulkWriteResult(result["results"])
+
     def drop(self, comment: Optional[Any] = None):
         return self.__database.drop_collection(self.__name, comment=comment)
 
@@ -200,11 +301,14 @@ class Collection:
         filter: Dict,
         fields: Optional[Dict] = None,
         many: Optional[bool] = True,
+        session: Optional[ClientSession] = None,
         **kwargs
     ):
         if fields is None:
             fields = {}
 
+        transaction = self.__transaction(session)
+
         with self.__database._open_session() as session:
             return session.exc_command(
                 command=Command(
@@ -214,6 +318,7 @@ class Collection:
                     filter=filter,
                     fields=fields,
                     many=many,
+                    transaction=transaction,
                     **kwargs,
                 ),
             )
@@ -229,7 +334,173 @@ class Collection:
         except StopIteration:
             return None
 
-    def create_index(self, index: dict):
+    def __find_and_modify(
+        self,
+        filter: Dict,
+        projection: Optional[Dict],
+        return_document: bool = ReturnDocument.BEFORE,
+        **kwargs: Any
+    ) -> Optional[Dict]:
+        with self.__database._open_session() as session:
+            return session.exc_command(
+                command=Command(
+                    cmd=COMMANDS.find_and_modify,
+                    database_name=self.__database.name,
+                    collection_name=self.__name,
+                    filter=filter,
+                    fields=projection,
+                    return_new=return_document,
+                    **kwargs,
+                ),
+            )
+
+    def find_one_and_update(
+        self,
+        filter: Dict,
+        update: Dict,
+        projection: Optional[Dict] = None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+    ) -> Optional[Dict]:
+        """Finds a single document and updates it, returning either the
+        original or the updated document.
+
+        The read and the write are done under one collection lock.
+
+        :Parameters:
+          - `filter`: a query that matches the document to update
+          - `update`: the update operations to apply
+          - `projection` (optional): fields to include or exclude
+          - `upsert` (optional): insert a new document if none matched
+          - `return_document` (optional): ReturnDocument.BEFORE or
+            ReturnDocument.AFTER
+        """
+        return self.__find_and_modify(
+            filter, projection, return_document, override=update, upsert=upsert
+        )
+
+    def find_one_and_replace(
+        self,
+        filter: Dict,
+        replacement: Dict,
+        projection: Optional[Dict] = None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+    ) -> Optional[Dict]:
+        """Finds a single document and replaces it, returning either the
+        original or the replaced document.
+
+        :Parameters:
+          - `filter`: a query that matches the document to replace
+          - `replacement`: the replacement document
+          - `projection` (optional): fields to include or exclude
+          - `upsert` (optional): insert the replacement if none matched
+          - `return_document` (optional): ReturnDocument.BEFORE or
+            ReturnDocument.AFTER
+        """
+        return self.__find_and_modify(
+            filter, projection, return_document, replacement=replacement, upsert=upsert
+        )
+
+    def find_one_and_delete(
+        self, filter: Dict, projection: Optional[Dict] = None
+    ) -> Optional[Dict]:
+        """Finds a single document and deletes it, returning the document.
+
+        :Parameters:
+          - `filter`: a query that matches the document to delete
+          - `projection` (optional): fields to include or exclude
+        """
+        return self.__find_and_modify(filter, projection, remove=True)
+
+    def count_documents(self, filter: Dict, session: Optional[ClientSession] = None) -> int:
+        """Count the documents matching the filter.
+
+        Filters fully answered by the indexes are counted without reading
+        documents.
+
+        :Parameters:
+          - `filter`: a query that matches the documents to count
+          - `session` (optional): a ClientSession, counted as its transaction
+            sees the collection
+        """
+        transaction = self.__transaction(session)
+
+        with self.__database._open_session() as session:
+            return session.exc_command(
+                command=Command(
+                    cmd=COMMANDS.count_documents,
+                    database_name=self.__database.name,
+                    collection_name=self.__name,
+                    filter=filter,
+                    transaction=transaction,
+                ),
+            )
+
+    def estimated_document_count(self) -> int:
+        """Count all the documents in the collection using its metadata."""
+        with self.__database._open_session() as session:
+            return session.exc_command(
+                command=Command(
+                    cmd=COMMANDS.estimated_document_count,
+                    database_name=self.__database.name,
+                    collection_name=self.__name,
+                ),
+            )
+
+    def distinct(self, key: str, filter: Optional[Dict] = None) -> list:
+        """Get a list of distinct values for `key` among all documents
+        in this collection.
+
+        Served from the index of `key` when there is one and no filter.
+
+        :Parameters:
+          - `key`: name of the field for which we want to get the distinct
+            values
+          - `filter`: a query that matches the documents to get the distinct
+            values from
+        """
+        with self.__database._open_session() as session:
+            return session.exc_command(
+                command=Command(
+                    cmd=COMMANDS.distinct,
+                    database_name=self.__database.name,
+                    collection_name=self.__name,
+                    field=key,
+                    filter=filter,
+                ),
+            )
+
+    def aggregate(self, pipeline: List[Dict]):
+        """Run an aggregation pipeline.
+
+        Supported stages: $match, $project, $group ($sum, $avg, $min, $max,
+        $push, $first, $last), $sort, $skip, $limit, $count and a leading
+        $vectorSearch.
+
+        :Parameters:
+          - `pipeline`: a list of stages
+        """
+        with self.__database._open_session() as session:
+            return session.exc_command(
+                command=Command(
+                    cmd=COMMANDS.aggregate,
+                    database_name=self.__database.name,
+                    collection_name=self.__name,
+                    pipeline=pipeline,
+                ),
+            )
+
+    def create_index(self, index: dict, **kwargs: Any):
+        """Create an index on a single field.
+
+        :Parameters:
+          - `index`: {field: index_type}
+          - `partialFilterExpression` (optional): only documents matching this
+            filter are indexed, the index is used only by queries that imply it
+          - `sparse` (optional): accepted for compatibility, documents without
+            the field are never indexed
+        """
         with self.__database._open_session() as session:
             return session.exc_command(
                 command=Command(
@@ -237,6 +508,7 @@ class Collection:
                     database_name=self.__database.name,
                     collection_name=self.__name,
                     index=index,
+                    options=kwargs,
                 ),
             )
 
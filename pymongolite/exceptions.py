@@ -18,3 +18,21 @@ class InvalidName(MongoliteException):
 
 class ReadWritePermissionsAreRequired(MongoliteException):
     pass
+
+
+class BulkWriteError(MongoliteException):
+    """Raised by bulk_write when some of the operations failed.
+
+    `details` holds the results of the operations that succeeded and the
+    write errors as {"index": operation index, "errmsg": message}.
+    """
+
+    def __init__(self, details: dict):
+        self.details = details
+        super().__init__(
+            "batch op errors occurred, %d write errors" % len(details["writeErrors"])
+        )
+
+
+class InvalidOperation(MongoliteException):
+    """Raised when a session or a transaction is used in the wrong state."""
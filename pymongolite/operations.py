@@ -0,0 +1,87 @@
+from typing import Dict
+
+from pymongolite.backend.command import COMMANDS
+
+
+class InsertOne:
+    """Represents an insert_one operation for bulk_write."""
+
+    def __init__(self, document: Dict):
+        self._document = document
+
+    def _to_request(self) -> dict:
+        return {"cmd": COMMANDS.insert, "documents": [self._document]}
+
+    def __repr__(self):
+        return "InsertOne(%r)" % (self._document,)
+
+
+class DeleteOne:
+    """Represents a delete_one operation for bulk_write."""
+
+    _many = False
+
+    def __init__(self, filter: Dict):
+        self._filter = filter
+
+    def _to_request(self) -> dict:
+        return {"cmd": COMMANDS.delete, "filter": self._filter, "many": self._many}
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self._filter)
+
+
+class DeleteMany(DeleteOne):
+    """Represents a delete_many operation for bulk_write."""
+
+    _many = True
+
+
+class UpdateOne:
+    """Represents an update_one operation for bulk_write."""
+
+    _many = False
+
+    def __init__(self, filter: Dict, update: Dict, upsert: bool = False):
+        self._filter = filter
+        self._update = update
+        self._upsert = upsert
+
+    def _to_request(self) -> dict:
+        return {
+            "cmd": COMMANDS.update,
+            "filter": self._filter,
+            "override": self._update,
+            "many": self._many,
+            "upsert": self._upsert,
+        }
+
+    def __repr__(self):
+        return "%s(%r, %r)" % (self.__class__.__name__, self._filter, self._update)
+
+
+class UpdateMany(UpdateOne):
+    """Represents an update_many operation for bulk_write."""
+
+    _many = True
+
+
+class ReplaceOne:
+    """Represents a replace_one operation for bulk_write."""
+
+    def __init__(self, filter: Dict, replacement: Dict, upsert: bool = False):
+        self._filter = filter
+        self._replacement = replacement
+        self._upsert = upsert
+
+    def _to_request(self) -> dict:
+        return {
+            "cmd": COMMANDS.replace,
+            "filter": self._filter,
+            "replacement": self._replacement,
+            "many": False,
+            "upsert": self._upsert,
+        }
+
+    def __repr__(self):
+        return "ReplaceOne(%r, %r)" % (self._filter, self._replacement)
@@ -0,0 +1,56 @@
+from typing import List, Dict
+
+
+class BulkWriteResult:
+    """The result of a bulk_write, `results` holds the result of every operation in order."""
+
+    def __init__(self, results: List[Dict]):
+        self.results = results
+
+    def _sum(self, key: str) -> int:
+        return sum(result.get(key, 0) for result in self.results if result is not None)
+
+    @property
+    def inserted_count(self) -> int:
+        return sum(
+            len(result["inserted_ids"])
+            for result in self.results
+            if result is not None and "inserted_ids" in result
+        )
+
+    @property
+    def matched_count(self) -> int:
+        return self._sum("matched_count")
+
+    @property
+    def modified_count(self) -> int:
+        return self._sum("modified_count")
+
+    @property
+    def deleted_count(self) -> int:
+        return self._sum("deleted_count")
+
+    @property
+    def upserted_count(self) -> int:
+        return len(self.upserted_ids)
+
+    @property
+    def upserted_ids(self) -> Dict[int, object]:
+        """{operation index: upserted id}"""
+        return {
+            i: result["upserted_id"]
+            for i, result in enumerate(self.results)
+            if result is not None and "upserted_id" in result
+        }
+
+    @property
+    def inserted_ids(self) -> Dict[int, object]:
+        """{operation index: inserted id}"""
+        return {
+            i: result["inserted_ids"][0]
+            for i, result in enumerate(self.results)
+            if result is not None and "inserted_ids" in result
+        }
+
+    def __repr__(self):
+        return "BulkWriteResult(%r)" % (self.results,)
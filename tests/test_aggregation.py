@@ -0,0 +1,32 @@
+from pymongolite.backend.execution_engine.aggregation import run_pipeline
+
+
+def test_group_spill():
+    documents = ({"g": i % 50, "a": i} for i in range(1000))
+
+    result = run_pipeline(
+        documents,
+        [{"$group": {"_id": "$g", "total": {"$sum": "$a"}, "first": {"$first": "$a"}}}],
+        max_documents_in_memory=10,
+    )
+
+    groups = {doc["_id"]: doc for doc in result}
+    assert len(groups) == 50
+    assert groups[7]["total"] == sum(range(7, 1000, 50))
+    assert groups[7]["first"] == 7
+
+
+def test_sort_spill():
+    documents = ({"a": (i * 37) % 101} for i in range(101))
+
+    result = run_pipeline(documents, [{"$sort": {"a": 1}}], max_documents_in_memory=10)
+
+    assert [doc["a"] for doc in result] == list(range(101))
+
+
+def test_sort_mixed_types():
+    documents = [{"a": "x"}, {"a": 2}, {}, {"a": 1}]
+
+    result = run_pipeline(documents, [{"$sort": {"a": 1}}, {"$skip": 1}])
+
+    assert list(result) == [{"a": 1}, {"a": 2}, {"a": "x"}]
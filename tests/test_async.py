@@ -0,0 +1,82 @@
+import asyncio
+import shutil
+
+import pytest
+
+from pymongolite import AsyncMongoClient
+
+DIRPATH = "test-async"
+
+
+@pytest.fixture(scope="function")
+def dirpath():
+    yield DIRPATH
+    shutil.rmtree(DIRPATH)
+
+
+def test_crud(dirpath):
+    async def main():
+        async with AsyncMongoClient(dirpath, database="db") as client:
+            collection = await client.get_default_database().create_collection("col")
+
+            await collection.insert_many([{"value": i} for i in range(10)])
+            await collection.update_one({"value": 0}, {"$set": {"value": 100}})
+            await collection.delete_many({"value": {"$gt": 7, "$lt": 100}})
+
+            assert await collection.count_documents({}) == 8
+            assert (await collection.find_one({"value": 100}))["value"] == 100
+            assert await client.get_default_database().list_collection_names() == [
+                "col"
+            ]
+
+    asyncio.run(main())
+
+
+def test_cursor_batches(dirpath):
+    async def main():
+        async with AsyncMongoClient(dirpath, database="db") as client:
+            collection = await client.get_default_database().create_collection("col")
+            await collection.insert_many([{"value": i} for i in range(250)])
+
+            values = [
+                document["value"]
+                async for document in collection.find({}).batch_size(40)
+            ]
+            assert sorted(values) == list(range(250))
+
+            first = await collection.find({}, batch_size=10).to_list(15)
+            assert len(first) == 15
+
+            cursor = collection.find({})
+            await cursor.__anext__()
+            await cursor.close()
+            assert await cursor.to_list() == []
+
+            totals = await collection.aggregate(
+                [{"$group": {"_id": None, "total": {"$sum": "$value"}}}]
+            ).to_list()
+            assert totals[0]["total"] == sum(range(250))
+
+    asyncio.run(main())
+
+
+def test_parallel_collections(dirpath):
+    async def main():
+        async with AsyncMongoClient(dirpath, database="db", max_workers=4) as client:
+            database = client.get_default_database()
+            collections = [
+                await database.create_collection(f"col{i}") for i in range(4)
+            ]
+
+            await asyncio.gather(
+                *(
+                    collection.insert_many([{"value": j} for j in range(100)])
+                    for collection in collections
+                )
+            )
+            counts = await asyncio.gather(
+                *(collection.count_documents({}) for collection in collections)
+            )
+            assert counts == [100] * 4
+
+    asyncio.run(main())
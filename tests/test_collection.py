@@ -3,7 +3,16 @@ import shutil
 
 import pytest
 
-from pymongolite import MongoClient
+from pymongolite import (
+    MongoClient,
+    InsertOne,
+    UpdateOne,
+    UpdateMany,
+    ReplaceOne,
+    DeleteOne,
+    ReturnDocument,
+)
+from pymongolite.exceptions import BulkWriteError
 
 
 @pytest.fixture(scope="function")
@@ -129,3 +138,348 @@ def test_replace_many(collection):
     collection.replace_many({}, {"b": 1})
 
     assert list(collection.find({}, {"_id": 0})) == [{"b": 1}, {"b": 1}]
+
+
+def test_find_text(collection):
+    collection.insert_many(
+        [{"body": "coffee shop"}, {"body": "tea shop"}, {"body": "coffee coffee"}]
+    )
+    collection.create_index({"body": "text"})
+
+    docs = collection.find(
+        {"$text": {"$search": "coffee"}}, {"_id": 0, "score": {"$meta": "textScore"}}
+    )
+
+    assert [doc["body"] for doc in docs] == ["coffee coffee", "coffee shop"]
+
+    for gate in ("$or", "$nor"):
+        with pytest.raises(ValueError):
+            list(collection.find({gate: [{"$text": {"$search": "tea"}}, {"body": "x"}]}))
+
+
+def test_find_many_chunks(collection):
+    collection.insert_many([{"a": i} for i in range(12000)])
+    collection.update_many({}, {"$inc": {"a": 1}})
+
+    assert sum(doc["a"] for doc in collection.find({})) == sum(range(1, 12001))
+
+
+def test_aggregate(collection):
+    collection.insert_many([{"g": i % 3, "a": i} for i in range(30)])
+    collection.create_index({"a": 1})
+
+    docs = collection.aggregate(
+        [
+            {"$match": {"a": {"$gte": 10}}},
+            {"$group": {"_id": "$g", "total": {"$sum": "$a"}, "n": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ]
+    )
+
+    assert list(docs) == [
+        {"_id": 0, "total": 117, "n": 6},
+        {"_id": 1, "total": 133, "n": 7},
+        {"_id": 2, "total": 140, "n": 7},
+    ]
+
+
+def test_aggregate_sort_limit_count(collection):
+    collection.insert_many([{"a": i} for i in range(30)])
+
+    top = collection.aggregate([{"$sort": {"a": -1}}, {"$limit": 2}, {"$project": {"_id": 0}}])
+    count = collection.aggregate([{"$match": {"a": {"$lt": 5}}}, {"$count": "n"}])
+
+    assert list(top) == [{"a": 29}, {"a": 28}]
+    assert list(count) == [{"n": 5}]
+
+
+def test_aggregate_project(collection):
+    collection.insert_many([{"amount": 5, "tag": "a"}, {"amount": 7, "tag": "b"}])
+
+    def project(specification):
+        return list(collection.aggregate([{"$project": specification}]))
+
+    assert project({"_id": 0, "total": "$amount"}) == [{"total": 5}, {"total": 7}]
+    assert project({"_id": 0, "tag": 1, "total": "$amount"}) == [
+        {"tag": "a", "total": 5},
+        {"tag": "b", "total": 7},
+    ]
+    assert project({"_id": 0, "tag": 1}) == [{"tag": "a"}, {"tag": "b"}]
+    assert project({"_id": 0, "tag": 0}) == [{"amount": 5}, {"amount": 7}]
+
+
+def test_count_documents(collection):
+    collection.insert_many([{"a": i % 4} for i in range(20)])
+    collection.delete_many({"a": 3})
+    collection.update_many({"a": 2}, {"$inc": {"a": 10}})
+    collection.create_index({"a": 1})
+
+    assert collection.estimated_document_count() == 15
+    assert collection.count_documents({}) == 15
+    assert collection.count_documents({"a": 0}) == 5
+    assert collection.count_documents({"a": {"$gt": 0}}) == 10
+    assert collection.count_documents({"a": {"$ne": 0}}) == 10
+    assert collection.database.list_collection_names() == ["col"]
+
+
+def test_distinct(collection):
+    collection.insert_many(
+        [{"a": 2, "b": [1, 2]}, {"a": 1, "b": 2}, {"a": 2, "b": {"c": 3}}, {"c": 1}]
+    )
+
+    assert collection.distinct("b") == [1, 2, {"c": 3}]
+    assert collection.distinct("b.c") == [3]
+    assert collection.distinct("a", {"b": 2}) == [1]
+
+    collection.create_index({"a": 1})
+
+    assert collection.distinct("a") == [1, 2]
+
+
+def test_bulk_write(collection):
+    result = collection.bulk_write(
+        [
+            InsertOne({"a": 1}),
+            InsertOne({"a": 2}),
+            UpdateMany({"a": {"$gte": 1}}, {"$inc": {"a": 10}}),
+            InsertOne({"a": 3}),
+            DeleteOne({"a": 11}),
+            ReplaceOne({"a": 3}, {"b": 1}),
+        ]
+    )
+
+    assert result.inserted_count == 3
+    assert result.matched_count == 3
+    assert result.modified_count == 3
+    assert result.deleted_count == 1
+    assert sorted(result.inserted_ids) == [0, 1, 3]
+    assert list(collection.find({}, {"_id": 0})) == [{"a": 12}, {"b": 1}]
+
+
+def test_bulk_write_errors(collection):
+    requests = [
+        UpdateOne({}, {}),
+        InsertOne({"a": 1}),
+    ]
+
+    with pytest.raises(BulkWriteError) as ordered_error:
+        collection.bulk_write(requests)
+
+    assert collection.count_documents({}) == 0
+    assert [error["index"] for error in ordered_error.value.details["writeErrors"]] == [0]
+
+    with pytest.raises(BulkWriteError) as unordered_error:
+        collection.bulk_write(requests, ordered=False)
+
+    assert collection.count_documents({}) == 1
+    assert unordered_error.value.details["results"][1]["inserted_ids"]
+
+
+def test_bulk_write_failed_insert_group(collection):
+    requests = [InsertOne({"a": 1}), InsertOne({"a": object()}), InsertOne({"a": 3})]
+
+    with pytest.raises(BulkWriteError) as ordered_error:
+        collection.bulk_write(requests)
+
+    details = ordered_error.value.details
+    assert [error["index"] for error in details["writeErrors"]] == [1]
+    assert details["results"][0]["inserted_ids"] and details["results"][2] is None
+    assert list(collection.find({}, {"_id": 0})) == [{"a": 1}]
+
+    collection.delete_many({})
+    requests = [InsertOne({"a": 1}), InsertOne({"a": object()}), InsertOne({"a": 3})]
+
+    with pytest.raises(BulkWriteError) as unordered_error:
+        collection.bulk_write(requests, ordered=False)
+
+    details = unordered_error.value.details
+    assert [error["index"] for error in details["writeErrors"]] == [1]
+    assert details["results"][0]["inserted_ids"] and details["results"][2]["inserted_ids"]
+    assert list(collection.find({}, {"_id": 0})) == [{"a": 1}, {"a": 3}]
+
+
+def test_upsert(collection):
+    result = collection.update_one(
+        {"name": "a", "age": {"$gt": 3}},
+        {"$inc": {"visits": 1}, "$setOnInsert": {"new": True}},
+        upsert=True,
+    )
+    collection.update_one({"name": "a"}, {"$inc": {"visits": 1}}, upsert=True)
+    collection.replace_one({"name": "b"}, {"name": "b", "x": 1}, upsert=True)
+
+    assert result["upserted_id"] == collection.find_one({"name": "a"})["_id"]
+    assert list(collection.find({}, {"_id": 0})) == [
+        {"name": "a", "visits": 2, "new": True},
+        {"name": "b", "x": 1},
+    ]
+
+
+def test_find_one_and_modify(collection):
+    collection.insert_many([{"a": 1, "l": []}, {"a": 2, "l": []}])
+
+    before = collection.find_one_and_update({"a": 1}, {"$push": {"l": 1}})
+    after = collection.find_one_and_update(
+        {"a": 1}, {"$push": {"l": 2}}, return_document=ReturnDocument.AFTER
+    )
+    replaced = collection.find_one_and_replace(
+        {"a": 2}, {"b": 2}, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+    )
+    upserted = collection.find_one_and_update(
+        {"a": 3}, {"$set": {"c": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    deleted = collection.find_one_and_delete({"b": 2})
+
+    assert before["l"] == []
+    assert after["l"] == [1, 2]
+    assert after["_id"] == before["_id"]
+    assert replaced == {"b": 2}
+    assert upserted["a"] == 3 and upserted["c"] == 1
+    assert deleted["b"] == 2
+    assert collection.find_one_and_delete({"b": 2}) is None
+    assert collection.count_documents({}) == 2
+
+
+def test_update_with_indexes(collection):
+    collection.insert_many([{"a": i, "b": 0, "l": []} for i in range(100)])
+    collection.create_index({"a": 1})
+    collection.create_index({"b": 1})
+
+    collection.update_many({"a": {"$lt": 50}}, {"$set": {"b": 1}, "$push": {"l": 1}})
+    collection.update_many({}, {"$inc": {"a": 1}})
+
+    assert [index["size"] for index in collection.get_indexes()] == [100, 100]
+    assert collection.count_documents({"b": 1}) == 50
+    assert list(collection.find({"a": 7}, {"_id": 0})) == [{"a": 7, "b": 1, "l": [1]}]
+
+
+def test_negated_regex(collection):
+    collection.insert_many([{"name": "abx"}, {"name": "ab1"}, {"name": "zz"}])
+
+    def names(filter_):
+        return [document["name"] for document in collection.find(filter_)]
+
+    for _ in range(2):
+        assert names({"name": {"$not": {"$regex": "^ab\\d"}}}) == ["abx", "zz"]
+        assert names({"$nor": [{"name": {"$regex": "^ab\\d"}}]}) == ["abx", "zz"]
+        assert names({"name": {"$not": {"$regex": "^ab"}}}) == ["zz"]
+
+        collection.create_index({"name": 1})
+
+
+def test_find_raw_prefilter(collection):
+    collection.insert_many([{"a": 1}, {"a": 1.0}, {"a": "1"}, {"a": 2.5}, {"b": "a"}])
+
+    assert collection.count_documents({"a": 1}) == 2
+    assert collection.count_documents({"a": {"$in": [2.5, "1"]}}) == 2
+    assert collection.count_documents({"b": "a"}) == 1
+
+
+def test_cursor_snapshot(collection):
+    collection.create_index({"group": 1})
+    # More documents than a read chunk, the cursor reads the file after the writes
+    collection.insert_many([{"i": i, "group": i % 2} for i in range(6000)])
+
+    cursor = iter(collection.find({}))
+    indexed_cursor = iter(collection.find({"group": 0}))
+    first = [next(cursor) for _ in range(10)]
+
+    # Rewrites every document at the end of the file and deletes some
+    collection.update_many({}, {"$inc": {"i": 1000}})
+    collection.delete_many({"i": {"$lt": 6500}})
+    collection.insert_one({"i": -1, "group": 0})
+
+    documents = first + list(cursor)
+    assert sorted(document["i"] for document in documents) == list(range(6000))
+
+    assert sorted(document["i"] for document in indexed_cursor) == list(range(0, 6000, 2))
+
+    # New cursors see the writes
+    assert sorted(document["i"] for document in collection.find({})) == [-1] + list(
+        range(6500, 7000)
+    )
+
+
+def test_client_chosen_ids(collection):
+    collection.insert_many([{"_id": 1, "x": 1}, {"_id": "a", "x": 2}])
+    collection.insert_one({"x": 3})
+
+    assert [document["_id"] for document in collection.find({"x": {"$lt": 3}})] == [1, "a"]
+    assert collection.find_one({"x": 2})["_id"] == "a"
+    assert collection.find_one({"_id": 1}, {"_id": 0}) == {"x": 1}
+    assert list(collection.aggregate([{"$match": {"_id": "a"}}])) == [{"_id": "a", "x": 2}]
+
+    collection.create_index({"x": 1})
+    collection.update_one({"_id": "a"}, {"$set": {"x": 4}})
+    assert collection.find_one({"x": 4})["_id"] == "a"
+
+
+def test_duplicate_ids(collection):
+    from pymongolite.backend.exceptions import DuplicateKeyError
+
+    collection.create_index({"a": 1})
+    collection.insert_one({"_id": 1, "a": 1})
+
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_one({"_id": 1, "a": 2})
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_many([{"_id": 2, "a": 2}, {"_id": 2, "a": 3}])
+
+    with pytest.raises(BulkWriteError) as error:
+        collection.bulk_write(
+            [InsertOne({"_id": 3, "a": 3}), InsertOne({"_id": 1, "a": 4})], ordered=False
+        )
+    assert [write_error["index"] for write_error in error.value.details["writeErrors"]] == [1]
+
+    assert list(collection.find({"a": 1})) == [{"_id": 1, "a": 1}]
+    assert collection.count_documents({}) == 2
+
+
+def test_object_id_fields(collection):
+    from pymongolite.backend.objectid import ObjectId
+
+    oid = ObjectId()
+    collection.insert_one({"ref": oid, "refs": [{"ref": oid}]})
+
+    document = collection.find_one({"ref": oid}, {"_id": 0})
+    assert document == {"ref": oid, "refs": [{"ref": oid}]}
+    assert isinstance(document["ref"], ObjectId)
+    assert collection.count_documents({"ref": {"$in": [oid]}}) == 1
+    assert [document["ref"] for document in collection.aggregate([{"$match": {"ref": oid}}])] == [
+        oid
+    ]
+
+    # A string in the form of an ObjectId stays a string
+    collection.insert_one({"_id": str(oid), "ref": str(oid)})
+    assert collection.find_one({"_id": str(oid)}) == {"_id": str(oid), "ref": str(oid)}
+    assert collection.count_documents({"ref": oid}) == 1
+
+    with open("col_test/db/col", "r") as file:
+        assert f'"_id": {{"$oid": "{collection.find_one({"ref": oid})["_id"]}"}}' in file.read()
+
+
+def test_upsert_by_id(collection):
+    from pymongolite.backend.objectid import ObjectId
+
+    oid = ObjectId()
+    for _ in range(2):
+        collection.update_one({"_id": oid}, {"$inc": {"visits": 1}}, upsert=True)
+        collection.replace_one({"_id": "r"}, {"name": "r"}, upsert=True)
+
+    assert collection.count_documents({}) == 2
+    assert collection.find_one({"_id": oid}) == {"_id": oid, "visits": 2}
+    assert collection.find_one({"_id": "r"}) == {"_id": "r", "name": "r"}
+
+
+def test_find_by_id_after_reopen(collection):
+    ids = collection.insert_many([{"a": i} for i in range(5)])
+
+    with MongoClient("col_test", database="db") as client:
+        reopened = client.get_default_database().get_collection("col")
+
+        assert reopened.find_one({"_id": ids[3]}) == {"_id": ids[3], "a": 3}
+        assert reopened.count_documents({"_id": {"$in": ids[:2]}}) == 2
+
+        reopened.update_one({"_id": ids[1]}, {"$set": {"a": 10}})
+        reopened.delete_one({"_id": ids[2]})
+
+        assert sorted(document["a"] for document in reopened.find({})) == [0, 3, 4, 10]
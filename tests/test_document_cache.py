@@ -0,0 +1,82 @@
+import shutil
+
+import pytest
+
+from pymongolite import MongoClient
+from pymongolite.backend.storage_engine.document_cache import DocumentCache
+
+DIRPATH = "test-document-cache"
+
+
+@pytest.fixture(scope="function")
+def client():
+    client = MongoClient(DIRPATH, database="db", document_cache_size=1024 * 1024)
+    collection = client.get_default_database().create_collection("col")
+    collection.create_index({"value": 1})
+    yield client
+    client.close()
+    shutil.rmtree(DIRPATH)
+
+
+def _stats(client) -> dict:
+    with client._open_session() as session:
+        return session.document_cache_stats()
+
+
+def test_index_reads_and_invalidation(client):
+    collection = client.get_default_database().get_collection("col")
+    collection.insert_many([{"value": i, "tags": ["a"]} for i in range(10)])
+
+    assert collection.find_one({"value": 3})["tags"] == ["a"]
+    document = collection.find_one({"value": 3})
+    assert document["tags"] == ["a"]
+    assert _stats(client)["hits"] == 1
+
+    # Callers get copies
+    document["tags"].append("b")
+    assert collection.find_one({"value": 3})["tags"] == ["a"]
+
+    collection.update_one({"value": 3}, {"$set": {"tags": ["c"]}})
+    assert collection.find_one({"value": 3})["tags"] == ["c"]
+
+    collection.delete_one({"value": 3})
+    assert collection.find_one({"value": 3}) is None
+    assert collection.count_documents({"value": {"$in": [2, 3, 4]}}) == 2
+
+    client.drop_database("db")
+    collection = client.get_default_database().create_collection("col")
+    collection.create_index({"value": 1})
+    collection.insert_one({"value": 0, "tags": ["d"]})
+    assert collection.find_one({"value": 0})["tags"] == ["d"]
+
+
+def test_scan_resistance():
+    cache = DocumentCache(max_size=400, max_entry_size=10)
+
+    def read(offset: int, scan: bool = False):
+        key = ("db", "col", offset)
+        if cache.get(key) is None:
+            cache.put(key, cache.generation("db", "col"), f"{offset:09}\n", scan=scan)
+
+    # The hot lines leave the FIFO, then are looked up again
+    for offset in range(50):
+        read(offset)
+    for offset in range(10):
+        read(offset)
+
+    for offset in range(100, 1000):
+        read(offset, scan=True)
+
+    assert all(cache.get(("db", "col", offset)) is not None for offset in range(10))
+    assert cache.stats.size <= cache.max_size
+
+
+def test_tombstoned_line_read_before_invalidation():
+    cache = DocumentCache(max_size=1024)
+    key = ("db", "col", 0)
+
+    generation = cache.generation("db", "col")
+    cache.invalidate("db", "col", [0])
+    cache.put(key, generation, "{}\n")
+
+    assert cache.get(key) is None
@@ -1,6 +1,7 @@
 import pytest
 
 from pymongolite.backend.indexing_engine.v1_engine import V1Engine
+from pymongolite.backend.exceptions import IndexRequired
 from pymongolite.backend.objectid import ObjectId
 from pymongolite.backend.read_instructions import ReadInstructions
 
@@ -40,12 +41,12 @@ def test_add_to_index_and_delete_from_index(indexing_v1_engine):
     indexing_v1_engine.insert_documents("db", "col", [({"age": 5, "_id": oid}, 0)])
 
     assert len(indexing_v1_engine._indexes["db"]["col"]["age"]) == 1
-    assert len(indexing_v1_engine._root_index) == 1
+    assert len(indexing_v1_engine._get_row_table("db", "col")) == 1
 
     indexing_v1_engine.delete_documents("db", "col", [{"age": 5, "_id": oid}])
 
     assert len(indexing_v1_engine._indexes["db"]["col"]["age"]) == 0
-    assert len(indexing_v1_engine._root_index) == 0
+    assert len(indexing_v1_engine._get_row_table("db", "col")) == 0
 
 
 def test_simple_queries(indexing_v1_engine):
@@ -190,3 +191,370 @@ def test_multi_index_query(indexing_v1_engine):
         ReadInstructions(offset=0, chunk_size=5),
         filter_={"age": {"$lt": 15}, "size": {"$gt": 5}}
     ).indexes == {0}
+
+
+def test_partial_index(indexing_v1_engine):
+    indexing_v1_engine.create_index(
+        "db", "col", {"age": 1}, partialFilterExpression={"status": "pending"}
+    )
+    indexing_v1_engine.insert_documents(
+        "db",
+        "col",
+        [
+            ({"age": 5, "status": "pending", "_id": ObjectId()}, 0),
+            ({"age": 10, "status": "done", "_id": ObjectId()}, 1),
+            ({"age": 15, "status": "pending", "_id": ObjectId()}, 2),
+        ]
+    )
+
+    assert len(indexing_v1_engine._indexes["db"]["col"]["age"]) == 2
+
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"age": {"$gt": 1}, "status": {"$eq": "pending"}}
+    ).indexes == {0, 2}
+
+    # The filter doesn't imply the partial expression so the index can't be used
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"age": {"$gt": 1}}
+    ).indexes is None
+
+    indexing_v1_engine.delete_documents(
+        "db", "col", [{"age": 10, "status": "done", "_id": ObjectId()}]
+    )
+    assert len(indexing_v1_engine._indexes["db"]["col"]["age"]) == 2
+
+
+def test_text_index_query(indexing_v1_engine):
+    indexing_v1_engine.create_index("db", "col", {"body": "text"})
+    indexing_v1_engine.insert_documents(
+        "db",
+        "col",
+        [
+            ({"body": "Coffee shop", "_id": ObjectId()}, 0),
+            ({"body": "tea shop", "_id": ObjectId()}, 1),
+            ({"body": "coffee, coffee and more coffee shop", "_id": ObjectId()}, 2),
+        ]
+    )
+
+    read_instructions = indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"$text": {"$search": "coffee shop"}}
+    )
+    assert read_instructions.indexes == {0, 2}
+    assert list(read_instructions) == [2, 0]
+
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"$text": {"$search": "milk"}}
+    ).indexes == set()
+
+
+def test_text_index_delete(indexing_v1_engine):
+    indexing_v1_engine.create_index("db", "col", {"body": "text"})
+    document = {"body": "tea shop", "_id": ObjectId()}
+    indexing_v1_engine.insert_documents("db", "col", [(document, 0)])
+
+    assert len(indexing_v1_engine._indexes["db"]["col"]["body"]) == 1
+
+    indexing_v1_engine.delete_documents("db", "col", [document])
+
+    assert len(indexing_v1_engine._indexes["db"]["col"]["body"]) == 0
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"$text": {"$search": "tea"}}
+    ).indexes == set()
+
+
+def test_regex_prefix_query(indexing_v1_engine):
+    indexing_v1_engine.create_index("db", "col", {"path": 1})
+    indexing_v1_engine.insert_documents(
+        "db",
+        "col",
+        [
+            ({"path": "/home/a", "_id": ObjectId()}, 0),
+            ({"path": "/home/b", "_id": ObjectId()}, 1),
+            ({"path": "/homer", "_id": ObjectId()}, 2),
+            ({"path": "/etc", "_id": ObjectId()}, 3),
+        ]
+    )
+
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"path": {"$regex": "^/home/"}}
+    ).indexes == {0, 1}
+
+    # The prefix range is a superset of ^/home/a.*b, its complement isn't excluded
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"path": {"$not": {"$regex": "^/home/a.*b"}}}
+    ).exclude_indexes == set()
+
+    # Not anchored, the index can't narrow the search
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"path": {"$regex": "home"}}
+    ).indexes is None
+
+
+def test_geo_index_queries(indexing_v1_engine):
+    indexing_v1_engine.create_index("db", "col", {"loc": "2d"})
+    indexing_v1_engine.insert_documents(
+        "db",
+        "col",
+        [
+            ({"loc": [0, 0], "_id": ObjectId()}, 0),
+            ({"loc": [3, 4], "_id": ObjectId()}, 1),
+            ({"loc": [1, 1], "_id": ObjectId()}, 2),
+            ({"loc": [50, 50], "_id": ObjectId()}, 3),
+        ]
+    )
+
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"loc": {"$geoWithin": {"$box": [[-1, -1], [2, 2]]}}}
+    ).indexes == {0, 2}
+
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"loc": {"$geoWithin": {"$polygon": [[-1, -1], [10, -1], [-1, 10]]}}}
+    ).indexes == {0, 1, 2}
+
+    read_instructions = indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"loc": {"$near": [3, 3], "$maxDistance": 5}}
+    )
+    assert list(read_instructions) == [1, 2, 0]
+
+    # Meters on a plane index, the matcher would measure differently than the index
+    with pytest.raises(ValueError):
+        indexing_v1_engine.query(
+            "db",
+            "col",
+            ReadInstructions(offset=0, chunk_size=5),
+            filter_={
+                "loc": {
+                    "$near": {"$geometry": {"type": "Point", "coordinates": [0, 0]}},
+                    "$maxDistance": 2,
+                }
+            }
+        )
+
+
+def test_geo_index_antimeridian(indexing_v1_engine):
+    indexing_v1_engine.create_index("db", "col", {"loc": "2dsphere"}, cellSize=0.5)
+    indexing_v1_engine.insert_documents(
+        "db",
+        "col",
+        [
+            ({"loc": [179.9, 0], "_id": ObjectId()}, 0),
+            ({"loc": [-179.9, 0], "_id": ObjectId()}, 1),
+            ({"loc": [0, 0], "_id": ObjectId()}, 2),
+            *[({"loc": [i, 10], "_id": ObjectId()}, 3 + i) for i in range(-170, 170)],
+        ]
+    )
+
+    near = {"$geometry": {"type": "Point", "coordinates": [-179.95, 0]}}
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"loc": {"$near": near, "$maxDistance": 50000}}
+    ).indexes == {0, 1}
+
+    assert indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"loc": {"$geoWithin": {"$centerSphere": [[179.95, 0], 0.003]}}}
+    ).indexes == {0, 1}
+
+
+def test_near_requires_index(indexing_v1_engine):
+    with pytest.raises(IndexRequired):
+        indexing_v1_engine.query(
+            "db",
+            "col",
+            ReadInstructions(offset=0, chunk_size=5),
+            filter_={"loc": {"$near": [3, 3]}}
+        )
+
+
+def test_vector_index_query(indexing_v1_engine):
+    pytest.importorskip("numpy")
+
+    indexing_v1_engine.create_index("db", "col", {"embedding": "vector"})
+    indexing_v1_engine.insert_documents(
+        "db",
+        "col",
+        [
+            ({"embedding": [1, 0, 0], "_id": ObjectId()}, 0),
+            ({"embedding": [0.9, 0.1, 0], "_id": ObjectId()}, 1),
+            ({"embedding": [0, 1, 0], "_id": ObjectId()}, 2),
+        ]
+    )
+
+    read_instructions = indexing_v1_engine.query(
+        "db",
+        "col",
+        ReadInstructions(offset=0, chunk_size=5),
+        filter_={"embedding": {"$vectorSearch": {"queryVector": [1, 0, 0], "limit": 2}}}
+    )
+    assert list(read_instructions) == [0, 1]
+
+
+def test_vector_index_ivf_mode():
+    pytest.importorskip("numpy")
+    from pymongolite.backend.indexing_engine.index_types.vector_index import VectorIndex
+
+    index = VectorIndex(mode="ivf", num_lists=4, num_probes=4, train_threshold=50)
+    for i in range(100):
+        index.add([float(i % 10), float(i // 10), 1.0], i)
+
+    for i in range(0, 100, 2):
+        index.remove(None, i)
+
+    assert len(index) == 50
+    # Probing every list gives the exact answer
+    assert set(index.score("$vectorSearch", {"queryVector": [9, 9, 1], "limit": 1})) == {99}
+
+
+def test_vector_index_options(indexing_v1_engine):
+    pytest.importorskip("numpy")
+
+    indexing_v1_engine.create_index(
+        "db", "col", {"embedding": "vector"}, mode="ivf", numLists=4, trainThreshold=50
+    )
+    indexing_v1_engine.insert_documents(
+        "db",
+        "col",
+        [({"embedding": [float(i), 1.0], "_id": ObjectId()}, i) for i in range(60)],
+    )
+
+    index = indexing_v1_engine._indexes["db"]["col"]["embedding"]
+    assert index._VectorIndex__centroids is not None
+
+
+def test_vector_index_more_lists_than_vectors():
+    pytest.importorskip("numpy")
+    from pymongolite.backend.indexing_engine.index_types.vector_index import VectorIndex
+
+    index = VectorIndex(mode="ivf", num_lists=16, train_threshold=4)
+    for i in range(4):
+        index.add([float(i), 1.0], i)
+
+    assert set(index.score("$vectorSearch", {"queryVector": [3, 1], "limit": 1})) == {3}
+
+
+def test_count_documents_covered(indexing_v1_engine):
+    indexing_v1_engine.create_index("db", "col", {"age": 1})
+    indexing_v1_engine.create_index("db", "col", {"name": 1})
+
+    indexing_v1_engine.insert_documents(
+        "db",
+        "col",
+        [
+            ({"_id": ObjectId(), "age": age, "name": name}, i)
+            for i, (age, name) in enumerate([(0, "a"), (0, "b"), (5, "a"), (9, "c")])
+        ],
+    )
+
+    assert indexing_v1_engine.count_documents("db", "col", {"age": 0}) == 2
+    assert indexing_v1_engine.count_documents("db", "col", {"age": {"$gte": 0, "$lt": 9}}) == 3
+    assert indexing_v1_engine.count_documents("db", "col", {"age": 0, "name": "a"}) == 1
+    assert indexing_v1_engine.count_documents("db", "col", {"name": {"$in": []}}) == 0
+    assert indexing_v1_engine.count_documents("db", "col", {"age": {"$ne": 0}}) is None
+    assert indexing_v1_engine.count_documents("db", "col", {"other": 1}) is None
+
+
+def test_update_touches_changed_fields_only(indexing_v1_engine):
+    indexing_v1_engine.create_index("db", "col", {"age": 1})
+    indexing_v1_engine.create_index(
+        "db", "col", {"name": 1}, partialFilterExpression={"active": True}
+    )
+
+    oid = ObjectId()
+    old_document = {"_id": oid, "age": 5, "name": "a", "active": True}
+    indexing_v1_engine.insert_documents("db", "col", [(old_document, 0)])
+
+    age_index = indexing_v1_engine._indexes["db"]["col"]["age"]
+    touched = []
+    age_index.add = lambda *args: touched.append(args)
+    age_index.remove = lambda *args: touched.append(args)
+
+    new_document = {**old_document, "active": False}
+    indexing_v1_engine.update_documents("db", "col", [(old_document, new_document, 10)])
+
+    assert touched == []
+    assert indexing_v1_engine._query("db", "col", {"age": 5}).indexes == {10}
+    assert len(indexing_v1_engine._indexes["db"]["col"]["name"]) == 0
+
+
+def test_rows_are_stable(indexing_v1_engine):
+    indexing_v1_engine.create_index("db", "col", {"age": 1})
+
+    oid = ObjectId()
+    document = {"_id": oid, "age": 5}
+    indexing_v1_engine.insert_documents("db", "col", [(document, 0)])
+    indexing_v1_engine.set_collection_loaded("db", "col")
+    row = indexing_v1_engine._get_row_table("db", "col").row(oid)
+
+    indexing_v1_engine.update_documents("db", "col", [(document, dict(document), 30)])
+
+    assert indexing_v1_engine._get_row_table("db", "col").row(oid) == row
+    assert indexing_v1_engine._query("db", "col", {"age": 5}).indexes == {30}
+
+    def ids_query(collection_name: str, filter_: dict):
+        return indexing_v1_engine.query(
+            "db", collection_name, ReadInstructions(offset=0, chunk_size=5), filter_=filter_
+        ).indexes
+
+    assert ids_query("col", {"_id": oid}) == {30}
+    assert ids_query("col", {"_id": {"$in": [oid, ObjectId(), [1]]}}) == {30}
+    assert ids_query("col", {"_id": ObjectId()}) == set()
+    # Not every document of the collection has a row yet, it's scanned
+    assert ids_query("other", {"_id": oid}) is None
+
+    indexing_v1_engine.drop_collection("db", "col")
+
+    assert indexing_v1_engine.get_indexes_list("db", "col") == []
+    assert len(indexing_v1_engine._get_row_table("db", "col")) == 0
+
+
+def test_rows_are_reused(indexing_v1_engine):
+    indexing_v1_engine.create_index("db", "col", {"age": 1})
+    row_table = indexing_v1_engine._get_row_table("db", "col")
+
+    for i in range(100):
+        document = {"_id": ObjectId(), "age": i}
+        indexing_v1_engine.insert_documents("db", "col", [(document, i)])
+        indexing_v1_engine.delete_documents("db", "col", [document])
+
+    indexing_v1_engine.insert_documents("db", "col", [({"_id": ObjectId(), "age": 7}, 100)])
+
+    assert len(row_table._RowTable__offsets) == 1
+    assert indexing_v1_engine._query("db", "col", {"age": 7}).indexes == {100}
+    assert indexing_v1_engine._query("db", "col", {"age": 99}).indexes == set()
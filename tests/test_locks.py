@@ -0,0 +1,120 @@
+import shutil
+import threading
+import time
+
+import pytest
+
+from pymongolite import MongoClient
+from pymongolite.backend.exceptions import LockUpgradeError
+from pymongolite.backend.locks import ReadWriteLock
+
+
+def _run(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=5)
+
+    def reader():
+        with lock.read_locked():
+            inside.wait()  # Every reader is inside at the same time
+
+    threads = [_run(reader) for _ in range(3)]
+    for thread in threads:
+        thread.join(5)
+
+    assert not inside.broken
+    assert lock.stats.read_acquisitions == 3
+    assert lock.stats.write_acquisitions == 0
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    order = []
+
+    lock.acquire_read()
+
+    def writer():
+        with lock.write_locked():
+            order.append("writer")
+
+    def reader():
+        with lock.read_locked():
+            order.append("reader")
+
+    writer_thread = _run(writer)
+    while not lock._waiting_writers:
+        time.sleep(0.001)
+
+    reader_thread = _run(reader)
+    time.sleep(0.05)
+    assert order == []
+
+    lock.release_read()
+    writer_thread.join(5)
+    reader_thread.join(5)
+
+    assert order == ["writer", "reader"]
+    assert lock.stats.write_contended == 1
+    assert lock.stats.read_contended == 1
+    assert lock.stats.max_write_wait_time >= 0.05
+
+
+def test_reentrant_and_upgrade():
+    lock = ReadWriteLock()
+
+    with lock.write_locked():
+        with lock.write_locked():
+            with lock.read_locked():
+                pass
+
+    with lock.read_locked():
+        with lock.read_locked():
+            with pytest.raises(LockUpgradeError):
+                lock.acquire_write()
+
+    # Fully released
+    assert lock._writer is None and not lock._readers
+
+
+def test_concurrent_readers_and_writers():
+    client = MongoClient("test-locks")
+    collection = client.get_database("db").create_collection("col")
+    collection.insert_many([{"i": i, "type": "seed"} for i in range(50)])
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(20):
+                collection.insert_one({"i": i, "type": f"writer{n}"})
+                collection.update_many({"type": f"writer{n}"}, {"$inc": {"i": 1}})
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(20):
+                assert len(list(collection.find({"type": "seed"}))) == 50
+        except Exception as e:
+            errors.append(e)
+
+    threads = [_run(writer, n) for n in range(2)] + [_run(reader) for _ in range(4)]
+    for thread in threads:
+        thread.join(30)
+
+    assert errors == []
+    assert collection.count_documents({}) == 90
+
+    with client._open_session() as session:
+        stats = session.lock_stats()
+
+    assert stats["commands"]["db.col"]["write_acquisitions"] > 0
+    assert stats["storage"]["db.col"]["read_acquisitions"] > 0
+
+    client.drop_database("db")
+    client.close()
+    shutil.rmtree("test-locks")
@@ -1,4 +1,12 @@
-from pymongolite.backend.utils import document_filter_match
+from pymongolite.backend.utils import (
+    document_filter_match,
+    filter_implies,
+    compile_regex,
+    regex_literal_prefix,
+    unique_values,
+    raw_needles,
+    Null,
+)
 
 
 def test_simple_field_match():
@@ -30,6 +38,12 @@ def test_field_operator_lte_match():
     assert document_filter_match({"a": 1}, {"a": {"$lte": 2}}) is True
 
 
+def test_range_operators_skip_missing_and_other_types():
+    assert document_filter_match({"b": 1}, {"a": {"$gte": 0}}) is False
+    assert document_filter_match({"a": "x"}, {"a": {"$lt": 2}}) is False
+    assert document_filter_match({"a": None}, {"a": {"$gt": 0}}) is False
+
+
 def test_field_operator_eq_match():
     assert document_filter_match({"a": 1}, {"a": {"$eq": 0}}) is False
     assert document_filter_match({"a": 1}, {"a": {"$eq": 1}}) is True
@@ -101,3 +115,70 @@ def test_nor():
         document_filter_match({"a": 1}, {"$nor": [{"a": {"$gt": 0}}, {"a": {"$eq": 1}}]})
         is False
     )
+
+
+def test_filter_implies():
+    assert filter_implies({"a": 1}, {"a": 1}) is True
+    assert filter_implies({"a": {"$eq": 1}, "b": 2}, {"a": 1}) is True
+    assert filter_implies({"a": 2}, {"a": 1}) is False
+    assert filter_implies({"b": 1}, {"a": 1}) is False
+    assert filter_implies({}, {"a": 1}) is False
+    assert filter_implies({"a": {"$gt": 5}}, {"a": {"$gt": 1}}) is True
+    assert filter_implies({"a": {"$gte": 1}}, {"a": {"$gt": 1}}) is False
+    assert filter_implies({"a": 3}, {"a": {"$gte": 3}}) is True
+    assert filter_implies({"a": {"$in": [1, 2]}}, {"a": {"$in": [1, 2, 3]}}) is True
+    assert filter_implies({"a": 1}, {"a": {"$exists": True}}) is True
+    assert filter_implies({"$and": [{"a": 1}, {"b": 1}]}, {"a": 1, "b": 1}) is True
+    assert filter_implies({"$or": [{"a": 1}, {"a": 2}]}, {"a": 1}) is False
+
+
+def test_regex():
+    assert document_filter_match({"a": "abcd"}, {"a": {"$regex": "^abc"}}) is True
+    assert document_filter_match({"a": "xabc"}, {"a": {"$regex": "^abc"}}) is False
+    assert document_filter_match({"a": "ABC"}, {"a": {"$regex": "abc", "$options": "i"}}) is True
+    assert document_filter_match({"a": 1}, {"a": {"$regex": "1"}}) is False
+    assert document_filter_match({"b": "abc"}, {"a": {"$regex": "abc"}}) is False
+
+
+def test_regex_literal_prefix():
+    assert regex_literal_prefix(compile_regex("^abc")) == "abc"
+    assert regex_literal_prefix(compile_regex("^abc.*x")) == "abc"
+    assert regex_literal_prefix(compile_regex("^abc?")) == "ab"
+    assert regex_literal_prefix(compile_regex("^ab+")) == "ab"
+    assert regex_literal_prefix(compile_regex("abc")) is None
+    assert regex_literal_prefix(compile_regex("^abc|^x")) is None
+    assert regex_literal_prefix(compile_regex("^abc", "i")) is None
+
+
+def test_geo_within():
+    box = {"$box": [[0, 0], [2, 2]]}
+    assert document_filter_match({"loc": [1, 1]}, {"loc": {"$geoWithin": box}}) is True
+    assert document_filter_match({"loc": [3, 1]}, {"loc": {"$geoWithin": box}}) is False
+    assert document_filter_match({"a": 1}, {"loc": {"$geoWithin": box}}) is False
+
+    circle = {"$center": [[0, 0], 1]}
+    assert document_filter_match({"loc": [0.5, 0.5]}, {"loc": {"$geoWithin": circle}}) is True
+    assert document_filter_match({"loc": [1, 1]}, {"loc": {"$geoWithin": circle}}) is False
+
+
+def test_near_max_distance():
+    assert document_filter_match({"loc": [3, 4]}, {"loc": {"$near": [0, 0], "$maxDistance": 5}}) is True
+    assert document_filter_match({"loc": [3, 4]}, {"loc": {"$near": [0, 0], "$maxDistance": 4}}) is False
+
+
+def test_unique_values():
+    assert unique_values([1, [2, 1], {"a": 1}, {"a": 1}, Null(), "x"]) == [
+        1,
+        2,
+        {"a": 1},
+        "x",
+    ]
+
+
+def test_raw_needles():
+    assert raw_needles({"a": "x", "b": {"$in": [1, 2.5]}, "c": {"$gt": 1}}) == [
+        ('"x"',),
+        ("1", "2.5"),
+    ]
+    assert raw_needles({"$and": [{"a": 1.0}], "$or": [{"b": 1}]}) == [("1",)]
+    assert raw_needles({"a": True, "b": None, "c": {"$in": ["x", [1]]}}) == []
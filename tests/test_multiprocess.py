@@ -0,0 +1,92 @@
+import json
+import multiprocessing
+import shutil
+
+import pytest
+
+from pymongolite import MongoClient
+
+fcntl = pytest.importorskip("fcntl")
+
+DIRPATH = "test-multiprocess"
+
+
+def _worker(worker: int):
+    with MongoClient(DIRPATH, multiprocess=True) as client:
+        collection = client.get_database("db").get_collection("col")
+
+        for i in range(30):
+            collection.insert_one({"worker": worker, "i": i})
+        collection.update_many({"worker": worker}, {"$inc": {"i": 100}})
+        collection.delete_many({"worker": worker, "i": {"$gte": 120}})
+
+
+@pytest.fixture(scope="function")
+def client():
+    client = MongoClient(DIRPATH, multiprocess=True)
+    client.get_database("db").create_collection("col")
+    yield client
+    client.close()
+    shutil.rmtree(DIRPATH)
+
+
+def test_processes_write_the_same_collection(client):
+    collection = client.get_database("db").get_collection("col")
+    collection.create_index({"worker": 1})
+    collection.insert_one({"worker": -1, "i": 0})
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_worker, args=(worker,)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    # No interleaved appends
+    with open(f"{DIRPATH}/db/col") as collection_file:
+        for line in collection_file:
+            if not line.startswith("0"):
+                json.loads(line)
+
+    # Indexes rebuilt from the changes of the other processes
+    assert collection.count_documents({}) == 81
+    assert collection.count_documents({"worker": 2}) == 20
+    assert sorted(document["i"] for document in collection.find({"worker": 3})) == list(
+        range(100, 120)
+    )
+
+    document = collection.find_one({"worker": 1, "i": 105})
+    assert collection.find_one({"_id": document["_id"]}) == document
+
+
+def _insert(document: dict):
+    with MongoClient(DIRPATH, multiprocess=True) as client:
+        client.get_database("db").get_collection("col").insert_one(document)
+
+
+def test_write_after_another_process_wrote_before_the_lock(client, monkeypatch):
+    collection = client.get_database("db").get_collection("col")
+    collection.create_index({"name": 1})
+    collection.find_one({})
+
+    with client._open_session() as session:
+        engine = session._execution_engine
+    sync_collection = engine._ChunkedEngine__sync_collection
+
+    def sync_then_other_process_writes(database_name, collection_name):
+        sync_collection(database_name, collection_name)
+        process = multiprocessing.get_context("fork").Process(
+            target=_insert, args=({"_id": 5, "name": "a"},)
+        )
+        process.start()
+        process.join(60)
+        assert process.exitcode == 0
+
+    monkeypatch.setattr(engine, "_ChunkedEngine__sync_collection", sync_then_other_process_writes)
+    # Matched through the index, stale it would miss the new document and insert another
+    collection.update_one({"name": "a"}, {"$set": {"name": "b"}}, upsert=True)
+    monkeypatch.undo()
+
+    assert list(collection.find({})) == [{"_id": 5, "name": "b"}]
+    assert collection.find_one({"name": "b"}) == {"_id": 5, "name": "b"}
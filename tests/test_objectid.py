@@ -0,0 +1,66 @@
+import json
+import pickle
+import shutil
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+from pymongolite import MongoClient
+from pymongolite.backend.exceptions import InvalidId
+from pymongolite.backend.objectid import ObjectId
+
+
+def test_object_id_layout():
+    oid = ObjectId()
+
+    assert len(oid.binary) == 12
+    assert len(str(oid)) == 24
+    assert ObjectId(str(oid)) == oid
+    assert ObjectId(oid.binary) == oid
+    assert hash(ObjectId(str(oid))) == hash(oid)
+    assert abs((oid.generation_time - datetime.now(timezone.utc)).total_seconds()) < 5
+
+
+def test_object_id_ordering():
+    first, second = ObjectId(), ObjectId()
+    earlier = ObjectId.from_datetime(datetime(2000, 1, 1, tzinfo=timezone.utc))
+
+    assert first < second
+    assert earlier < first
+    assert earlier.generation_time == datetime(2000, 1, 1, tzinfo=timezone.utc)
+    assert pickle.loads(pickle.dumps(first)) == first
+
+
+def test_object_id_legacy_and_invalid():
+    legacy = ObjectId(str(uuid4()))
+
+    assert legacy.is_legacy
+    assert legacy.generation_time is None
+    assert legacy < ObjectId()
+
+    with pytest.raises(InvalidId):
+        ObjectId("not an id")
+
+    assert ObjectId.is_valid("a" * 24)
+    assert not ObjectId.is_valid("a" * 23)
+
+
+def test_read_legacy_collection():
+    with MongoClient("oid_test", database="db") as client:
+        collection = client.get_default_database().create_collection("col")
+        legacy_id = str(uuid4())
+
+        with open("oid_test/db/col", "a") as file:
+            file.write(json.dumps({"a": 1, "_id": legacy_id}) + "\n")
+
+        collection.insert_one({"a": 2})
+        collection.update_many({}, {"$inc": {"a": 1}})
+
+        documents = list(collection.find({}))
+
+    shutil.rmtree("oid_test")
+
+    # Only tagged ids are ObjectIds, the legacy id reads back as it was stored
+    assert documents[0]["_id"] == legacy_id
+    assert [document["a"] for document in documents] == [2, 3]
@@ -0,0 +1,91 @@
+import shutil
+
+import pytest
+
+from pymongolite import MongoClient
+from pymongolite.backend.execution_engine.query_cache import QueryCache
+
+DIRPATH = "test-query-cache"
+
+
+@pytest.fixture(scope="function")
+def client():
+    client = MongoClient(DIRPATH, database="db", query_cache_size=1024 * 1024)
+    client.get_default_database().create_collection("col")
+    yield client
+    client.close()
+    shutil.rmtree(DIRPATH)
+
+
+def _stats(client) -> dict:
+    with client._open_session() as session:
+        return session.query_cache_stats()
+
+
+def test_hits_and_invalidation(client):
+    collection = client.get_default_database().get_collection("col")
+    collection.insert_many([{"name": "a", "value": i} for i in range(10)])
+
+    assert len(list(collection.find({"value": {"$gte": 5}}))) == 5
+    assert len(list(collection.find({"value": {"$gte": 5}}))) == 5
+    assert collection.count_documents({"name": "a"}) == 10
+    assert collection.count_documents({"name": "a"}) == 10
+
+    stats = _stats(client)
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+
+    collection.update_one({"value": 1}, {"$set": {"value": 100}})
+    assert len(list(collection.find({"value": {"$gte": 5}}))) == 6
+
+    collection.delete_many({"value": {"$gte": 5}})
+    assert list(collection.find({"value": {"$gte": 5}})) == []
+    assert collection.count_documents({"name": "a"}) == 4
+
+    # A write matching nothing keeps the entries
+    collection.update_many({"value": -1}, {"$set": {"value": 0}})
+    assert collection.count_documents({"name": "a"}) == 4
+    assert _stats(client)["hits"] == 3
+
+
+def test_results_are_copies(client):
+    collection = client.get_default_database().get_collection("col")
+    collection.insert_one({"tags": ["a"]})
+
+    for _ in range(2):
+        document = collection.find_one({})
+        document["tags"].append("b")
+
+    assert collection.find_one({})["tags"] == ["a"]
+
+
+def test_partial_reads_are_not_cached(client):
+    collection = client.get_default_database().get_collection("col")
+    collection.insert_many([{"value": i} for i in range(10)])
+
+    cursor = collection.find({})
+    next(cursor)
+    cursor.close()
+
+    assert _stats(client)["entries"] == 0
+
+
+def test_lru_eviction():
+    cache = QueryCache(max_size=100, max_entry_size=60)
+    keys = [cache.make_key("db", "col", "find", {"value": i}) for i in range(3)]
+
+    cache.put(keys[0], 0, "first", 40)
+    cache.put(keys[1], 0, "second", 40)
+    assert cache.get(keys[0]) == "first"
+
+    cache.put(keys[2], 0, "third", 40)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "first"
+    assert cache.stats.evictions == 1
+
+    cache.put(cache.make_key("db", "col", "find", {}), 0, "large", 80)
+    assert cache.stats.entries == 2
+
+    # Read before a write, never kept
+    cache.invalidate("db", "col")
+    cache.put(keys[1], 0, "stale", 10)
+    assert cache.get(keys[1]) is None and cache.stats.entries == 0
@@ -0,0 +1,39 @@
+import json
+import pickle
+
+from pymongolite.backend.objectid import ObjectId
+from pymongolite.backend.raw_document import RawDocument
+from pymongolite.backend.utils import document_filter_match, update_with_fields
+
+
+def _raw(document: dict) -> RawDocument:
+    return RawDocument(json.dumps(document) + "\n")
+
+
+def test_lazy_field_access():
+    oid = ObjectId()
+    document = _raw({"_id": {"$oid": str(oid)}, "a": {"b": [1, "x"]}, "c": "d"})
+
+    assert document["a"] == {"b": [1, "x"]}
+    assert document._fields.keys() == {"_id", "a"}
+    assert document["_id"] == oid
+    assert "c" in document
+    assert "e" not in document
+    assert document.get("e", 1) == 1
+    assert document.to_dict() == {"_id": oid, "a": {"b": [1, "x"]}, "c": "d"}
+
+
+def test_match_and_project_raw():
+    document = _raw({"a": 1, "b": "x", "c": [1, 2]})
+
+    assert document_filter_match(document, {"a": {"$gte": 1}, "b": "x"})
+    assert not document_filter_match(document, {"d": {"$exists": True}})
+    assert update_with_fields(document, {"c": 1}) == {"c": [1, 2]}
+    assert pickle.loads(pickle.dumps(document)) == document
+
+
+def test_empty_raw_document():
+    document = _raw({})
+
+    assert "a" not in document
+    assert len(document) == 0
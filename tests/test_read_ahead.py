@@ -0,0 +1,56 @@
+import shutil
+import threading
+import time
+
+import pytest
+
+from pymongolite import MongoClient
+
+DIRPATH = "test-read-ahead"
+
+
+@pytest.fixture(scope="function")
+def collection():
+    client = MongoClient(DIRPATH, database="db", read_ahead_chunks=1)
+    with client._open_session() as session:
+        session._execution_engine._chunk_size = 10
+
+    collection = client.get_default_database().create_collection("col")
+    collection.insert_many([{"value": i} for i in range(100)])
+    yield collection
+    client.close()
+    shutil.rmtree(DIRPATH)
+
+
+def test_results(collection):
+    assert [document["value"] for document in collection.find({})] == list(range(100))
+    assert len(list(collection.find({"value": {"$gte": 50}}))) == 50
+    assert list(collection.aggregate([{"$match": {"value": {"$lt": 3}}}, {"$count": "n"}])) == [
+        {"n": 3}
+    ]
+
+
+def test_reads_from_the_snapshot(collection):
+    documents = iter(collection.find({}))
+    first = next(documents)
+
+    # Chunks the thread didn't read yet still have the deleted documents
+    collection.delete_many({"value": {"$gte": 50}})
+
+    assert [document["value"] for document in [first, *documents]] == list(range(100))
+    assert collection.count_documents({"value": {"$gte": 0}}) == 50
+
+
+def test_close_stops_the_thread(collection):
+    threads = threading.active_count()
+
+    cursor = collection.find({})
+    next(iter(cursor))
+    assert threading.active_count() == threads + 1
+
+    cursor.close()
+    deadline = time.monotonic() + 5
+    while threading.active_count() > threads and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert threading.active_count() == threads
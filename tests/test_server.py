@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+from threading import Thread
+
+import pytest
+
+from pymongolite import InsertOne, MongoClient, UpdateOne
+from pymongolite.backend.command import COMMANDS, Command
+from pymongolite.backend.server import Server
+from pymongolite.exceptions import BulkWriteError
+
+DIRPATH = "test-server"
+
+
+@pytest.fixture(scope="function")
+def server():
+    socket_dir = tempfile.mkdtemp()
+    address = os.path.join(socket_dir, "mongolite.sock")
+
+    with Server(DIRPATH, address, batch_size=7) as server:
+        yield server
+
+    shutil.rmtree(socket_dir)
+    shutil.rmtree(DIRPATH)
+
+
+@pytest.fixture(scope="function")
+def client(server):
+    client = MongoClient(server.uri, database="db")
+    client.get_default_database().create_collection("col")
+    yield client
+    client.close()
+
+
+def test_crud(client):
+    collection = client.get_default_database().get_collection("col")
+
+    inserted_ids = collection.insert_many([{"value": i} for i in range(10)])
+    collection.update_one({"value": 0}, {"$set": {"value": 100}})
+    collection.delete_many({"value": {"$gt": 7, "$lt": 100}})
+
+    assert collection.count_documents({}) == 8
+    document = collection.find_one({"_id": inserted_ids[1]})
+    assert document == {"_id": inserted_ids[1], "value": 1}
+    assert client.get_default_database().list_collection_names() == ["col"]
+
+
+def test_cursor_batches(client, server):
+    collection = client.get_default_database().get_collection("col")
+    collection.insert_many([{"value": i} for i in range(50)])
+
+    assert sorted(document["value"] for document in collection.find({})) == list(
+        range(50)
+    )
+
+    cursor = collection.find({})
+    next(cursor)
+    cursor.close()
+    assert server._cursors == {}
+
+
+def test_errors(client):
+    collection = client.get_default_database().get_collection("col")
+
+    with pytest.raises(ValueError):
+        collection.update_one({}, {})
+
+    with pytest.raises(BulkWriteError):
+        collection.bulk_write([UpdateOne({}, {}), InsertOne({"a": 1})])
+
+
+def test_pipelined_commands(client):
+    with client._open_session() as session:
+        results = session.exc_commands(
+            [
+                Command(
+                    cmd=COMMANDS.insert,
+                    database_name="db",
+                    collection_name="col",
+                    documents=[{"value": i}],
+                )
+                for i in range(5)
+            ]
+            + [
+                Command(
+                    cmd=COMMANDS.count_documents,
+                    database_name="db",
+                    collection_name="col",
+                    filter={},
+                )
+            ]
+        )
+    assert results[-1] == 5
+
+
+def test_indexes(client):
+    collection = client.get_default_database().get_collection("col")
+
+    index_id = collection.create_index({"value": 1})
+    assert [index["id"] for index in collection.get_indexes()] == [index_id]
+    assert collection.delete_index(index_id)
+
+
+def test_transaction(client):
+    collection = client.get_default_database().get_collection("col")
+    collection.insert_one({"name": "a", "balance": 10})
+
+    with client.start_session() as session:
+        with session.start_transaction():
+            collection.update_one(
+                {"name": "a"}, {"$inc": {"balance": -5}}, session=session
+            )
+            assert collection.find_one({"name": "a"})["balance"] == 10
+
+    assert collection.find_one({"name": "a"})["balance"] == 5
+
+
+def test_concurrent_clients(client, server):
+    def worker(worker: int):
+        with MongoClient(server.uri, database="db", max_pool_size=2) as other:
+            collection = other.get_default_database().get_collection("col")
+            threads = [
+                Thread(
+                    target=collection.insert_many,
+                    args=([{"worker": worker} for _ in range(20)],),
+                )
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+    workers = [Thread(target=worker, args=(i,)) for i in range(3)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    collection = client.get_default_database().get_collection("col")
+    assert collection.count_documents({}) == 240
+
+
+def test_tcp():
+    with Server(DIRPATH, ("127.0.0.1", 0)) as server:
+        with MongoClient(server.uri, database="db") as client:
+            collection = client.get_default_database().create_collection("col")
+            collection.insert_one({"value": 1})
+            assert collection.find_one({})["value"] == 1
+
+    shutil.rmtree(DIRPATH)
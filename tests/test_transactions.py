@@ -0,0 +1,147 @@
+import os
+import shutil
+
+import pytest
+
+from pymongolite import MongoClient
+from pymongolite.backend.exceptions import DuplicateKeyError, TransactionConflict
+from pymongolite.backend.execution_engine.chunked_engine import ChunkedEngine
+from pymongolite.exceptions import InvalidOperation
+
+DIRPATH = "test-transactions"
+
+
+@pytest.fixture(scope="function")
+def client():
+    client = MongoClient(DIRPATH, database="db")
+    client.get_default_database().create_collection("col")
+    yield client
+    client.close()
+    shutil.rmtree(DIRPATH)
+
+
+@pytest.fixture(scope="function")
+def collection(client):
+    collection = client.get_default_database().get_collection("col")
+    collection.insert_many([{"name": "a", "value": 1}, {"name": "b", "value": 2}])
+    return collection
+
+
+def test_commit(client, collection):
+    with client.start_session() as session:
+        with session.start_transaction():
+            collection.insert_one({"name": "c", "value": 3}, session=session)
+            collection.update_one({"name": "a"}, {"$inc": {"value": 10}}, session=session)
+            collection.delete_one({"name": "b"}, session=session)
+
+            # The transaction sees its writes, others don't until the commit
+            assert collection.find_one({"name": "a"}, session=session)["value"] == 11
+            assert collection.count_documents({}, session=session) == 2
+            assert collection.find_one({"name": "a"})["value"] == 1
+            assert collection.count_documents({}) == 2
+            assert collection.find_one({"name": "c"}) is None
+
+    assert sorted(
+        (document["name"], document["value"]) for document in collection.find({})
+    ) == [("a", 11), ("c", 3)]
+    assert not os.listdir(f"{DIRPATH}/.journal")
+
+
+def test_abort(client, collection):
+    session = client.start_session()
+
+    with pytest.raises(RuntimeError):
+        with session.start_transaction():
+            collection.update_many({}, {"$set": {"value": 0}}, session=session)
+            raise RuntimeError()
+
+    session.start_transaction()
+    collection.delete_many({}, session=session)
+    session.abort_transaction()
+
+    with pytest.raises(InvalidOperation):
+        session.commit_transaction()
+
+    assert sorted(document["value"] for document in collection.find({})) == [1, 2]
+
+
+def test_conflict(client, collection):
+    session = client.start_session()
+    session.start_transaction()
+
+    document = collection.find_one({"name": "a"}, session=session)
+    collection.update_one(
+        {"name": "b"}, {"$set": {"value": document["value"]}}, session=session
+    )
+
+    # Changed after the transaction read it
+    collection.update_one({"name": "a"}, {"$set": {"value": 5}})
+
+    with pytest.raises(TransactionConflict):
+        session.commit_transaction()
+
+    assert not session.in_transaction
+    assert collection.find_one({"name": "b"})["value"] == 2
+
+
+def test_insert_conflict(client, collection):
+    session = client.start_session()
+    session.start_transaction()
+    collection.insert_one({"_id": 1, "name": "c"}, session=session)
+
+    # Inserted by someone else after the transaction started
+    collection.insert_one({"_id": 1, "name": "d"})
+
+    with pytest.raises(TransactionConflict):
+        session.commit_transaction()
+
+    assert [document["name"] for document in collection.find({"_id": 1})] == ["d"]
+
+
+def test_insert_duplicate_id(client, collection):
+    collection.insert_one({"_id": 1, "name": "c"})
+
+    with client.start_session() as session:
+        with pytest.raises(DuplicateKeyError):
+            with session.start_transaction():
+                collection.insert_one({"_id": 1, "name": "d"}, session=session)
+
+        # Free again once the transaction deleted it
+        with session.start_transaction():
+            collection.delete_one({"_id": 1}, session=session)
+            collection.insert_one({"_id": 1, "name": "e"}, session=session)
+
+            with pytest.raises(DuplicateKeyError):
+                collection.insert_one({"_id": 1, "name": "f"}, session=session)
+
+    assert [document["name"] for document in collection.find({"_id": 1})] == ["e"]
+
+
+def test_journal_replay(client, collection, monkeypatch):
+    def crash(*args, **kwargs):
+        raise SystemError("crash")
+
+    session = client.start_session()
+    session.start_transaction()
+    collection.insert_one({"name": "c", "value": 3}, session=session)
+    collection.insert_one({"_id": "d", "name": "d", "value": 4}, session=session)
+    collection.replace_one({"name": "a"}, {"name": "a", "value": 100}, session=session)
+
+    # The journal is written, the collection isn't changed
+    with monkeypatch.context() as patch:
+        patch.setattr(ChunkedEngine, "_apply_journal", crash)
+        with pytest.raises(SystemError):
+            session.commit_transaction()
+
+    assert collection.count_documents({}) == 2
+    assert len(os.listdir(f"{DIRPATH}/.journal")) == 1
+
+    with MongoClient(DIRPATH, database="db") as reopened_client:
+        reopened = reopened_client.get_default_database().get_collection("col")
+
+        assert sorted(
+            (document["name"], document["value"]) for document in reopened.find({})
+        ) == [("a", 100), ("b", 2), ("c", 3), ("d", 4)]
+        assert reopened.find_one({"name": "d"})["_id"] == "d"
+
+    assert not os.listdir(f"{DIRPATH}/.journal")
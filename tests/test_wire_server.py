@@ -0,0 +1,214 @@
+import asyncio
+import shutil
+import socket
+import struct
+from datetime import datetime
+from threading import Thread
+
+import pytest
+
+from pymongolite.backend import bson_codec
+from pymongolite.backend.objectid import ObjectId
+from pymongolite.backend.wire_server import OP_MSG, OP_QUERY, WireServer
+
+DIRPATH = "test-wire-server"
+
+
+@pytest.fixture(scope="function")
+def server():
+    loop = asyncio.new_event_loop()
+    server = WireServer(DIRPATH, ("127.0.0.1", 0))
+    loop.run_until_complete(server.start())
+    thread = Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    shutil.rmtree(DIRPATH)
+
+
+class _Connection:
+    def __init__(self, address):
+        self._socket = socket.create_connection(address[:2])
+        self._request_id = 0
+
+    def _receive(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            data += self._socket.recv(size - len(data))
+        return data
+
+    def _request(self, op_code: int, payload: bytes) -> bytes:
+        self._request_id += 1
+        header = struct.pack("<iiii", 16 + len(payload), self._request_id, 0, op_code)
+        self._socket.sendall(header + payload)
+
+        length, _, response_to, _ = struct.unpack("<iiii", self._receive(16))
+        assert response_to == self._request_id
+        return self._receive(length - 16)
+
+    def command(self, body: dict) -> dict:
+        reply = self._request(OP_MSG, b"\x00" * 4 + b"\x00" + bson_codec.encode(body))
+        return bson_codec.decode(reply, 5)[0]
+
+    def close(self):
+        self._socket.close()
+
+
+def test_bson_round_trip():
+    document = {
+        "_id": ObjectId(),
+        "int": 1,
+        "long": 2**40,
+        "float": 1.5,
+        "text": "שלום",
+        "none": None,
+        "bool": True,
+        "list": [1, {"a": "b"}],
+        "bytes": b"\x00\x01",
+        "date": datetime(2020, 1, 2, 3, 4, 5, 6000),
+    }
+
+    data = bson_codec.encode(document)
+    assert bson_codec.decode(data) == (document, len(data))
+
+
+def test_handshake_with_op_query(server):
+    connection = _Connection(server.address)
+    payload = (
+        b"\x00" * 4
+        + b"admin.$cmd\x00"
+        + struct.pack("<ii", 0, -1)
+        + bson_codec.encode({"isMaster": 1})
+    )
+    reply = connection._request(OP_QUERY, payload)
+    connection.close()
+
+    assert struct.unpack("<iqii", reply[:20])[3] == 1
+    document, _ = bson_codec.decode(reply, 20)
+    assert document["ok"] == 1.0 and document["maxWireVersion"] >= 6
+
+
+def test_crud_and_cursors(server):
+    connection = _Connection(server.address)
+
+    documents = [{"_id": ObjectId(), "value": i} for i in range(250)]
+    reply = connection.command({"insert": "col", "documents": documents, "$db": "db"})
+    assert reply == {"n": 250, "ok": 1.0}
+
+    reply = connection.command(
+        {
+            "find": "col",
+            "filter": {"value": {"$gte": 10}},
+            "batchSize": 100,
+            "$db": "db",
+        }
+    )
+    cursor = reply["cursor"]
+    values = [document["value"] for document in cursor["firstBatch"]]
+    while cursor["id"]:
+        cursor = connection.command(
+            {
+                "getMore": cursor["id"],
+                "collection": "col",
+                "batchSize": 100,
+                "$db": "db",
+            }
+        )["cursor"]
+        values += [document["value"] for document in cursor["nextBatch"]]
+    assert sorted(values) == list(range(10, 250))
+
+    reply = connection.command(
+        {
+            "update": "col",
+            "updates": [
+                {
+                    "q": {"value": {"$lt": 5}},
+                    "u": {"$set": {"small": True}},
+                    "multi": True,
+                },
+                {"q": {"value": -1}, "u": {"value": -1}, "upsert": True},
+            ],
+            "$db": "db",
+        }
+    )
+    assert reply["n"] == 6 and reply["nModified"] == 5
+    assert reply["upserted"][0]["index"] == 1
+
+    reply = connection.command(
+        {"delete": "col", "deletes": [{"q": {"small": True}, "limit": 0}], "$db": "db"}
+    )
+    assert reply["n"] == 5
+
+    reply = connection.command({"count": "col", "query": {}, "$db": "db"})
+    assert reply["n"] == 246
+
+    reply = connection.command({"find": "col", "filter": {}, "$db": "db"})
+    cursor_id = reply["cursor"]["id"]
+    reply = connection.command(
+        {"killCursors": "col", "cursors": [cursor_id], "$db": "db"}
+    )
+    assert reply["cursorsKilled"] == [cursor_id]
+    assert server._cursors == {}
+
+    connection.close()
+
+
+def test_indexes_and_errors(server):
+    connection = _Connection(server.address)
+
+    reply = connection.command(
+        {
+            "createIndexes": "col",
+            "indexes": [{"key": {"value": -1}, "name": "value_-1"}],
+            "$db": "db",
+        }
+    )
+    assert reply["createdCollectionAutomatically"] is True
+
+    reply = connection.command({"listIndexes": "col", "$db": "db"})
+    names = [index["name"] for index in reply["cursor"]["firstBatch"]]
+    assert names == ["_id_", "value_-1"]
+
+    reply = connection.command({"dropIndexes": "col", "index": "value_-1", "$db": "db"})
+    assert reply["ok"] == 1.0
+
+    reply = connection.command({"noSuchCommand": 1, "$db": "db"})
+    assert reply["ok"] == 0.0 and reply["codeName"] == "CommandNotFound"
+
+    reply = connection.command({"create": "col", "$db": "db"})
+    assert reply["ok"] == 1.0
+
+    connection.close()
+
+
+def test_pymongo(server):
+    pymongo = pytest.importorskip("pymongo")
+
+    host, port = server.address[:2]
+    with pymongo.MongoClient(host, port, serverSelectionTimeoutMS=2000) as client:
+        collection = client.db.col
+
+        inserted_id = collection.insert_one({"name": "a"}).inserted_id
+        assert collection.find_one({"_id": inserted_id})["name"] == "a"
+
+        collection.insert_many([{"value": i} for i in range(300)])
+        assert collection.count_documents({"value": {"$gte": 100}}) == 200
+        assert (
+            len(list(collection.find({"value": {"$exists": True}}).batch_size(50)))
+            == 300
+        )
+        assert [
+            document["value"]
+            for document in collection.find({"value": {"$lt": 5}}).sort("value", -1)
+        ] == [4, 3, 2, 1, 0]
+
+        assert (
+            collection.update_many({}, {"$set": {"seen": True}}).modified_count == 301
+        )
+        assert collection.delete_many({"value": {"$gte": 10}}).deleted_count == 290
+        assert client.db.list_collection_names() == ["col"]